@@ -0,0 +1,195 @@
+"""
+Admission control for review submission.
+
+Classification is the expensive part of a submission, so only
+ADMISSION_MAX_IN_FLIGHT submissions run at once per worker and at most
+ADMISSION_MAX_QUEUE wait for a slot, each for up to ADMISSION_QUEUE_TIMEOUT
+seconds. Anything beyond that is shed right away with 503 and a Retry-After
+estimated from recent service times, instead of piling up until the client
+times out. Optional token buckets limit submissions per client IP and per
+product (429). Waiting happens before the request checks out a database
+connection, so a long queue does not drain the pool.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from fastapi import HTTPException, Request
+
+from .schemas import ReviewSubmission
+
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "4"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "16"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+
+# Token buckets; a rate of 0 disables the limit
+RATE_LIMIT_IP_PER_MINUTE = float(os.getenv("RATE_LIMIT_IP_PER_MINUTE", "0"))
+RATE_LIMIT_IP_BURST = int(os.getenv("RATE_LIMIT_IP_BURST", "5"))
+RATE_LIMIT_PRODUCT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PRODUCT_PER_MINUTE", "0"))
+RATE_LIMIT_PRODUCT_BURST = int(os.getenv("RATE_LIMIT_PRODUCT_BURST", "20"))
+
+# Use the first X-Forwarded-For address as the client IP; only enable behind a trusted proxy
+TRUST_PROXY_HEADERS = os.getenv("TRUST_PROXY_HEADERS", "false").lower() == "true"
+
+
+def client_ip(request: Request) -> Optional[str]:
+    if TRUST_PROXY_HEADERS:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()[:45]
+    return request.client.host if request.client else None
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets, keeping the most recently used max_keys buckets."""
+
+    def __init__(self, per_minute: float, burst: int, max_keys: int = 10000):
+        self.rate = per_minute / 60.0
+        self.burst = max(burst, 1)
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self.limited = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def acquire(self, key: str) -> Optional[float]:
+        """Take a token for key. Returns None when allowed, else seconds until a token is available."""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(self.burst), now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return None
+
+        self.limited += 1
+        return (1 - bucket[0]) / self.rate
+
+    def snapshot(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "per_minute": self.rate * 60,
+            "burst": self.burst,
+            "tracked_keys": len(self._buckets),
+            "limited": self.limited
+        }
+
+
+class AdmissionController:
+    def __init__(self, max_in_flight: int, max_queue: int, queue_timeout: float):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+
+        self.in_flight = 0
+        self.queued = 0
+        self.peak_queued = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_queue_timeout = 0
+        self.abandoned = 0
+        # Exponentially weighted average time a request holds a slot
+        self.service_seconds: Optional[float] = None
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has likely drained."""
+        service = self.service_seconds or 1.0
+        return max(1, math.ceil(service * (self.queued + 1) / self.max_in_flight))
+
+    def _overloaded(self, detail: str) -> HTTPException:
+        return HTTPException(status_code=503, detail=detail, headers={"Retry-After": str(self.retry_after())})
+
+    @asynccontextmanager
+    async def slot(self, request: Optional[Request] = None):
+        if self._semaphore.locked():
+            if self.queued >= self.max_queue:
+                self.rejected_queue_full += 1
+                raise self._overloaded("Server is busy, please retry later")
+
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected_queue_timeout += 1
+                raise self._overloaded("Server is busy, please retry later")
+            finally:
+                self.queued -= 1
+        else:
+            await self._semaphore.acquire()
+
+        try:
+            # Do not spend model time on callers that gave up while queued
+            if request is not None and await request.is_disconnected():
+                self.abandoned += 1
+                raise HTTPException(status_code=503, detail="Client disconnected")
+
+            self.admitted += 1
+            self.in_flight += 1
+            started = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+                elapsed = time.perf_counter() - started
+                self.service_seconds = elapsed if self.service_seconds is None else 0.8 * self.service_seconds + 0.2 * elapsed
+        finally:
+            self._semaphore.release()
+
+    def snapshot(self) -> Dict:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "peak_queued": self.peak_queued,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_queue_timeout": self.rejected_queue_timeout,
+            "abandoned": self.abandoned,
+            "avg_service_ms": round(self.service_seconds * 1000, 1) if self.service_seconds is not None else None
+        }
+
+
+submission_admission = AdmissionController(ADMISSION_MAX_IN_FLIGHT, ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT)
+ip_limiter = TokenBucketLimiter(RATE_LIMIT_IP_PER_MINUTE, RATE_LIMIT_IP_BURST)
+product_limiter = TokenBucketLimiter(RATE_LIMIT_PRODUCT_PER_MINUTE, RATE_LIMIT_PRODUCT_BURST)
+
+
+def _rate_limited(detail: str, retry_after: float) -> HTTPException:
+    return HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+
+async def admit_review_submission(request: Request, review: ReviewSubmission):
+    """
+    Dependency for submit_review. Declare it before the database session so
+    queued requests do not hold a pool connection while they wait.
+    """
+    ip = client_ip(request)
+    if ip_limiter.enabled and ip:
+        retry_after = ip_limiter.acquire(ip)
+        if retry_after is not None:
+            raise _rate_limited("Too many reviews from this address, please retry later", retry_after)
+
+    if product_limiter.enabled:
+        retry_after = product_limiter.acquire(review.product_id)
+        if retry_after is not None:
+            raise _rate_limited("Too many reviews for this product, please retry later", retry_after)
+
+    async with submission_admission.slot(request):
+        yield
@@ -0,0 +1,25 @@
+"""
+Model-backed services.
+
+The transformer libraries (torch, transformers, sentence_transformers) are
+imported when a model is first constructed by get_classifier or
+get_embedding_service, not when these modules are imported, so processes
+that never run inference never load them. With MODELS_ENABLED=false the
+factories refuse to load models at all and endpoints that need inference
+answer 503; this is the model-free profile for read and admin workers.
+"""
+import os
+
+from fastapi import HTTPException
+
+MODELS_ENABLED = os.getenv("MODELS_ENABLED", "true").lower() == "true"
+
+
+class ModelsDisabledError(RuntimeError):
+    """Raised by the model factories when MODELS_ENABLED is false."""
+
+
+def require_models() -> None:
+    """Route dependency for endpoints that run inference."""
+    if not MODELS_ENABLED:
+        raise HTTPException(status_code=503, detail="Model inference is disabled on this server")
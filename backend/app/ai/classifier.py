@@ -1,21 +1,27 @@
-from transformers import AutoTokenizer, AutoModelForSequenceClassification, pipeline
-import torch
 import json
 import re
 from typing import Dict, List
+from . import MODELS_ENABLED, ModelsDisabledError
+from ..metrics import model_batch_size
 
 class ReviewClassifier:
-    def __init__(self):
-        self.device = 0 if torch.cuda.is_available() else -1
-        
-        # Use XLM-RoBERTa for multilingual sentiment analysis
-        model_name = "cardiffnlp/twitter-xlm-roberta-base-sentiment"
-        self.sentiment_pipeline = pipeline(
-            "sentiment-analysis",
-            model=model_name,
-            tokenizer=model_name,
-            device=self.device
-        )
+    def __init__(self, sentiment_pipeline=None):
+        if sentiment_pipeline is None:
+            # Imported here so importing this module does not load torch
+            import torch
+            from transformers import pipeline
+            
+            self.device = 0 if torch.cuda.is_available() else -1
+            
+            # Use XLM-RoBERTa for multilingual sentiment analysis
+            model_name = "cardiffnlp/twitter-xlm-roberta-base-sentiment"
+            sentiment_pipeline = pipeline(
+                "sentiment-analysis",
+                model=model_name,
+                tokenizer=model_name,
+                device=self.device
+            )
+        self.sentiment_pipeline = sentiment_pipeline
         
         # Positive sentiment templates to detect generic reviews
         self.generic_positive_patterns = [
@@ -75,7 +81,54 @@ matched_description_points, recommended_action, suggested_automatic_response}
 DO NOT include markdown. DO NOT include natural language outside the JSON."""
         
         # Analyze sentiment
+        model_batch_size.observe(1, "sentiment")
         sentiment_result = self.sentiment_pipeline(review_text[:512])[0]
+        
+        return self._classify_with_sentiment(
+            review_id=review_id,
+            review_text=review_text,
+            rating=rating,
+            product_description=product_description,
+            product_keypoints=product_keypoints,
+            is_verified_purchase=is_verified_purchase,
+            sentiment_result=sentiment_result
+        )
+    
+    def classify_reviews(self, reviews: List[Dict], batch_size: int = 32) -> List[Dict]:
+        """
+        Classify many reviews with a single batched sentiment pass.
+        
+        Args:
+            reviews: List of dicts with the same keys as classify_review's arguments
+            batch_size: Number of texts per model forward pass
+        
+        Returns:
+            List of classification results in the same order as the input
+        """
+        if not reviews:
+            return []
+        
+        model_batch_size.observe(len(reviews), "sentiment")
+        sentiment_results = self.sentiment_pipeline(
+            [review["review_text"][:512] for review in reviews],
+            batch_size=batch_size
+        )
+        
+        return [
+            self._classify_with_sentiment(sentiment_result=sentiment_result, **review)
+            for review, sentiment_result in zip(reviews, sentiment_results)
+        ]
+    
+    def _classify_with_sentiment(
+        self,
+        review_id: str,
+        review_text: str,
+        rating: int,
+        product_description: str,
+        product_keypoints: List[str],
+        sentiment_result: Dict,
+        is_verified_purchase: bool = False
+    ) -> Dict:
         sentiment_label = sentiment_result['label'].lower()
         sentiment_score = sentiment_result['score']
         
@@ -133,6 +186,7 @@ DO NOT include markdown. DO NOT include natural language outside the JSON."""
             "reason": reason,
             "tags": tags,
             "severity": severity,
+            "language": language,
             "matched_description_points": matched_points,
             "recommended_action": recommended_action,
             "suggested_automatic_response": automatic_response
@@ -377,5 +431,7 @@ _classifier = None
 def get_classifier() -> ReviewClassifier:
     global _classifier
     if _classifier is None:
+        if not MODELS_ENABLED:
+            raise ModelsDisabledError("The sentiment model is disabled (MODELS_ENABLED=false)")
         _classifier = ReviewClassifier()
     return _classifier
@@ -1,16 +1,35 @@
-from sentence_transformers import SentenceTransformer
+from collections import OrderedDict
+import threading
 import numpy as np
 from typing import List
-import torch
+from . import MODELS_ENABLED, ModelsDisabledError
+from ..metrics import model_batch_size, record_cache
+
+# Product texts are encoded once and reused across reviews of the same product
+PRODUCT_EMBEDDING_CACHE_SIZE = 1024
+# Output size of the sentence model; review_embeddings.embedding has this dimension
+EMBEDDING_DIMENSIONS = 384
 
 class EmbeddingService:
-    def __init__(self):
-        # Use multilingual sentence transformer for English and Romanian
-        self.model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+    def __init__(self, model=None):
+        if model is None:
+            # Imported here so importing this module does not load torch
+            from sentence_transformers import SentenceTransformer
+            
+            # Use multilingual sentence transformer for English and Romanian
+            model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+        self.model = model
+        self._product_embeddings = OrderedDict()
+        self._product_embeddings_lock = threading.Lock()
         
     def get_embedding(self, text: str) -> np.ndarray:
+        model_batch_size.observe(1, "embedding")
         return self.model.encode(text, convert_to_numpy=True)
     
+    def get_embeddings(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        model_batch_size.observe(len(texts), "embedding")
+        return self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+    
     def calculate_similarity(self, text1: str, text2: str) -> float:
         embeddings = self.model.encode([text1, text2], convert_to_numpy=True)
         
@@ -39,17 +58,62 @@ class EmbeddingService:
         self,
         review_text: str,
         product_description: str,
-        keypoints: List[str] = None
+        keypoints: List[str] = None,
+        review_embedding: np.ndarray = None
     ) -> float:
         """
         Calculate enhanced semantic similarity between review and product.
         Combines product description and keypoints for better matching.
+        Pass review_embedding when the caller already encoded the review.
         """
         if not product_description and not keypoints:
             return 0.0
         
-        review_embedding = self.get_embedding(review_text)
+        if review_embedding is None:
+            review_embedding = self.get_embedding(review_text)
+        product_embedding = self._get_product_embeddings(
+            [self.product_text(product_description, keypoints)]
+        )[0]
         
+        similarity = np.dot(review_embedding, product_embedding) / (
+            np.linalg.norm(review_embedding) * np.linalg.norm(product_embedding)
+        )
+        
+        return float(similarity)
+    
+    def calculate_similarities_to_descriptions(
+        self,
+        review_texts: List[str],
+        product_texts: List[str],
+        batch_size: int = 64,
+        review_embeddings: np.ndarray = None
+    ) -> List[float]:
+        """
+        Batched variant of calculate_similarity_to_description.
+        product_texts are built with product_text and must line up with review_texts.
+        Empty product texts yield a similarity of 0.0.
+        """
+        if not review_texts:
+            return []
+        
+        if review_embeddings is None:
+            review_embeddings = self.get_embeddings(review_texts, batch_size=batch_size)
+        product_embeddings = self._get_product_embeddings(product_texts, batch_size=batch_size)
+        
+        similarities = []
+        for review_embedding, product_embedding, product_text in zip(review_embeddings, product_embeddings, product_texts):
+            if not product_text:
+                similarities.append(0.0)
+                continue
+            similarity = np.dot(review_embedding, product_embedding) / (
+                np.linalg.norm(review_embedding) * np.linalg.norm(product_embedding)
+            )
+            similarities.append(float(similarity))
+        
+        return similarities
+    
+    @staticmethod
+    def product_text(product_description: str, keypoints: List[str] = None) -> str:
         # Combine description and keypoints
         product_text_parts = []
         if product_description:
@@ -57,14 +121,30 @@ class EmbeddingService:
         if keypoints:
             product_text_parts.append(" ".join(keypoints))
         
-        product_text = " ".join(product_text_parts)
-        product_embedding = self.get_embedding(product_text)
+        return " ".join(product_text_parts)
+    
+    def _get_product_embeddings(self, product_texts: List[str], batch_size: int = 64) -> List[np.ndarray]:
+        found = {}
+        with self._product_embeddings_lock:
+            for text in product_texts:
+                if text in self._product_embeddings:
+                    self._product_embeddings.move_to_end(text)
+                    found[text] = self._product_embeddings[text]
         
-        similarity = np.dot(review_embedding, product_embedding) / (
-            np.linalg.norm(review_embedding) * np.linalg.norm(product_embedding)
-        )
+        missing = [text for text in dict.fromkeys(product_texts) if text not in found]
+        record_cache("product_embedding", len(product_texts) - len(missing), len(missing))
+        if missing:
+            model_batch_size.observe(len(missing), "embedding")
+            encoded = self.model.encode(missing, batch_size=batch_size, convert_to_numpy=True)
+            found.update(zip(missing, encoded))
+            
+            with self._product_embeddings_lock:
+                for text in missing:
+                    self._product_embeddings[text] = found[text]
+                while len(self._product_embeddings) > PRODUCT_EMBEDDING_CACHE_SIZE:
+                    self._product_embeddings.popitem(last=False)
         
-        return float(similarity)
+        return [found[text] for text in product_texts]
 
 # Global embedding service instance
 _embedding_service = None
@@ -72,5 +152,7 @@ _embedding_service = None
 def get_embedding_service() -> EmbeddingService:
     global _embedding_service
     if _embedding_service is None:
+        if not MODELS_ENABLED:
+            raise ModelsDisabledError("The sentence embedding model is disabled (MODELS_ENABLED=false)")
         _embedding_service = EmbeddingService()
     return _embedding_service
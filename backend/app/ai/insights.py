@@ -10,8 +10,6 @@ class ReviewInsightsGenerator:
     """
     
     def __init__(self):
-        self.embedding_service = get_embedding_service()
-        
         # Common positive indicators
         self.positive_indicators = [
             'quality', 'excellent', 'great', 'perfect', 'love', 'amazing', 'recommend',
@@ -35,6 +33,11 @@ class ReviewInsightsGenerator:
             'usability': ['easy', 'simple', 'comfortable', 'convenient', 'user-friendly', 'usor', 'simplu', 'confortabil']
         }
     
+    @property
+    def embedding_service(self):
+        # Loaded on first use only; insights are keyword based and the feed must not wait for the model
+        return get_embedding_service()
+    
     def generate_insights(
         self,
         reviews: List[Dict],
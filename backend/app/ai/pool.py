@@ -0,0 +1,411 @@
+"""
+Model replicas in separate processes, pinned to CPU cores.
+
+One model instance per uvicorn worker scales badly on a many-core node: every
+instance starts a torch intra-op thread per core, and the workers' threads
+fight over the same cores. With INFERENCE_REPLICAS > 0 a worker instead runs
+inference in that many replica processes. Each replica is pinned to its own
+slice of INFERENCE_CPUS with os.sched_setaffinity and runs torch with one
+thread per core of its slice, so replicas never share a core.
+
+A request goes to the replica with the fewest reviews in flight. It travels
+over that replica's pipe as pickle protocol 5 with out-of-band buffers, so
+embedding arrays are written from and read into their own memory instead of
+being copied through the pickle stream. A replica runs the requests waiting
+on its pipe, up to INFERENCE_MAX_BATCH reviews, as one batched model pass. A
+replica that dies fails its in-flight requests and is started again.
+
+With INFERENCE_REPLICAS=0, the default, callers run analyze_reviews in the
+worker's thread pool as before.
+"""
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import os
+import pickle
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import MODELS_ENABLED
+from .classifier import get_classifier
+from .embeddings import get_embedding_service
+
+INFERENCE_REPLICAS = int(os.getenv("INFERENCE_REPLICAS", "0"))
+# CPUs the replicas are pinned to, e.g. "2-31"; defaults to the CPUs this process may use
+INFERENCE_CPUS = os.getenv("INFERENCE_CPUS", "")
+# Cores, and torch threads, per replica; 0 splits INFERENCE_CPUS evenly
+INFERENCE_THREADS_PER_REPLICA = int(os.getenv("INFERENCE_THREADS_PER_REPLICA", "0"))
+# Reviews a replica runs in one batched pass
+INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "32"))
+
+RESTART_DELAY_SECONDS = 1.0
+STOP_TIMEOUT_SECONDS = 10.0
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceError(RuntimeError):
+    """A replica failed to run a request, or died while running it."""
+
+
+def parse_cpu_list(value: str) -> List[int]:
+    """CPUs of a list like "0-3,8,10-11"."""
+    cpus = []
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def assign_cores(cpus: List[int], replicas: int, threads_per_replica: int = 0) -> List[List[int]]:
+    """Disjoint slices of `cpus`, one per replica; raises ValueError when they do not fit."""
+    threads = max(threads_per_replica or len(cpus) // max(replicas, 1), 1)
+    if replicas < 1 or replicas * threads > len(cpus):
+        raise ValueError(f"{replicas} inference replicas of {threads} cores need {replicas * threads} CPUs; {len(cpus)} available")
+    return [cpus[index * threads:(index + 1) * threads] for index in range(replicas)]
+
+
+def _analyze(reviews: List[Dict], batch_size: int) -> Tuple[List[Dict], List[float], np.ndarray]:
+    classifier = get_classifier()
+    embedding_service = get_embedding_service()
+
+    classifications = classifier.classify_reviews(reviews, batch_size=batch_size)
+    review_texts = [review["review_text"] for review in reviews]
+    embeddings = embedding_service.get_embeddings(review_texts, batch_size=batch_size)
+    similarities = embedding_service.calculate_similarities_to_descriptions(
+        review_texts,
+        [
+            embedding_service.product_text(review["product_description"], review["product_keypoints"])
+            for review in reviews
+        ],
+        batch_size=batch_size,
+        review_embeddings=embeddings
+    )
+    return classifications, similarities, embeddings
+
+
+def analyze_reviews(reviews: List[Dict], batch_size: int = INFERENCE_MAX_BATCH) -> List[Tuple[Dict, float, np.ndarray]]:
+    """
+    (classification, similarity to the product, embedding) of every review, in
+    batched model passes. Reviews are dicts of classify_review's arguments.
+    """
+    if not reviews:
+        return []
+    return list(zip(*_analyze(reviews, batch_size)))
+
+
+def _send(connection, message) -> None:
+    buffers = []
+    payload = pickle.dumps(message, protocol=5, buffer_callback=buffers.append)
+    connection.send_bytes(len(buffers).to_bytes(4, "little") + payload)
+    for buffer in buffers:
+        connection.send_bytes(buffer.raw())
+
+
+def _recv(connection):
+    head = connection.recv_bytes()
+    buffers = [connection.recv_bytes() for _ in range(int.from_bytes(head[:4], "little"))]
+    return pickle.loads(memoryview(head)[4:], buffers=buffers)
+
+
+def _run_batch(connection, requests: List[Tuple[int, str, list]], batch_size: int) -> None:
+    for method in ("analyze", "embed"):
+        group = [(request_id, items) for request_id, request_method, items in requests if request_method == method]
+        if not group:
+            continue
+        items = [item for _, request_items in group for item in request_items]
+        try:
+            if method == "analyze":
+                classifications, similarities, embeddings = _analyze(items, batch_size)
+            else:
+                embeddings = get_embedding_service().get_embeddings(items, batch_size=batch_size)
+        except Exception as exc:
+            for request_id, _ in group:
+                _send(connection, ("result", request_id, None, f"{type(exc).__name__}: {exc}"))
+            continue
+
+        offset = 0
+        for request_id, request_items in group:
+            end = offset + len(request_items)
+            if method == "analyze":
+                result = (classifications[offset:end], similarities[offset:end], embeddings[offset:end])
+            else:
+                result = embeddings[offset:end]
+            _send(connection, ("result", request_id, result, None))
+            offset = end
+
+
+def _replica_main(connection, cores: List[int], max_batch: int, stub_models: bool) -> None:
+    """Entry point of a replica process."""
+    # Thread pools size themselves from these when torch is imported, which happens below
+    threads = str(len(cores))
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[name] = threads
+    # The tokenizers would start a thread per core of the node
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+    if stub_models:
+        from .stubs import install_stub_models
+        install_stub_models()
+    get_classifier()
+    get_embedding_service()
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(len(cores))
+    _send(connection, ("ready", os.getpid()))
+
+    while True:
+        try:
+            message = _recv(connection)
+        except EOFError:
+            return
+        if message is None:
+            return
+        # Requests that arrived while the previous batch ran go into this one
+        requests = [message]
+        size = len(message[2])
+        stop = False
+        while size < max_batch and connection.poll():
+            message = _recv(connection)
+            if message is None:
+                stop = True
+                break
+            requests.append(message)
+            size += len(message[2])
+        _run_batch(connection, requests, max_batch)
+        if stop:
+            return
+
+
+class _Replica:
+    def __init__(self, index: int, cores: List[int]):
+        self.index = index
+        self.cores = cores
+        self.process = None
+        self.connection = None
+        # Guards sends, so concurrent requests do not interleave their messages
+        self.send_lock = threading.Lock()
+        self.reader: Optional[threading.Thread] = None
+        self.ready = threading.Event()
+        # request id -> (future, loop, reviews); guarded by the pool's lock
+        self.requests: Dict[int, Tuple[asyncio.Future, asyncio.AbstractEventLoop, int]] = {}
+        self.in_flight = 0
+        self.completed = 0
+        self.restarts = 0
+
+
+def _settle(future: asyncio.Future, result, error: Optional[str]) -> None:
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(InferenceError(error))
+    else:
+        future.set_result(result)
+
+
+class InferencePool:
+    def __init__(
+        self,
+        replicas: int = INFERENCE_REPLICAS,
+        cpus: Optional[List[int]] = None,
+        threads_per_replica: int = INFERENCE_THREADS_PER_REPLICA,
+        max_batch: int = INFERENCE_MAX_BATCH,
+        stub_models: bool = False
+    ):
+        self.replicas = replicas
+        self.cpus = cpus
+        self.threads_per_replica = threads_per_replica
+        self.max_batch = max_batch
+        # Deterministic stand-ins of app.ai.stubs, for benchmarks
+        self.stub_models = stub_models
+
+        self._context = multiprocessing.get_context("spawn")
+        self._replicas: List[_Replica] = []
+        self._lock = threading.Lock()
+        self._request_ids = itertools.count()
+        self._stopping = False
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._replicas)
+
+    def start(self) -> None:
+        """Start the replicas; they load their models in the background."""
+        if self.replicas <= 0 or not MODELS_ENABLED:
+            return
+        cpus = self.cpus
+        if cpus is None:
+            cpus = parse_cpu_list(INFERENCE_CPUS) if INFERENCE_CPUS else sorted(os.sched_getaffinity(0))
+        self._stopping = False
+        self._replicas = [
+            _Replica(index, cores)
+            for index, cores in enumerate(assign_cores(cpus, self.replicas, self.threads_per_replica))
+        ]
+        for replica in self._replicas:
+            self._spawn(replica)
+            replica.reader = threading.Thread(
+                target=self._read, args=(replica,), name=f"inference-replica-{replica.index}", daemon=True
+            )
+            replica.reader.start()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until every replica has loaded its models."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for replica in self._replicas:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            if not replica.ready.wait(remaining):
+                return False
+        return True
+
+    def _spawn(self, replica: _Replica) -> None:
+        parent_connection, child_connection = self._context.Pipe()
+        process = self._context.Process(
+            target=_replica_main,
+            args=(child_connection, replica.cores, self.max_batch, self.stub_models),
+            name=f"inference-replica-{replica.index}",
+            daemon=True
+        )
+        process.start()
+        child_connection.close()
+        with replica.send_lock:
+            replica.process, replica.connection = process, parent_connection
+
+    def _read(self, replica: _Replica) -> None:
+        """Reader thread of one replica: settles its requests and restarts it when it dies."""
+        while True:
+            try:
+                message = _recv(replica.connection)
+            except (EOFError, OSError):
+                if self._stopping:
+                    return
+                replica.ready.clear()
+                self._fail_requests(replica, f"Inference replica {replica.index} exited")
+                replica.process.join(STOP_TIMEOUT_SECONDS)
+                logger.error("Inference replica %d exited with code %s; restarting", replica.index, replica.process.exitcode)
+                time.sleep(RESTART_DELAY_SECONDS)
+                if self._stopping:
+                    return
+                replica.connection.close()
+                replica.restarts += 1
+                self._spawn(replica)
+                continue
+
+            if message[0] == "ready":
+                replica.ready.set()
+                continue
+            _, request_id, result, error = message
+            with self._lock:
+                request = replica.requests.pop(request_id, None)
+                if request is not None:
+                    replica.in_flight -= request[2]
+                    replica.completed += request[2]
+            if request is not None:
+                future, loop, _ = request
+                try:
+                    loop.call_soon_threadsafe(_settle, future, result, error)
+                except RuntimeError:
+                    # The event loop is closed; nobody waits for the result
+                    pass
+
+    def _fail_requests(self, replica: _Replica, error: str) -> None:
+        with self._lock:
+            requests, replica.requests = replica.requests, {}
+            replica.in_flight = 0
+        for future, loop, _ in requests.values():
+            try:
+                loop.call_soon_threadsafe(_settle, future, None, error)
+            except RuntimeError:
+                pass
+
+    async def _submit(self, method: str, items: list):
+        if not self._replicas:
+            raise InferenceError("The inference pool is not running")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            # Least loaded ready replica by reviews in flight; ties go to the lowest index.
+            # A dead or restarting replica only gets requests when no replica is ready.
+            candidates = [candidate for candidate in self._replicas if candidate.ready.is_set()] or self._replicas
+            replica = min(candidates, key=lambda candidate: candidate.in_flight)
+            request_id = next(self._request_ids)
+            replica.requests[request_id] = (future, loop, len(items))
+            replica.in_flight += len(items)
+
+        def send():
+            with replica.send_lock:
+                _send(replica.connection, (request_id, method, items))
+
+        try:
+            # A large request blocks on the pipe until the replica reads it
+            await loop.run_in_executor(None, send)
+        except (BrokenPipeError, OSError) as exc:
+            with self._lock:
+                if replica.requests.pop(request_id, None) is not None:
+                    replica.in_flight -= len(items)
+            raise InferenceError(f"Inference replica {replica.index} is not reachable: {exc}") from exc
+        return await future
+
+    async def analyze(self, reviews: List[Dict]) -> List[Tuple[Dict, float, np.ndarray]]:
+        """analyze_reviews on the replicas; a long list is split into batches that run side by side."""
+        parts = await asyncio.gather(*[
+            self._submit("analyze", reviews[start:start + self.max_batch])
+            for start in range(0, len(reviews), self.max_batch)
+        ])
+        return [
+            result
+            for classifications, similarities, embeddings in parts
+            for result in zip(classifications, similarities, embeddings)
+        ]
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        """Embeddings of `texts`, one row per text, from the least loaded replica."""
+        return await self._submit("embed", texts)
+
+    def stop(self) -> None:
+        """Ask the replicas to finish their current batch and exit."""
+        self._stopping = True
+        for replica in self._replicas:
+            try:
+                with replica.send_lock:
+                    _send(replica.connection, None)
+            except OSError:
+                pass
+        for replica in self._replicas:
+            replica.process.join(STOP_TIMEOUT_SECONDS)
+            if replica.process.is_alive():
+                replica.process.terminate()
+                replica.process.join()
+            # The reader sees the end of the pipe once the replica is gone
+            replica.reader.join()
+            replica.connection.close()
+            self._fail_requests(replica, "The inference pool stopped")
+        self._replicas = []
+
+    def snapshot(self) -> Dict:
+        return {
+            "replicas": [
+                {
+                    "index": replica.index,
+                    "pid": replica.process.pid if replica.process is not None else None,
+                    "cores": replica.cores,
+                    "ready": replica.ready.is_set(),
+                    "in_flight": replica.in_flight,
+                    "completed": replica.completed,
+                    "restarts": replica.restarts
+                }
+                for replica in self._replicas
+            ],
+            "max_batch": self.max_batch
+        }
+
+
+inference_pool = InferencePool()
@@ -0,0 +1,67 @@
+"""
+Deterministic stand-ins for the transformer models.
+
+Benchmarks and load tests use these so model downloads and inference time
+do not drown out what is being measured. The rule-based parts of the
+classifier still run unchanged on top of them.
+"""
+import hashlib
+from typing import List, Union
+
+import numpy as np
+
+from . import classifier, embeddings
+
+STUB_EMBEDDING_DIMENSIONS = 384
+
+POSITIVE_WORDS = [
+    "good", "great", "excellent", "love", "perfect", "amazing", "recommend", "comfortable",
+    "bun", "excelent", "recomand", "perfect", "minunat"
+]
+NEGATIVE_WORDS = [
+    "bad", "poor", "broken", "terrible", "awful", "disappointed", "worst", "problem",
+    "prost", "stricat", "groaznic", "dezamagit", "problema"
+]
+
+
+class StubSentimentPipeline:
+    """Keyword vote with the same output shape as a transformers sentiment pipeline."""
+
+    def __call__(self, texts: Union[str, List[str]], batch_size: int = None, **kwargs) -> List[dict]:
+        if isinstance(texts, str):
+            texts = [texts]
+        return [self._score(text) for text in texts]
+
+    def _score(self, text: str) -> dict:
+        text_lower = text.lower()
+        positive = sum(1 for word in POSITIVE_WORDS if word in text_lower)
+        negative = sum(1 for word in NEGATIVE_WORDS if word in text_lower)
+
+        if positive == negative:
+            return {"label": "neutral", "score": 0.6}
+        label = "positive" if positive > negative else "negative"
+        return {"label": label, "score": min(0.6 + 0.1 * abs(positive - negative), 0.99)}
+
+
+class StubSentenceModel:
+    """Hashed bag-of-words vectors with the dimensionality of the real model."""
+
+    def encode(self, texts: Union[str, List[str]], batch_size: int = 32, convert_to_numpy: bool = True, **kwargs):
+        if isinstance(texts, str):
+            return self._encode(texts)
+        return np.array([self._encode(text) for text in texts], dtype=np.float32).reshape(-1, STUB_EMBEDDING_DIMENSIONS)
+
+    def _encode(self, text: str) -> np.ndarray:
+        vector = np.zeros(STUB_EMBEDDING_DIMENSIONS, dtype=np.float32)
+        for word in text.lower().split():
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % STUB_EMBEDDING_DIMENSIONS] += 1.0
+        # Keep empty texts away from a zero vector so cosine similarity stays defined
+        vector[0] += 1e-3
+        return vector / np.linalg.norm(vector)
+
+
+def install_stub_models() -> None:
+    """Replace the global classifier and embedding service with stub-backed instances."""
+    classifier._classifier = classifier.ReviewClassifier(sentiment_pipeline=StubSentimentPipeline())
+    embeddings._embedding_service = embeddings.EmbeddingService(model=StubSentenceModel())
@@ -1,15 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc, or_
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import ARRAY, Text, and_, case, cast, desc, or_, select, func
+from datetime import date, datetime, timedelta
 from typing import List, Optional
 from uuid import UUID
+import json
 
-from ..database import get_db
+from ..admission import submission_admission, ip_limiter, product_limiter
+from ..counters import counter_buffer
+from ..events import EVENT_TYPES, decode_position, event_hub, publish_event, stream_events
+from ..housekeeping import housekeeper
+from ..database import get_db, get_read_db, AsyncSessionLocal, pool_stats
+from ..profiling import profile_store, require_profiling_token
 from ..models import (
     BaseReview, ReviewAnalysis, PublishedReview, RejectedReview,
-    SupportTicket, AdminAction, Product
+    SupportTicket
 )
-from ..schemas import AdminReviewResponse, SupportTicketResponse, TicketAssignment, ReviewOverride
+from ..queries import reviewer_name, as_float, as_str, rows_as_dicts
+from ..schemas import AdminReviewResponse, SupportTicketResponse, TicketAssignment, ReviewOverride, BulkReviewOverride
+from ..services import audit
+from ..services.bulk_import import (
+    BulkReviewImporter, DEFAULT_CHUNK_SIZE, detect_import_format, parse_import_rows
+)
+from ..services.feed import refresh_feed
+from ..services.moderation import OVERRIDE_CATEGORIES, lock_override_targets, override_reviews
+from ..services.review_loader import load_review
+from ..services.reviews import same_review
+from ..services.search import SEARCH_SORTS, search_reviews
+from ..services.semantic_search import semantic_search
+from ..services.stats import add_to_stats, remove_from_stats, moderation_stats
+from ..ai import require_models
+from ..ai.embeddings import get_embedding_service
+from ..ai.pool import InferenceError, inference_pool
+from ..utils.timestamps import to_naive_utc
 
 router = APIRouter()
 
@@ -17,127 +42,222 @@ router = APIRouter()
 async def get_all_reviews(
     skip: int = 0,
     limit: int = 50,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    query = db.query(
-        BaseReview,
-        ReviewAnalysis
+    query = select(
+        as_str(BaseReview.id),
+        as_str(BaseReview.product_id),
+        reviewer_name(BaseReview.reviewer_name),
+        BaseReview.reviewer_email,
+        BaseReview.rating,
+        BaseReview.review_text,
+        BaseReview.language,
+        BaseReview.is_verified_purchase,
+        BaseReview.submitted_at,
+        ReviewAnalysis.category,
+        as_float(ReviewAnalysis.confidence, "confidence"),
+        ReviewAnalysis.reason,
+        # Reviews without analysis list an empty array; analysed reviews keep their tags, even NULL
+        case((ReviewAnalysis.id.is_(None), cast([], ARRAY(Text))), else_=ReviewAnalysis.tags).label("tags"),
+        as_float(ReviewAnalysis.value_score, "value_score")
     ).outerjoin(
-        ReviewAnalysis, BaseReview.id == ReviewAnalysis.review_id
+        ReviewAnalysis, same_review(ReviewAnalysis)
     ).order_by(
         desc(BaseReview.submitted_at)
     )
     
-    total = query.count()
-    results = query.offset(skip).limit(limit).all()
-    
-    reviews = []
-    for base_review, analysis in results:
-        reviews.append({
-            "id": str(base_review.id),
-            "product_id": str(base_review.product_id),
-            "reviewer_name": base_review.reviewer_name or "Anonymous",
-            "reviewer_email": base_review.reviewer_email,
-            "rating": base_review.rating,
-            "review_text": base_review.review_text,
-            "language": base_review.language,
-            "is_verified_purchase": base_review.is_verified_purchase,
-            "submitted_at": base_review.submitted_at.isoformat(),
-            "category": analysis.category if analysis else None,
-            "confidence": float(analysis.confidence) if analysis and analysis.confidence else None,
-            "reason": analysis.reason if analysis else None,
-            "tags": analysis.tags if analysis else [],
-            "value_score": float(analysis.value_score) if analysis and analysis.value_score else None
-        })
+    # review_analysis.review_id is unique, so the outer join never changes the count
+    total = (await db.execute(select(func.count(BaseReview.id)))).scalar_one()
+    reviews = rows_as_dicts(await db.execute(query.offset(skip).limit(limit)))
     
-    return {
+    return ORJSONResponse({
         "reviews": reviews,
         "total": total,
         "skip": skip,
         "limit": limit
-    }
+    })
+
+@router.get("/reviews/search")
+async def search_all_reviews(
+    q: str = Query(..., min_length=1, max_length=200),
+    product_id: Optional[str] = None,
+    category: Optional[str] = None,
+    rating: Optional[int] = Query(None, ge=1, le=5),
+    submitted_from: Optional[datetime] = None,
+    submitted_to: Optional[datetime] = None,
+    sort: str = "relevance",
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Full-text search over review text, in English and Romanian, with keyset pagination."""
+    if sort not in SEARCH_SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(SEARCH_SORTS)}")
+    
+    product_uuid = None
+    if product_id:
+        try:
+            product_uuid = UUID(product_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid product ID format")
+    
+    try:
+        reviews, next_cursor = await search_reviews(
+            db,
+            q,
+            sort=sort,
+            limit=limit,
+            cursor=cursor,
+            product_id=product_uuid,
+            category=category,
+            rating=rating,
+            # submitted_at is TIMESTAMP; bounds with an offset are compared in UTC
+            submitted_from=to_naive_utc(submitted_from),
+            submitted_to=to_naive_utc(submitted_to)
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    return ORJSONResponse({
+        "reviews": reviews,
+        "next_cursor": next_cursor,
+        "sort": sort,
+        "limit": limit
+    })
+
+@router.get("/reviews/semantic-search", dependencies=[Depends(require_models)])
+async def semantic_search_reviews(
+    q: str = Query(..., min_length=1, max_length=500),
+    product_id: Optional[str] = None,
+    category: Optional[str] = None,
+    k: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Reviews closest in meaning to the query, in any language, from the review embedding index."""
+    product_uuid = None
+    if product_id:
+        try:
+            product_uuid = UUID(product_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid product ID format")
+    
+    if inference_pool.enabled:
+        try:
+            query_embedding = (await inference_pool.embed([q]))[0]
+        except InferenceError:
+            raise HTTPException(status_code=503, detail="Semantic search is temporarily unavailable, please retry")
+    else:
+        query_embedding = await run_in_threadpool(get_embedding_service().get_embedding, q)
+    reviews = await semantic_search(db, query_embedding, k=k, product_id=product_uuid, category=category)
+    
+    return ORJSONResponse({
+        "reviews": reviews,
+        "k": k
+    })
+
+@router.post("/reviews/import", dependencies=[Depends(require_models)])
+async def import_reviews(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+):
+    """
+    Bulk import historical reviews from an NDJSON or CSV upload.
+    Streams NDJSON progress, per-row error and summary events back to the caller.
+    """
+    try:
+        import_format = detect_import_format(file.filename, format)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    if chunk_size < 1:
+        raise HTTPException(status_code=400, detail="chunk_size must be positive")
+    
+    async def events():
+        # The stream outlives the request scope, so it owns its session
+        async with AsyncSessionLocal() as db:
+            importer = BulkReviewImporter(db, chunk_size=chunk_size)
+            async for event in importer.run(parse_import_rows(file.file, import_format)):
+                yield json.dumps(event) + "\n"
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
 
 @router.get("/reviews/shadow")
-async def get_shadow_reviews(db: Session = Depends(get_db)):
-    query = db.query(
-        BaseReview,
-        ReviewAnalysis,
-        PublishedReview
+async def get_shadow_reviews(db: AsyncSession = Depends(get_read_db)):
+    query = select(
+        as_str(BaseReview.id),
+        as_str(BaseReview.product_id),
+        reviewer_name(BaseReview.reviewer_name),
+        BaseReview.reviewer_email,
+        BaseReview.rating,
+        BaseReview.review_text,
+        BaseReview.submitted_at,
+        ReviewAnalysis.category,
+        ReviewAnalysis.reason,
+        as_float(ReviewAnalysis.value_score, "value_score", default=0)
     ).join(
-        ReviewAnalysis, BaseReview.id == ReviewAnalysis.review_id
+        ReviewAnalysis, same_review(ReviewAnalysis)
     ).join(
-        PublishedReview, BaseReview.id == PublishedReview.review_id
+        PublishedReview, same_review(PublishedReview)
     ).filter(
         PublishedReview.is_shadow == True
     ).order_by(
         desc(BaseReview.submitted_at)
     )
     
-    results = query.all()
+    reviews = rows_as_dicts(await db.execute(query))
     
-    reviews = []
-    for base_review, analysis, pub_review in results:
-        reviews.append({
-            "id": str(base_review.id),
-            "product_id": str(base_review.product_id),
-            "reviewer_name": base_review.reviewer_name or "Anonymous",
-            "reviewer_email": base_review.reviewer_email,
-            "rating": base_review.rating,
-            "review_text": base_review.review_text,
-            "submitted_at": base_review.submitted_at.isoformat(),
-            "category": analysis.category,
-            "reason": analysis.reason,
-            "value_score": float(analysis.value_score) if analysis.value_score else 0
-        })
-    
-    return {
+    return ORJSONResponse({
         "reviews": reviews,
         "total": len(reviews)
-    }
+    })
 
 @router.get("/reviews/rejected")
-async def get_rejected_reviews(db: Session = Depends(get_db)):
-    query = db.query(
-        BaseReview,
-        ReviewAnalysis,
-        RejectedReview
+async def get_rejected_reviews(db: AsyncSession = Depends(get_read_db)):
+    query = select(
+        as_str(BaseReview.id),
+        as_str(BaseReview.product_id),
+        reviewer_name(BaseReview.reviewer_name),
+        BaseReview.reviewer_email,
+        BaseReview.rating,
+        BaseReview.review_text,
+        BaseReview.submitted_at,
+        ReviewAnalysis.category,
+        RejectedReview.rejection_reason.label("reason"),
+        RejectedReview.rejected_at,
+        RejectedReview.user_notified
     ).join(
-        ReviewAnalysis, BaseReview.id == ReviewAnalysis.review_id
+        ReviewAnalysis, same_review(ReviewAnalysis)
     ).join(
         RejectedReview, BaseReview.id == RejectedReview.review_id
     ).order_by(
         desc(RejectedReview.rejected_at)
     )
     
-    results = query.all()
-    
-    reviews = []
-    for base_review, analysis, rejected in results:
-        reviews.append({
-            "id": str(base_review.id),
-            "product_id": str(base_review.product_id),
-            "reviewer_name": base_review.reviewer_name or "Anonymous",
-            "reviewer_email": base_review.reviewer_email,
-            "rating": base_review.rating,
-            "review_text": base_review.review_text,
-            "submitted_at": base_review.submitted_at.isoformat(),
-            "category": analysis.category,
-            "reason": rejected.rejection_reason,
-            "rejected_at": rejected.rejected_at.isoformat(),
-            "user_notified": rejected.user_notified
-        })
+    reviews = rows_as_dicts(await db.execute(query))
     
-    return {
+    return ORJSONResponse({
         "reviews": reviews,
         "total": len(reviews)
-    }
+    })
 
 @router.get("/support")
 async def get_support_tickets(
     status: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    query = db.query(SupportTicket).order_by(
+    query = select(
+        as_str(SupportTicket.id),
+        as_str(SupportTicket.review_id),
+        SupportTicket.priority,
+        SupportTicket.status,
+        SupportTicket.assigned_to,
+        SupportTicket.issue_description,
+        SupportTicket.customer_email,
+        SupportTicket.automatic_response,
+        SupportTicket.created_at,
+        SupportTicket.updated_at
+    ).order_by(
         desc(SupportTicket.priority),
         desc(SupportTicket.created_at)
     )
@@ -145,41 +265,26 @@ async def get_support_tickets(
     if status:
         query = query.filter(SupportTicket.status == status)
     
-    tickets = query.all()
-    
-    results = []
-    for ticket in tickets:
-        results.append({
-            "id": str(ticket.id),
-            "review_id": str(ticket.review_id),
-            "priority": ticket.priority,
-            "status": ticket.status,
-            "assigned_to": ticket.assigned_to,
-            "issue_description": ticket.issue_description,
-            "customer_email": ticket.customer_email,
-            "automatic_response": ticket.automatic_response,
-            "created_at": ticket.created_at.isoformat(),
-            "updated_at": ticket.updated_at.isoformat()
-        })
+    tickets = rows_as_dicts(await db.execute(query))
     
-    return {
-        "tickets": results,
-        "total": len(results)
-    }
+    return ORJSONResponse({
+        "tickets": tickets,
+        "total": len(tickets)
+    })
 
 @router.post("/tickets/{ticket_id}/assign")
 async def assign_ticket(
     ticket_id: str,
     assignment: TicketAssignment,
     admin_user: str = "admin",
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     try:
         ticket_uuid = UUID(ticket_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid ticket ID format")
     
-    ticket = db.query(SupportTicket).filter(SupportTicket.id == ticket_uuid).first()
+    ticket = await db.get(SupportTicket, ticket_uuid)
     if not ticket:
         raise HTTPException(status_code=404, detail="Ticket not found")
     
@@ -187,19 +292,21 @@ async def assign_ticket(
     ticket.assigned_to = assignment.assigned_to
     ticket.status = "assigned"
     
-    # Log admin action
-    admin_action = AdminAction(
+    # Log admin action and tell the dashboards; both written with the commit
+    audit.record(
+        db,
         admin_user=admin_user,
         action_type="assign_ticket",
-        target_id=ticket_uuid,
         target_type="ticket",
+        target_id=ticket_uuid,
         old_value=old_assigned,
         new_value=assignment.assigned_to
     )
-    db.add(admin_action)
+    publish_event(
+        db, "ticket_assigned", ticket_id=ticket_uuid, assigned_to=assignment.assigned_to, admin_user=admin_user
+    )
     
-    db.commit()
-    db.refresh(ticket)
+    await db.commit()
     
     return {
         "status": "success",
@@ -207,42 +314,98 @@ async def assign_ticket(
         "ticket_id": str(ticket.id)
     }
 
+@router.post("/reviews/override")
+async def bulk_override_review_category(
+    override: BulkReviewOverride,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Move many reviews to one category in a single transaction, by id or by filter.
+    Reports an outcome for every requested id, or every review the filter matched.
+    """
+    if override.new_category not in OVERRIDE_CATEGORIES:
+        raise HTTPException(status_code=400, detail=f"new_category must be one of: {', '.join(OVERRIDE_CATEGORIES)}")
+    if (override.review_ids is None) == (override.filter is None):
+        raise HTTPException(status_code=400, detail="Provide either review_ids or filter")
+    if override.filter is not None and not override.filter.model_dump(exclude_none=True):
+        raise HTTPException(status_code=400, detail="filter needs at least one condition")
+    
+    results = []
+    more_matches = False
+    if override.review_ids is not None:
+        requested = {}
+        for review_id in override.review_ids:
+            try:
+                requested.setdefault(UUID(review_id), review_id)
+            except ValueError:
+                results.append({"review_id": review_id, "status": "invalid_id", "detail": "Invalid review ID format"})
+        
+        targets = await lock_override_targets(db, review_ids=list(requested))
+        found = {target.id for target in targets}
+        for review_uuid, review_id in requested.items():
+            if review_uuid not in found:
+                results.append({"review_id": review_id, "status": "not_found", "detail": "Review or review analysis not found"})
+    else:
+        # One extra row tells whether the filter matches more than this request overrides
+        targets = await lock_override_targets(db, review_filter=override.filter, limit=override.limit + 1)
+        more_matches = len(targets) > override.limit
+        targets = targets[:override.limit]
+    
+    await override_reviews(db, targets, override.new_category, override.reason, override.admin_user)
+    await db.commit()
+    
+    results.extend(
+        {"review_id": str(target.id), "status": "updated", "old_category": target.category}
+        for target in targets
+    )
+    
+    return ORJSONResponse({
+        "status": "success",
+        "new_category": override.new_category,
+        "updated": len(targets),
+        "failed": len(results) - len(targets),
+        "more_matches": more_matches,
+        "results": results
+    })
+
 @router.post("/reviews/{review_id}/override")
 async def override_review_category(
     review_id: str,
     override: ReviewOverride,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     try:
         review_uuid = UUID(review_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid review ID format")
     
-    # Get review and analysis
-    base_review = db.query(BaseReview).filter(BaseReview.id == review_uuid).first()
+    # Review, analysis, publication and rejection in one query
+    base_review = await load_review(db, review_uuid)
     if not base_review:
         raise HTTPException(status_code=404, detail="Review not found")
     
-    analysis = db.query(ReviewAnalysis).filter(ReviewAnalysis.review_id == review_uuid).first()
+    analysis = base_review.analysis
     if not analysis:
         raise HTTPException(status_code=404, detail="Review analysis not found")
     
+    # Uncount the review under its old category; it is counted again below
+    await remove_from_stats(db, [review_uuid])
+    
     old_category = analysis.category
     analysis.category = override.new_category
     
     # Update published/rejected status based on new category
     if override.new_category in ["public_positive", "public_negative"]:
         # Remove from rejected if exists
-        rejected = db.query(RejectedReview).filter(RejectedReview.review_id == review_uuid).first()
-        if rejected:
-            db.delete(rejected)
+        if base_review.rejected:
+            await db.delete(base_review.rejected)
         
         # Add to published if not exists
-        published = db.query(PublishedReview).filter(PublishedReview.review_id == review_uuid).first()
-        if not published:
+        if not base_review.published:
             published = PublishedReview(
                 review_id=review_uuid,
                 analysis_id=analysis.id,
+                store_id=analysis.store_id,
                 is_shadow=False,
                 automatic_response="Review manually approved by admin"
             )
@@ -250,13 +413,11 @@ async def override_review_category(
     
     elif override.new_category == "rejected":
         # Remove from published if exists
-        published = db.query(PublishedReview).filter(PublishedReview.review_id == review_uuid).first()
-        if published:
-            db.delete(published)
+        if base_review.published:
+            await db.delete(base_review.published)
         
         # Add to rejected if not exists
-        rejected = db.query(RejectedReview).filter(RejectedReview.review_id == review_uuid).first()
-        if not rejected:
+        if not base_review.rejected:
             rejected = RejectedReview(
                 review_id=review_uuid,
                 analysis_id=analysis.id,
@@ -265,19 +426,31 @@ async def override_review_category(
             )
             db.add(rejected)
     
-    # Log admin action
-    admin_action = AdminAction(
+    # Log admin action and tell the dashboards; both written with the commit
+    audit.record(
+        db,
         admin_user=override.admin_user,
         action_type="override_category",
-        target_id=review_uuid,
         target_type="review",
+        target_id=review_uuid,
         reason=override.reason,
         old_value=old_category,
         new_value=override.new_category
     )
-    db.add(admin_action)
+    publish_event(
+        db,
+        "review_overridden",
+        review_id=review_uuid,
+        old_category=old_category,
+        new_category=override.new_category,
+        admin_user=override.admin_user
+    )
     
-    db.commit()
+    # Category and publication changes move the review between feed tabs
+    await refresh_feed(db, [review_uuid])
+    await add_to_stats(db, [review_uuid])
+    
+    await db.commit()
     
     return {
         "status": "success",
@@ -285,25 +458,136 @@ async def override_review_category(
         "review_id": str(review_uuid)
     }
 
+@router.get("/stats")
+async def get_moderation_stats(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    store_id: Optional[str] = None,
+    product_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Review counts by category, severity, language and day, from the daily rollups."""
+    # Defaults to the last 30 UTC days
+    date_to = date_to or datetime.utcnow().date()
+    date_from = date_from or date_to - timedelta(days=29)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    
+    store_uuid = None
+    if store_id:
+        try:
+            store_uuid = UUID(store_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid store ID format")
+    
+    product_uuid = None
+    if product_id:
+        try:
+            product_uuid = UUID(product_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid product ID format")
+    
+    stats = await moderation_stats(db, date_from, date_to, store_id=store_uuid, product_id=product_uuid)
+    return ORJSONResponse(stats)
+
+@router.get("/audit")
+async def get_audit_history(
+    target_id: Optional[str] = None,
+    admin_user: Optional[str] = None,
+    target_type: Optional[str] = None,
+    action_type: Optional[str] = None,
+    performed_from: Optional[datetime] = None,
+    performed_to: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Audit trail of one target or one admin, newest first, with keyset pagination."""
+    target_uuid = None
+    if target_id:
+        try:
+            target_uuid = UUID(target_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid target ID format")
+    
+    try:
+        actions, next_cursor = await audit.audit_history(
+            db,
+            target_id=target_uuid,
+            admin_user=admin_user,
+            target_type=target_type,
+            action_type=action_type,
+            # performed_at is TIMESTAMP; bounds with an offset are compared in UTC
+            performed_from=to_naive_utc(performed_from),
+            performed_to=to_naive_utc(performed_to),
+            limit=limit,
+            cursor=cursor
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    return ORJSONResponse({
+        "actions": actions,
+        "next_cursor": next_cursor,
+        "limit": limit
+    })
+
+@router.get("/events")
+async def stream_moderation_events(
+    types: Optional[str] = None,
+    after: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    Server-sent events for the moderation dashboard. Resumes after the
+    Last-Event-ID header, which EventSource sends when it reconnects, or after
+    `after`; without either, starts from now. `types` is a comma-separated subset
+    of the event types.
+    """
+    event_types = None
+    if types:
+        event_types = {event_type.strip() for event_type in types.split(",") if event_type.strip()}
+        unknown = event_types - set(EVENT_TYPES)
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown event types: {', '.join(sorted(unknown))}; use {', '.join(EVENT_TYPES)}"
+            )
+    
+    position = None
+    resume_from = last_event_id or after
+    if resume_from:
+        try:
+            position = decode_position(resume_from)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+    
+    return StreamingResponse(
+        stream_events(position, event_types),
+        media_type="text/event-stream",
+        # Proxies must pass events through as they come
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/reviews/{review_id}")
 async def get_review_detail(
     review_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     try:
         review_uuid = UUID(review_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid review ID format")
     
-    base_review = db.query(BaseReview).filter(BaseReview.id == review_uuid).first()
+    base_review = await load_review(db, review_uuid)
     if not base_review:
         raise HTTPException(status_code=404, detail="Review not found")
     
-    analysis = db.query(ReviewAnalysis).filter(ReviewAnalysis.review_id == review_uuid).first()
-    published = db.query(PublishedReview).filter(PublishedReview.review_id == review_uuid).first()
-    rejected = db.query(RejectedReview).filter(RejectedReview.review_id == review_uuid).first()
-    ticket = db.query(SupportTicket).filter(SupportTicket.review_id == review_uuid).first()
-    product = db.query(Product).filter(Product.id == base_review.product_id).first()
+    analysis = base_review.analysis
+    published = base_review.published
+    rejected = base_review.rejected
+    ticket = base_review.ticket
+    product = base_review.product
     
     return {
         "review": {
@@ -343,3 +627,66 @@ async def get_review_detail(
             "assigned_to": ticket.assigned_to
         } if ticket else None
     }
+
+@router.get("/db/pools")
+async def get_pool_stats():
+    """Connection pool usage per engine, for sizing pools against real load."""
+    return {
+        "pools": [stats.snapshot() for stats in pool_stats.values()]
+    }
+
+@router.get("/counters")
+async def get_counter_stats():
+    """View and helpful-vote increments buffered in this worker and flush history."""
+    return counter_buffer.snapshot()
+
+@router.get("/events/stats")
+async def get_event_stream_stats():
+    """Open event streams of this worker and its outbox polling."""
+    return event_hub.snapshot()
+
+@router.get("/housekeeping")
+async def get_housekeeping_stats():
+    """Purges of expired idempotency keys run by this worker."""
+    return housekeeper.snapshot()
+
+@router.get("/inference")
+async def get_inference_pool_stats():
+    """Model replicas of this worker, their cores and the reviews each has in flight."""
+    return inference_pool.snapshot()
+
+@router.get("/admission")
+async def get_admission_stats():
+    """Submission queue depth, shed requests and rate-limit rejections for this worker."""
+    return {
+        "submissions": submission_admission.snapshot(),
+        "rate_limits": {
+            "ip": ip_limiter.snapshot(),
+            "product": product_limiter.snapshot()
+        }
+    }
+
+@router.get("/profiles", dependencies=[Depends(require_profiling_token)])
+async def list_profiles():
+    """Request profiles captured on this host, newest first."""
+    return {
+        "profiles": await run_in_threadpool(profile_store.list)
+    }
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_profiling_token)])
+async def get_profile(profile_id: str):
+    """Summary of a captured profile: hottest functions and top allocation sites."""
+    summary = await run_in_threadpool(profile_store.summary, profile_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    return summary
+
+@router.get("/profiles/{profile_id}/download", dependencies=[Depends(require_profiling_token)])
+async def download_profile(profile_id: str):
+    """The raw cProfile dump, readable with pstats or snakeviz."""
+    path = profile_store.path(profile_id, "prof")
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
@@ -1,68 +1,91 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc, or_
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import List, Optional
 from uuid import UUID
+import asyncio
 import uuid
 
-from ..database import get_db
-from ..models import Product, BaseReview, ReviewAnalysis, PublishedReview, User, SupportTicket, RejectedReview
-from ..schemas import ProductResponse, ReviewSubmission, PublicReviewResponse
+from ..admission import admit_review_submission, client_ip
+from ..database import AsyncSessionLocal, get_db, get_read_db
+from ..models import Product, BaseReview, ReviewAnalysis, PublishedReview, ProductReviewFeed, SupportTicket, User
+from ..schemas import ProductResponse, ReviewSubmission, ReviewViews, PublicReviewResponse
+from ..ai import require_models
 from ..ai.classifier import get_classifier
 from ..ai.embeddings import get_embedding_service
 from ..ai.insights import get_insights_generator
-from ..utils.scoring import calculate_value_score, calculate_weighted_product_rating
+from ..ai.pool import InferenceError, inference_pool
+from ..utils.scoring import calculate_weighted_product_rating
+from ..counters import counter_buffer
+from ..events import publish_event
+from ..metrics import stage
+from ..queries import as_float, as_str, rows_as_dicts
+from ..services.feed import add_to_feed
+from ..services.semantic_search import add_embeddings
+from ..services.stats import add_to_stats
+from ..services.idempotency import (
+    IDEMPOTENCY_KEY_MAX_LENGTH, submission_fingerprint, submission_key, claim_submission, complete_submission,
+    release_submission
+)
+from ..services.reviews import (
+    PUBLIC_CATEGORIES, REJECTION_NOTIFICATION, product_context, score_review, analysis_values, routing_values,
+    in_product_store, same_review
+)
 
 router = APIRouter()
 
 @router.get("/products", response_model=List[ProductResponse])
-async def get_products(db: Session = Depends(get_db)):
-    products = db.query(Product).filter(Product.is_active == True).all()
+async def get_products(db: AsyncSession = Depends(get_read_db)):
+    products = (await db.execute(
+        select(Product).filter(Product.is_active == True)
+    )).scalars().all()
     return products
 
 @router.get("/products/{product_id}", response_model=ProductResponse)
-async def get_product(product_id: str, db: Session = Depends(get_db)):
+async def get_product(product_id: str, db: AsyncSession = Depends(get_read_db)):
     try:
         product_uuid = UUID(product_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid product ID format")
     
-    product = db.query(Product).filter(Product.id == product_uuid).first()
+    product = await db.get(Product, product_uuid)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
     return product
 
 @router.get("/products/{product_id}/rating")
-async def get_product_rating(product_id: str, db: Session = Depends(get_db)):
+async def get_product_rating(product_id: str, db: AsyncSession = Depends(get_read_db)):
     """Get weighted product rating based on all reviews."""
     try:
         product_uuid = UUID(product_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid product ID format")
     
-    # Get all reviews for the product
-    results = db.query(
-        BaseReview,
-        ReviewAnalysis,
-        PublishedReview
+    # Get all reviews for the product from its store's partitions; the selected columns
+    # are covered by the (store_id, product_id) and (review_id, store_id) indexes, so the
+    # joins can use index-only scans
+    results = await db.execute(select(
+        BaseReview.rating,
+        as_float(ReviewAnalysis.value_score, "value_score", default=0),
+        ReviewAnalysis.category,
+        func.coalesce(PublishedReview.is_shadow, False).label("is_shadow"),
+        BaseReview.is_verified_purchase
+    ).select_from(
+        BaseReview
     ).join(
-        ReviewAnalysis, BaseReview.id == ReviewAnalysis.review_id
+        ReviewAnalysis, same_review(ReviewAnalysis)
     ).outerjoin(
-        PublishedReview, BaseReview.id == PublishedReview.review_id
+        PublishedReview, same_review(PublishedReview)
     ).filter(
-        BaseReview.product_id == product_uuid
-    ).all()
-    
-    reviews_data = []
-    for base_review, analysis, pub_review in results:
-        reviews_data.append({
-            'rating': base_review.rating,
-            'value_score': float(analysis.value_score) if analysis.value_score else 0,
-            'category': analysis.category,
-            'is_shadow': pub_review.is_shadow if pub_review else False,
-            'is_verified_purchase': base_review.is_verified_purchase
-        })
+        BaseReview.product_id == product_uuid,
+        in_product_store(product_uuid)
+    ))
+    
+    reviews_data = rows_as_dicts(results)
     
     # Calculate weighted rating
     rating_info = calculate_weighted_product_rating(reviews_data, include_shadow=True)
@@ -74,112 +97,87 @@ async def get_public_reviews(
     product_id: str,
     tab: str = "positive",
     include_shadow: bool = False,
-    db: Session = Depends(get_db)
+    exact_counts: bool = False,
+    db: AsyncSession = Depends(get_read_db)
 ):
     try:
         product_uuid = UUID(product_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid product ID format")
     
-    # Base query for published reviews
-    query = db.query(
-        PublishedReview,
-        BaseReview,
-        ReviewAnalysis
-    ).join(
-        BaseReview, PublishedReview.review_id == BaseReview.id
-    ).join(
-        ReviewAnalysis, PublishedReview.analysis_id == ReviewAnalysis.id
+    # The feed table holds the public fields of every published review with its tab
+    query = select(
+        as_str(ProductReviewFeed.review_id, "id"),
+        ProductReviewFeed.reviewer_name,
+        ProductReviewFeed.rating,
+        ProductReviewFeed.review_text,
+        ProductReviewFeed.is_verified_purchase,
+        ProductReviewFeed.submitted_at,
+        ProductReviewFeed.automatic_response,
+        ProductReviewFeed.value_score,
+        ProductReviewFeed.helpful_count,
+        ProductReviewFeed.category,
+        ProductReviewFeed.is_shadow
     ).filter(
-        BaseReview.product_id == product_uuid
+        ProductReviewFeed.product_id == product_uuid
     )
     
-    # Filter by tab - now includes shadow reviews integrated into regular tabs
-    if tab == "positive":
-        if include_shadow:
-            # Include both regular positive and shadow positive reviews
-            query = query.filter(
-                or_(
-                    and_(
-                        ReviewAnalysis.category == "public_positive",
-                        PublishedReview.is_shadow == False
-                    ),
-                    and_(
-                        ReviewAnalysis.category == "shadow",
-                        PublishedReview.is_shadow == True
-                    )
-                )
-            )
-        else:
-            # Only regular positive reviews
-            query = query.filter(
-                and_(
-                    ReviewAnalysis.category == "public_positive",
-                    PublishedReview.is_shadow == False
-                )
-            )
-    elif tab == "negative":
-        # Negative reviews (shadow reviews are typically positive, so this stays the same)
-        query = query.filter(
-            and_(
-                ReviewAnalysis.category == "public_negative",
-                PublishedReview.is_shadow == False
-            )
-        )
+    # Shadow reviews are integrated into the positive tab when requested
+    if tab in ["positive", "negative"]:
+        query = query.filter(ProductReviewFeed.tab == tab)
+        if not include_shadow:
+            query = query.filter(ProductReviewFeed.is_shadow == False)
     elif tab == "shadow":
-        query = query.filter(PublishedReview.is_shadow == True)
-    else:
+        query = query.filter(ProductReviewFeed.is_shadow == True)
+    elif not include_shadow:
         # All public reviews
-        if include_shadow:
-            # Include everything except rejected
-            pass  # No additional filter
-        else:
-            query = query.filter(PublishedReview.is_shadow == False)
+        query = query.filter(ProductReviewFeed.is_shadow == False)
     
     # Order by value score (shadow reviews will naturally rank lower due to scoring)
-    # Then by is_shadow to ensure non-shadow reviews appear first when scores are equal
+    # Then by is_shadow to ensure non-shadow reviews appear first when scores are equal,
+    # which matches idx_product_review_feed_tab for the tab queries
     query = query.order_by(
-        desc(ReviewAnalysis.value_score),
-        PublishedReview.is_shadow.asc()
+        desc(ProductReviewFeed.value_score),
+        ProductReviewFeed.is_shadow.asc()
     )
     
-    results = query.all()
-    
-    reviews = []
-    for pub_review, base_review, analysis in results:
-        reviews.append({
-            "id": str(base_review.id),
-            "reviewer_name": base_review.reviewer_name or "Anonymous",
-            "rating": base_review.rating,
-            "review_text": base_review.review_text,
-            "is_verified_purchase": base_review.is_verified_purchase,
-            "submitted_at": base_review.submitted_at.isoformat(),
-            "automatic_response": pub_review.automatic_response,
-            "value_score": float(analysis.value_score) if analysis.value_score else 0,
-            "helpful_count": pub_review.helpful_count,
-            "category": analysis.category,
-            "is_shadow": pub_review.is_shadow
-        })
+    with stage("get_public_reviews", "query"):
+        result = await db.execute(query)
+    with stage("get_public_reviews", "rows"):
+        reviews = rows_as_dicts(result)
+    
+    if exact_counts:
+        # Add helpful votes this worker has buffered but not flushed yet
+        pending = counter_buffer.pending_helpful()
+        if pending:
+            for review in reviews:
+                review["helpful_count"] += pending.get(review["id"], 0)
     
     # Generate AI insights for positive and negative reviews
     insights = None
-    insights_generator = get_insights_generator()
-    
-    if tab == "positive" and reviews:
-        insights = insights_generator.generate_insights(reviews, category='positive')
-    elif tab == "negative" and reviews:
-        insights = insights_generator.generate_insights(reviews, category='negative')
+    with stage("get_public_reviews", "insights"):
+        insights_generator = get_insights_generator()
+        
+        if tab == "positive" and reviews:
+            insights = insights_generator.generate_insights(reviews, category='positive')
+        elif tab == "negative" and reviews:
+            insights = insights_generator.generate_insights(reviews, category='negative')
     
-    return {
-        "reviews": reviews,
-        "insights": insights,
-        "total": len(reviews)
-    }
+    with stage("get_public_reviews", "serialize"):
+        return ORJSONResponse({
+            "reviews": reviews,
+            "insights": insights,
+            "total": len(reviews)
+        })
 
-@router.post("/reviews")
+# Admission runs before the session dependency so queued submissions hold no connection
+@router.post("/reviews", dependencies=[Depends(require_models), Depends(admit_review_submission)])
 async def submit_review(
     review: ReviewSubmission,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=IDEMPOTENCY_KEY_MAX_LENGTH),
+    db: AsyncSession = Depends(get_db)
 ):
     try:
         product_uuid = UUID(review.product_id)
@@ -187,179 +185,251 @@ async def submit_review(
         raise HTTPException(status_code=400, detail="Invalid product ID format")
     
     # Get product
-    product = db.query(Product).filter(Product.id == product_uuid).first()
+    with stage("submit_review", "product_lookup"):
+        product = await db.get(Product, product_uuid)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    # Create or get user
-    user = None
-    if review.reviewer_email:
-        user = db.query(User).filter(User.email == review.reviewer_email).first()
-        if not user:
-            user = User(
-                name=review.reviewer_name,
-                email=review.reviewer_email,
-                is_verified_purchaser=review.is_verified_purchase
+    # Retries and double submits get the first submission's response without running the models
+    ip_address = client_ip(request)
+    fingerprint = submission_fingerprint(
+        product_uuid, review.reviewer_email, ip_address, review.rating, review.review_text
+    )
+    key = submission_key(idempotency_key, fingerprint, product_uuid, review.reviewer_email, ip_address)
+    with stage("submit_review", "idempotency_claim"):
+        previous_result = await claim_submission(db, key, fingerprint)
+    if previous_result is not None:
+        response.headers["Idempotent-Replayed"] = "true"
+        return previous_result
+    
+    try:
+        return await _store_submission(db, review, product, ip_address, key)
+    except BaseException:
+        # Also on cancellation (client gone, worker stopping), so a retry is processed instead of
+        # waiting for a claim nobody completes
+        try:
+            await db.rollback()
+        finally:
+            await asyncio.shield(_release_claim(key))
+        raise
+
+async def _release_claim(key: str) -> None:
+    # Own session: the request's may be torn down while this runs
+    async with AsyncSessionLocal() as db:
+        await release_submission(db, key)
+
+async def _store_submission(db: AsyncSession, review: ReviewSubmission, product: Product, ip_address: Optional[str], key: str):
+    """Classify a claimed submission and write it, with its stored response, in one transaction."""
+    product_uuid = product.id
+    product_description, product_keypoints = product_context(product)
+    
+    # Ids are generated up front so every row can be written in a single flush
+    review_id = uuid.uuid4()
+    analysis_id = uuid.uuid4()
+    
+    # Classify review using AI
+    def analyze():
+        classifier = get_classifier()
+        embedding_service = get_embedding_service()
+        
+        with stage("submit_review", "sentiment"):
+            classification_result = classifier.classify_review(
+                review_id=str(review_id),
+                review_text=review.review_text,
+                rating=review.rating,
+                product_description=product_description,
+                product_keypoints=product_keypoints,
+                is_verified_purchase=review.is_verified_purchase
+            )
+        
+        with stage("submit_review", "embedding"):
+            # The review vector is kept for semantic search and reused for the similarity
+            review_embedding = embedding_service.get_embedding(review.review_text)
+            
+            # Calculate enhanced semantic similarity (includes product description)
+            semantic_similarity = embedding_service.calculate_similarity_to_description(
+                review.review_text,
+                product_description,
+                product_keypoints,
+                review_embedding=review_embedding
             )
-            db.add(user)
-            db.commit()
-            db.refresh(user)
+        return classification_result, semantic_similarity, review_embedding
+    
+    with stage("submit_review", "inference"):
+        if inference_pool.enabled:
+            # Replicas batch this review with the ones other requests are waiting on
+            try:
+                [(classification_result, semantic_similarity, review_embedding)] = await inference_pool.analyze([{
+                    "review_id": str(review_id),
+                    "review_text": review.review_text,
+                    "rating": review.rating,
+                    "product_description": product_description,
+                    "product_keypoints": product_keypoints,
+                    "is_verified_purchase": review.is_verified_purchase
+                }])
+            except InferenceError:
+                raise HTTPException(status_code=503, detail="Review classification is temporarily unavailable, please retry")
+        else:
+            # Model inference runs in a worker thread so the event loop keeps serving
+            classification_result, semantic_similarity, review_embedding = await run_in_threadpool(analyze)
+    
+    with stage("submit_review", "scoring"):
+        value_score = score_review(
+            review.review_text,
+            product,
+            classification_result,
+            semantic_similarity,
+            review.is_verified_purchase
+        )
+    
+    # Create the user, or read the existing one's id; DO NOTHING leaves a known user's row
+    # untouched, and a concurrent insert of the same email is committed by the time we read
+    user_id = None
+    if review.reviewer_email:
+        with stage("submit_review", "user_upsert"):
+            user_id = (await db.execute(
+                pg_insert(User).values(
+                    name=review.reviewer_name,
+                    email=review.reviewer_email,
+                    is_verified_purchaser=review.is_verified_purchase
+                ).on_conflict_do_nothing(index_elements=[User.email]).returning(User.id)
+            )).scalar_one_or_none()
+            if user_id is None:
+                user_id = (await db.execute(
+                    select(User.id).filter(User.email == review.reviewer_email)
+                )).scalar_one()
     
-    # Create base review
+    # Create base review, analysis and the routed row as one unit of work
     base_review = BaseReview(
+        id=review_id,
+        store_id=product.store_id,
         product_id=product_uuid,
-        user_id=user.id if user else None,
+        user_id=user_id,
         reviewer_name=review.reviewer_name,
         reviewer_email=review.reviewer_email,
         rating=review.rating,
         review_text=review.review_text,
-        is_verified_purchase=review.is_verified_purchase
+        language=classification_result["language"],
+        is_verified_purchase=review.is_verified_purchase,
+        ip_address=ip_address
     )
-    db.add(base_review)
-    db.commit()
-    db.refresh(base_review)
-    
-    # Classify review using AI
-    classifier = get_classifier()
-    embedding_service = get_embedding_service()
-    
-    classification_result = classifier.classify_review(
-        review_id=str(base_review.id),
-        review_text=review.review_text,
-        rating=review.rating,
-        product_description=product.long_description or product.description,
-        product_keypoints=product.keypoints or [],
-        is_verified_purchase=review.is_verified_purchase
+    analysis = ReviewAnalysis(
+        id=analysis_id,
+        **analysis_values(review_id, product.store_id, classification_result, value_score)
     )
+    db.add_all([base_review, analysis])
     
-    # Calculate enhanced semantic similarity (includes product description)
-    semantic_similarity = embedding_service.calculate_similarity_to_description(
+    routed_model, routed_values = routing_values(
+        review_id,
+        analysis_id,
+        product.store_id,
+        classification_result,
         review.review_text,
-        product.long_description or product.description,
-        product.keypoints or []
+        review.reviewer_email,
+        review.is_verified_purchase
     )
+    routed = None
+    if routed_model is not None:
+        routed = routed_model(id=uuid.uuid4(), **routed_values)
+        db.add(routed)
     
-    # Determine if this will be a shadow review
-    is_shadow = classification_result["category"] == "shadow"
+    # The base review, analysis and routed row go out in one flush
+    with stage("submit_review", "review_insert"):
+        await db.flush()
     
-    # Calculate value score
-    matched_keypoints = classification_result["matched_description_points"]
-    sentiment_score = classification_result["confidence"]
-    
-    value_score = calculate_value_score(
-        review_text=review.review_text,
-        product_description=product.long_description or product.description,
-        keypoints=product.keypoints or [],
-        matched_keypoints=matched_keypoints,
-        is_verified_purchase=review.is_verified_purchase,
-        sentiment_score=sentiment_score,
-        semantic_similarity=semantic_similarity,
-        is_shadow=is_shadow
-    )
+    if routed_model is PublishedReview:
+        with stage("submit_review", "feed_insert"):
+            await add_to_feed(db, [review_id])
     
-    # Create review analysis
-    analysis = ReviewAnalysis(
-        review_id=base_review.id,
-        category=classification_result["category"],
-        confidence=classification_result["confidence"],
-        reason=classification_result["reason"],
-        tags=classification_result["tags"],
-        severity=classification_result["severity"],
-        recommended_action=classification_result["recommended_action"],
-        matched_description_points=classification_result["matched_description_points"],
-        suggested_automatic_response=classification_result["suggested_automatic_response"],
-        value_score=value_score
-    )
-    db.add(analysis)
-    db.commit()
-    db.refresh(analysis)
+    with stage("submit_review", "embedding_insert"):
+        await add_embeddings(db, [(review_id, product_uuid, review_embedding)])
     
     # Process based on category
     category = classification_result["category"]
     
-    if category in ["public_positive", "public_negative"]:
-        # Publish review
-        published = PublishedReview(
-            review_id=base_review.id,
-            analysis_id=analysis.id,
-            is_shadow=False,
-            automatic_response=classification_result["suggested_automatic_response"]
+    # Dashboard events; written with the commit
+    publish_event(db, "review_classified", review_id=review_id, product_id=product_uuid, category=category, source="submission")
+    if routed_model is SupportTicket:
+        publish_event(
+            db, "ticket_created", ticket_id=routed.id, review_id=review_id, product_id=product_uuid, priority=routed.priority
         )
-        db.add(published)
-        db.commit()
-        
-        return {
+    
+    if category in PUBLIC_CATEGORIES:
+        result = {
             "status": "published",
             "message": "Thank you for your review! It has been published.",
             "category": category,
-            "review_id": str(base_review.id)
+            "review_id": str(review_id)
         }
     
     elif category == "shadow":
-        # Publish but shadow-ban
-        published = PublishedReview(
-            review_id=base_review.id,
-            analysis_id=analysis.id,
-            is_shadow=True,
-            automatic_response=classification_result["suggested_automatic_response"]
-        )
-        db.add(published)
-        db.commit()
-        
-        return {
+        result = {
             "status": "published",
             "message": "Thank you for your review!",
             "category": category,
-            "review_id": str(base_review.id)
+            "review_id": str(review_id)
         }
     
     elif category == "support":
-        # Create support ticket
-        priority = "high" if review.is_verified_purchase else "normal"
-        
-        ticket = SupportTicket(
-            review_id=base_review.id,
-            analysis_id=analysis.id,
-            priority=priority,
-            issue_description=review.review_text,
-            customer_email=review.reviewer_email,
-            automatic_response=classification_result["suggested_automatic_response"]
-        )
-        db.add(ticket)
-        db.commit()
-        
         response_message = classification_result["suggested_automatic_response"]
         if not review.reviewer_email:
             response_message += " Please provide your email so we can reach you."
         
-        return {
+        result = {
             "status": "support_ticket_created",
             "message": response_message,
             "category": category,
-            "ticket_id": str(ticket.id)
+            "ticket_id": str(routed.id)
         }
     
     elif category == "rejected":
-        # Reject review
-        rejected = RejectedReview(
-            review_id=base_review.id,
-            analysis_id=analysis.id,
-            rejection_reason=classification_result["reason"],
-            user_notified=True,
-            notification_message="Your review was not published because it was marked as irrelevant to the product."
-        )
-        db.add(rejected)
-        db.commit()
-        
-        return {
+        result = {
             "status": "rejected",
-            "message": "Your review was not published because it was marked as irrelevant to the product.",
+            "message": REJECTION_NOTIFICATION,
             "reason": classification_result["reason"],
             "category": category
         }
     
+    else:
+        result = {
+            "status": "processed",
+            "message": "Review has been processed.",
+            "category": category
+        }
+    
+    # Last write before the commit, so the shared rollup row is locked only briefly
+    with stage("submit_review", "stats"):
+        await add_to_stats(db, [review_id])
+    with stage("submit_review", "idempotency_complete"):
+        await complete_submission(db, key, review_id, result)
+    with stage("submit_review", "commit"):
+        await db.commit()
+    
+    return result
+
+@router.post("/reviews/views", status_code=202)
+async def record_review_views(views: ReviewViews):
+    """Count one view for each review shown on a page. Views are written in batches."""
+    review_ids = set(views.review_ids)
+    for review_id in review_ids:
+        counter_buffer.add(review_id, views=1)
+    
+    return {
+        "status": "accepted",
+        "recorded": len(review_ids)
+    }
+
+@router.post("/reviews/{review_id}/helpful", status_code=202)
+async def record_helpful_vote(review_id: str):
+    """Count a helpful vote for a review. Votes are written in batches."""
+    try:
+        review_uuid = UUID(review_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid review ID format")
+    
+    counter_buffer.add(review_uuid, helpful=1)
+    
     return {
-        "status": "processed",
-        "message": "Review has been processed.",
-        "category": category
+        "status": "accepted",
+        "review_id": str(review_uuid)
     }
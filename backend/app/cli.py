@@ -0,0 +1,279 @@
+"""
+Command line tools for operating REVI.
+
+Usage:
+    python -m app.cli import-reviews reviews.ndjson
+    python -m app.cli import-reviews reviews.csv --chunk-size 1000
+    cat reviews.ndjson | python -m app.cli import-reviews - --format ndjson
+    python -m app.cli embed-reviews --batch-size 256
+    python -m app.cli rebuild-stats --from 2024-01-01 --to 2024-01-31
+    python -m app.cli reclassify-reviews model-2024-06 --workers 4 --dry-run
+    python -m app.cli partition-reviews copy --batch-size 5000 --pause 0.1
+    python -m app.cli partition-reviews swap
+    python -m app.cli maintain-audit-log --retention-months 24
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import date, timedelta
+from uuid import UUID
+
+from fastapi.concurrency import run_in_threadpool
+
+from .ai.embeddings import get_embedding_service
+from .database import AsyncSessionLocal, async_engine
+from .services.audit import (
+    AUDIT_ARCHIVE_DIR, AUDIT_PARTITIONS_AHEAD, AUDIT_RETENTION_MONTHS, archive_partitions, ensure_partitions
+)
+from .services.bulk_import import (
+    BulkReviewImporter, DEFAULT_CHUNK_SIZE, IMPORT_FORMATS, detect_import_format, parse_import_rows
+)
+from .services.partitioning import (
+    DEFAULT_BATCH_SIZE as PARTITION_BATCH_SIZE, PARTITIONED_TABLES, copy_table, drop_unpartitioned, reviews_partitioned,
+    swap_tables, verify_copies
+)
+from .services.reclassify import DEFAULT_CHUNK_SIZE as RECLASSIFY_CHUNK_SIZE, INFERENCE_BATCH_SIZE, Reclassifier
+from .services.reviews import configure_partition_pruning
+from .services.semantic_search import add_embeddings, reviews_missing_embeddings
+from .services.stats import rebuild_stats, review_days
+
+
+async def import_reviews(args) -> int:
+    """Per-row errors and the summary go to stdout as NDJSON, progress to stderr."""
+    try:
+        import_format = detect_import_format(args.path, args.format)
+    except ValueError as exc:
+        print(str(exc), file=sys.stderr)
+        return 2
+
+    stream = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+    try:
+        async with AsyncSessionLocal() as db:
+            importer = BulkReviewImporter(db, chunk_size=args.chunk_size)
+            async for event in importer.run(parse_import_rows(stream, import_format)):
+                if event["event"] == "progress":
+                    print(
+                        f"processed {event['processed']} rows "
+                        f"(imported {event['imported']}, failed {event['failed']})",
+                        file=sys.stderr
+                    )
+                else:
+                    print(json.dumps(event), flush=True)
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+
+    return 0
+
+
+async def embed_reviews(args) -> int:
+    """Store embeddings for reviews written before semantic search existed. Safe to re-run."""
+    embedding_service = get_embedding_service()
+
+    embedded = 0
+    last_id = None
+    async with AsyncSessionLocal() as db:
+        while True:
+            rows = await reviews_missing_embeddings(db, args.batch_size, after=last_id)
+            if not rows:
+                break
+            embeddings = await run_in_threadpool(
+                embedding_service.get_embeddings, [row.review_text for row in rows], args.batch_size
+            )
+            await add_embeddings(db, [(row.id, row.product_id, embedding) for row, embedding in zip(rows, embeddings)])
+            await db.commit()
+
+            embedded += len(rows)
+            last_id = rows[-1].id
+            print(f"embedded {embedded} reviews", file=sys.stderr)
+
+    print(json.dumps({"event": "summary", "embedded": embedded}))
+    return 0
+
+
+async def rebuild_moderation_stats(args) -> int:
+    """Recompute the daily moderation rollups, one day per transaction. Safe to re-run."""
+    async with AsyncSessionLocal() as db:
+        first_day, last_day = await review_days(db)
+        day = args.date_from or first_day
+        last_day = args.date_to or last_day
+        await db.commit()
+
+        days = 0
+        # Without reviews there is no default range and nothing to rebuild
+        while day is not None and last_day is not None and day <= last_day:
+            await rebuild_stats(db, day)
+            days += 1
+            if days % 30 == 0:
+                print(f"rebuilt {days} days (through {day})", file=sys.stderr)
+            day += timedelta(days=1)
+
+    print(json.dumps({"event": "summary", "days": days}))
+    return 0
+
+
+async def reclassify_reviews(args) -> int:
+    """Flip events and the summary go to stdout as NDJSON, progress to stderr."""
+    async with AsyncSessionLocal() as db:
+        reclassifier = Reclassifier(
+            db,
+            args.job,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            batch_size=args.batch_size,
+            dry_run=args.dry_run,
+            product_id=args.product_id
+        )
+        try:
+            job = await reclassifier.start(restart=args.restart)
+        except ValueError as exc:
+            print(str(exc), file=sys.stderr)
+            return 2
+        if job.last_review_id is not None and job.finished_at is None:
+            print(f"resuming {job.name} after review {job.last_review_id} ({job.processed} processed)", file=sys.stderr)
+
+        async for event in reclassifier.run():
+            if event["event"] == "progress":
+                print(
+                    f"processed {event['processed']} reviews "
+                    f"(flipped {event['flipped']}, applied {event['applied']}, skipped {event['skipped']}, "
+                    f"{event['reviews_per_second']} reviews/s)",
+                    file=sys.stderr
+                )
+            else:
+                print(json.dumps(event), flush=True)
+
+    return 0
+
+
+async def partition_reviews(args) -> int:
+    """
+    Steps 2 and 3 of migration 008: copy, verify, swap, and finally drop the old
+    tables. Events and the summary go to stdout as NDJSON, progress to stderr.
+    """
+    async with AsyncSessionLocal() as db:
+        if args.step == "copy":
+            for table in PARTITIONED_TABLES:
+                async for event in copy_table(db, table, args.batch_size, args.pause, restart=args.restart):
+                    print(
+                        f"{table}: copied {event['copied']} rows ({event['rows_per_second']} rows/s)",
+                        file=sys.stderr
+                    )
+                print(json.dumps({"event": "copied", "table": table}), flush=True)
+            return 0
+
+        if args.step in ("verify", "swap") and not args.skip_verify:
+            results = await verify_copies(db)
+            for result in results:
+                print(json.dumps({"event": "verified", **result}), flush=True)
+            if not all(result["ok"] for result in results):
+                print("the partitioned tables differ from the old ones; not swapping", file=sys.stderr)
+                return 1
+            if args.step == "verify":
+                return 0
+
+        try:
+            if args.step == "swap":
+                await swap_tables(db, args.lock_timeout)
+            else:
+                await drop_unpartitioned(db)
+        except ValueError as exc:
+            print(str(exc), file=sys.stderr)
+            return 2
+        print(json.dumps({"event": "summary", "step": args.step}))
+    return 0
+
+
+async def maintain_audit_log(args) -> int:
+    """
+    Create the coming months' admin_actions partitions and archive the months
+    past the retention. Meant to run daily; events go to stdout as NDJSON.
+    """
+    async with AsyncSessionLocal() as db:
+        for partition in await ensure_partitions(db, args.months_ahead):
+            print(json.dumps({"event": "created", "partition": partition}), flush=True)
+
+        try:
+            archived = await archive_partitions(db, args.retention_months, args.archive_dir, args.lock_timeout)
+        except RuntimeError as exc:
+            print(str(exc), file=sys.stderr)
+            return 1
+        for partition in archived:
+            print(json.dumps({"event": "archived", **partition}), flush=True)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="REVI operations tooling")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import-reviews", help="Bulk import reviews from NDJSON or CSV")
+    import_parser.add_argument("path", help="File to import, or - for stdin")
+    import_parser.add_argument("--format", choices=IMPORT_FORMATS, help="Defaults to the file extension")
+    import_parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    import_parser.set_defaults(handler=import_reviews)
+
+    embed_parser = commands.add_parser("embed-reviews", help="Store embeddings for reviews that have none")
+    embed_parser.add_argument("--batch-size", type=int, default=256)
+    embed_parser.set_defaults(handler=embed_reviews)
+
+    stats_parser = commands.add_parser("rebuild-stats", help="Recompute the daily moderation statistics rollups")
+    stats_parser.add_argument("--from", dest="date_from", type=date.fromisoformat, help="First day, defaults to the oldest review")
+    stats_parser.add_argument("--to", dest="date_to", type=date.fromisoformat, help="Last day, defaults to the newest review")
+    stats_parser.set_defaults(handler=rebuild_moderation_stats)
+
+    reclassify_parser = commands.add_parser(
+        "reclassify-reviews", help="Re-run the classifier over stored reviews and apply category changes"
+    )
+    reclassify_parser.add_argument("job", help="Job name; re-running a name resumes it from its checkpoint")
+    reclassify_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Classifier processes")
+    reclassify_parser.add_argument("--chunk-size", type=int, default=RECLASSIFY_CHUNK_SIZE, help="Reviews per checkpoint")
+    reclassify_parser.add_argument("--batch-size", type=int, default=INFERENCE_BATCH_SIZE, help="Reviews per model forward pass")
+    reclassify_parser.add_argument("--dry-run", action="store_true", help="Report category flips without changing reviews")
+    reclassify_parser.add_argument("--product-id", type=UUID, help="Only this product's reviews")
+    reclassify_parser.add_argument("--restart", action="store_true", help="Discard the job's checkpoint and start over")
+    reclassify_parser.set_defaults(handler=reclassify_reviews)
+
+    partition_parser = commands.add_parser(
+        "partition-reviews", help="Move the review tables to their store-partitioned layout (after migration 008)"
+    )
+    partition_parser.add_argument("step", choices=["copy", "verify", "swap", "drop-old"])
+    partition_parser.add_argument("--batch-size", type=int, default=PARTITION_BATCH_SIZE, help="Rows per copy transaction")
+    partition_parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between copy batches")
+    partition_parser.add_argument("--restart", action="store_true", help="Discard the copy checkpoints and start over")
+    partition_parser.add_argument("--skip-verify", action="store_true", help="Swap without comparing the tables first")
+    partition_parser.add_argument("--lock-timeout", default="2s", help="Give up the swap when the tables stay busy this long")
+    partition_parser.set_defaults(handler=partition_reviews)
+
+    audit_parser = commands.add_parser(
+        "maintain-audit-log", help="Create upcoming admin_actions partitions and archive expired ones"
+    )
+    audit_parser.add_argument("--months-ahead", type=int, default=AUDIT_PARTITIONS_AHEAD, help="Months to create in advance")
+    audit_parser.add_argument(
+        "--retention-months", type=int, default=AUDIT_RETENTION_MONTHS, help="Months kept in the database; 0 keeps all"
+    )
+    audit_parser.add_argument("--archive-dir", default=AUDIT_ARCHIVE_DIR, help="Where archived months are written")
+    audit_parser.add_argument("--lock-timeout", default="5s", help="Give up archiving when admin_actions stays busy this long")
+    audit_parser.set_defaults(handler=maintain_audit_log)
+
+    return parser
+
+
+async def run_command(args) -> int:
+    try:
+        async with AsyncSessionLocal() as db:
+            configure_partition_pruning(await reviews_partitioned(db))
+        return await args.handler(args)
+    finally:
+        await async_engine.dispose()
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return asyncio.run(run_command(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""
+Write-buffered view and helpful-vote counters for published reviews.
+
+Increments are accumulated per worker in memory and written by a background
+task in one batched UPDATE ... FROM (VALUES ...) per table, instead of one
+UPDATE per event, so popular reviews do not turn into hot rows. A flush runs
+every COUNTER_FLUSH_SECONDS, early once COUNTER_FLUSH_MAX_KEYS reviews are
+pending, and on shutdown. If a worker crashes, it loses at most the increments
+it gathered since its last flush.
+
+Ids are not checked when they are buffered. A flush drops the ones that
+match no published review and remembers the ones that did. Reviews no flush
+has confirmed yet share a smaller cap, COUNTER_MAX_UNVERIFIED_KEYS, so
+random ids cannot crowd out the increments of reviews already confirmed.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Set
+from uuid import UUID
+
+from sqlalchemy import Integer, column, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+
+from .database import AsyncSessionLocal
+from .models import PublishedReview, ProductReviewFeed
+
+COUNTER_FLUSH_SECONDS = float(os.getenv("COUNTER_FLUSH_SECONDS", "5"))
+COUNTER_FLUSH_MAX_KEYS = int(os.getenv("COUNTER_FLUSH_MAX_KEYS", "1000"))
+# Upper bound on pending reviews while the database is unreachable; beyond it increments are dropped
+COUNTER_MAX_PENDING_KEYS = int(os.getenv("COUNTER_MAX_PENDING_KEYS", "100000"))
+# Upper bound on pending reviews no flush has confirmed to exist yet
+COUNTER_MAX_UNVERIFIED_KEYS = int(os.getenv("COUNTER_MAX_UNVERIFIED_KEYS", "10000"))
+
+logger = logging.getLogger(__name__)
+
+
+def _deltas(rows, *names):
+    return values(
+        column("review_id", PG_UUID(as_uuid=True)),
+        *[column(name, Integer) for name in names],
+        name="deltas"
+    ).data(rows)
+
+
+class CounterBuffer:
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        flush_seconds: float = COUNTER_FLUSH_SECONDS,
+        flush_max_keys: int = COUNTER_FLUSH_MAX_KEYS,
+        max_pending_keys: int = COUNTER_MAX_PENDING_KEYS,
+        max_unverified_keys: int = COUNTER_MAX_UNVERIFIED_KEYS
+    ):
+        self.session_factory = session_factory
+        self.flush_seconds = flush_seconds
+        self.flush_max_keys = flush_max_keys
+        self.max_pending_keys = max_pending_keys
+        self.max_unverified_keys = max_unverified_keys
+
+        # review_id -> [views, helpful]; only touched from the event loop, so no lock
+        self._pending: Dict[UUID, List[int]] = {}
+        # Pending reviews no flush has confirmed yet
+        self._unverified: Set[UUID] = set()
+        # Reviews a flush found, oldest first; bounded by max_pending_keys
+        self._known: Dict[UUID, None] = {}
+        self._flush_requested = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+        self.flushes = 0
+        self.flushed_reviews = 0
+        self.failures = 0
+        self.dropped = 0
+        self.unknown = 0
+        self.last_flush_at: Optional[float] = None
+
+    def add(self, review_id: UUID, views: int = 0, helpful: int = 0) -> None:
+        counts = self._pending.get(review_id)
+        if counts is None:
+            if review_id in self._known:
+                full = len(self._pending) - len(self._unverified) >= self.max_pending_keys
+            else:
+                full = len(self._unverified) >= self.max_unverified_keys
+            if full:
+                self.dropped += views + helpful
+                # A flush sorts out the unverified reviews and makes room again
+                self._flush_requested.set()
+                return
+            if review_id not in self._known:
+                self._unverified.add(review_id)
+            counts = self._pending[review_id] = [0, 0]
+        counts[0] += views
+        counts[1] += helpful
+
+        if len(self._pending) >= self.flush_max_keys:
+            self._flush_requested.set()
+
+    def pending_helpful(self) -> Dict[str, int]:
+        """Unflushed helpful votes of this worker, keyed by review id string."""
+        return {str(review_id): counts[1] for review_id, counts in self._pending.items() if counts[1]}
+
+    async def flush(self) -> int:
+        if not self._pending:
+            return 0
+
+        batch, self._pending = self._pending, {}
+        unverified, self._unverified = self._unverified, set()
+        # A consistent key order keeps concurrent flushes from different workers from deadlocking
+        rows = sorted(batch.items())
+
+        try:
+            async with self.session_factory() as db:
+                deltas = _deltas([(review_id, views, helpful) for review_id, (views, helpful) in rows], "views", "helpful")
+                found = set((await db.execute(
+                    update(PublishedReview)
+                    .where(PublishedReview.review_id == deltas.c.review_id)
+                    .values(
+                        views=PublishedReview.views + deltas.c.views,
+                        helpful_count=PublishedReview.helpful_count + deltas.c.helpful
+                    )
+                    .returning(PublishedReview.review_id)
+                    .execution_options(synchronize_session=False)
+                )).scalars())
+
+                helpful_rows = [(review_id, helpful) for review_id, (_, helpful) in rows if helpful and review_id in found]
+                if helpful_rows:
+                    helpful = _deltas(helpful_rows, "helpful")
+                    await db.execute(
+                        update(ProductReviewFeed)
+                        .where(ProductReviewFeed.review_id == helpful.c.review_id)
+                        .values(helpful_count=ProductReviewFeed.helpful_count + helpful.c.helpful)
+                        .execution_options(synchronize_session=False)
+                    )
+
+                await db.commit()
+        except Exception:
+            self.failures += 1
+            logger.exception("Counter flush failed; %d reviews kept for the next attempt", len(batch))
+            for review_id, (views, helpful) in batch.items():
+                counts = self._pending.setdefault(review_id, [0, 0])
+                counts[0] += views
+                counts[1] += helpful
+            self._unverified.update(review_id for review_id in unverified if review_id not in self._known)
+            return 0
+
+        # Ids that match no published review are dropped; the others are let past the unverified cap
+        self.unknown += sum(views + helpful for review_id, (views, helpful) in rows if review_id not in found)
+        for review_id in found:
+            self._known.pop(review_id, None)
+            self._known[review_id] = None
+        while len(self._known) > self.max_pending_keys:
+            del self._known[next(iter(self._known))]
+        self._unverified.difference_update(found)
+
+        self.flushes += 1
+        self.flushed_reviews += len(found)
+        self.last_flush_at = time.time()
+        return len(found)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush loop without interrupting a flush, then write what is left."""
+        if self._task is not None:
+            self._stopping = True
+            self._flush_requested.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def snapshot(self) -> Dict:
+        return {
+            "pending_reviews": len(self._pending),
+            "pending_views": sum(counts[0] for counts in self._pending.values()),
+            "pending_helpful": sum(counts[1] for counts in self._pending.values()),
+            "flushes": self.flushes,
+            "flushed_reviews": self.flushed_reviews,
+            "failures": self.failures,
+            "dropped": self.dropped,
+            "unknown": self.unknown,
+            "known_reviews": len(self._known),
+            "last_flush_at": self.last_flush_at,
+            "flush_seconds": self.flush_seconds
+        }
+
+
+counter_buffer = CounterBuffer()
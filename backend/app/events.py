@@ -0,0 +1,343 @@
+"""
+Moderation event stream for the admin dashboard.
+
+publish_event() and publish_events() buffer events on the database session.
+They are written to the moderation_events outbox right before the session
+commits, inside the transaction of the change, so the dashboard hears about
+exactly the changes that were stored.
+
+Each worker runs one EventHub. While a stream is open it polls the outbox
+every EVENT_POLL_SECONDS with one indexed query and hands the new events to
+every open stream; a worker without streams does not query. Events are read
+in (tx_id, id) order, and only once their transaction and every older one
+have finished, so the order never changes afterwards and an event whose
+transaction commits late is not skipped. "<tx_id>-<id>" is the event id of
+the stream; a dashboard that reconnects sends it back as Last-Event-ID and
+gets what it missed from the outbox, or a reset event when that was pruned.
+
+LISTEN/NOTIFY is not used: NOTIFY takes a database-wide lock at commit, which
+would serialize every review submission behind it.
+
+The hub also deletes events older than EVENT_RETENTION_HOURS, once an hour.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import delete, event, insert, literal_column, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .database import AsyncSessionLocal
+from .models import ModerationEvent
+
+EVENT_POLL_SECONDS = float(os.getenv("EVENT_POLL_SECONDS", "1"))
+EVENT_KEEPALIVE_SECONDS = float(os.getenv("EVENT_KEEPALIVE_SECONDS", "15"))
+# Events a stream may fall behind the hub; a slower dashboard is disconnected and resumes
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "1000"))
+# Hours of events kept for resuming streams; 0 keeps everything
+EVENT_RETENTION_HOURS = int(os.getenv("EVENT_RETENTION_HOURS", "72"))
+
+EVENT_TYPES = ["review_classified", "ticket_created", "review_overridden", "ticket_assigned"]
+
+EVENT_BATCH_SIZE = 500
+PRUNE_INTERVAL_SECONDS = 3600
+# Reconnect delay suggested to EventSource clients
+RETRY_MILLISECONDS = 3000
+
+_PENDING_KEY = "moderation_events"
+
+# Oldest transaction still running; events of older transactions are final
+_HORIZON = literal_column("(SELECT CAST(CAST(pg_snapshot_xmin(pg_current_snapshot()) AS TEXT) AS BIGINT))")
+
+Position = Tuple[int, int]
+
+logger = logging.getLogger(__name__)
+
+
+def publish_event(db: AsyncSession, event_type: str, **payload) -> None:
+    """Add an event to the session's next commit."""
+    publish_events(db, event_type, [payload])
+
+
+def publish_events(db: AsyncSession, event_type: str, payloads: List[Dict]) -> None:
+    """Add one event per payload to the session's next commit; UUID values are stored as strings."""
+    db.info.setdefault(_PENDING_KEY, []).extend(
+        {
+            "event_type": event_type,
+            "payload": {key: str(value) if isinstance(value, UUID) else value for key, value in payload.items()}
+        }
+        for payload in payloads
+    )
+
+
+@event.listens_for(Session, "before_commit")
+def _write_events(session):
+    events = session.info.pop(_PENDING_KEY, None)
+    if events:
+        session.execute(insert(ModerationEvent), events)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_events(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def encode_position(position: Position) -> str:
+    return f"{position[0]}-{position[1]}"
+
+
+def decode_position(value: str) -> Position:
+    """(tx_id, id) of an event id; raises ValueError if malformed."""
+    try:
+        tx_id, event_id = value.split("-")
+        return int(tx_id), int(event_id)
+    except ValueError as exc:
+        raise ValueError("Invalid event id") from exc
+
+
+async def head_position(db: AsyncSession) -> Position:
+    """Position before every event that is not final yet."""
+    return (await db.execute(select(_HORIZON))).scalar_one(), 0
+
+
+async def event_exists(db: AsyncSession, position: Position) -> bool:
+    return (await db.execute(
+        select(ModerationEvent.id).where(ModerationEvent.id == position[1], ModerationEvent.tx_id == position[0])
+    )).first() is not None
+
+
+async def fetch_events(db: AsyncSession, after: Position, limit: int = EVENT_BATCH_SIZE) -> List[Dict]:
+    """Final events after `after`, in stream order."""
+    rows = (await db.execute(
+        select(
+            ModerationEvent.id,
+            ModerationEvent.tx_id,
+            ModerationEvent.event_type,
+            ModerationEvent.payload,
+            ModerationEvent.created_at
+        ).where(
+            tuple_(ModerationEvent.tx_id, ModerationEvent.id) > tuple_(*after),
+            ModerationEvent.tx_id < _HORIZON
+        ).order_by(ModerationEvent.tx_id, ModerationEvent.id).limit(limit)
+    )).all()
+    return [
+        {
+            "position": (row.tx_id, row.id),
+            "event_type": row.event_type,
+            "payload": row.payload,
+            "created_at": row.created_at
+        }
+        for row in rows
+    ]
+
+
+def format_event(moderation_event: Dict) -> str:
+    """One server-sent event."""
+    event_id = encode_position(moderation_event["position"])
+    data = json.dumps({
+        "id": event_id,
+        "event_type": moderation_event["event_type"],
+        "created_at": moderation_event["created_at"].isoformat(),
+        "payload": moderation_event["payload"]
+    })
+    return f"id: {event_id}\nevent: {moderation_event['event_type']}\ndata: {data}\n\n"
+
+
+class Subscription:
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        # Set when the stream fell too far behind; it ends and the dashboard resumes
+        self.overflowed = False
+
+
+class EventHub:
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        poll_seconds: float = EVENT_POLL_SECONDS,
+        queue_size: int = EVENT_QUEUE_SIZE,
+        retention_hours: int = EVENT_RETENTION_HOURS
+    ):
+        self.session_factory = session_factory
+        self.poll_seconds = poll_seconds
+        self.queue_size = queue_size
+        self.retention_hours = retention_hours
+
+        # Only touched from the event loop, so no lock
+        self._subscribers: Set[Subscription] = set()
+        self._position: Optional[Position] = None
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+        self.polls = 0
+        self.delivered = 0
+        self.overflows = 0
+        self.failures = 0
+        self.pruned = 0
+        self.last_poll_at: Optional[float] = None
+
+    def subscribe(self, start: Position) -> Subscription:
+        """
+        Receive the events after the hub's position, or after `start` when no
+        stream was open. Events up to the position at the time of subscribing
+        are the subscriber's to read from the outbox.
+        """
+        subscription = Subscription(self.queue_size)
+        if not self._subscribers:
+            self._position = start
+        self._subscribers.add(subscription)
+        self._wake.set()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+        if not self._subscribers:
+            # The next stream starts from its own position, not from a stale one
+            self._position = None
+
+    async def poll(self) -> int:
+        async with self.session_factory() as db:
+            events = await fetch_events(db, self._position)
+        self.polls += 1
+        self.last_poll_at = time.time()
+
+        for moderation_event in events:
+            for subscription in self._subscribers:
+                if subscription.overflowed:
+                    continue
+                try:
+                    subscription.queue.put_nowait(moderation_event)
+                except asyncio.QueueFull:
+                    subscription.overflowed = True
+                    self.overflows += 1
+        if events and self._subscribers:
+            self._position = events[-1]["position"]
+        self.delivered += len(events)
+        return len(events)
+
+    async def prune(self) -> int:
+        if self.retention_hours <= 0:
+            return 0
+        cutoff = datetime.utcnow() - timedelta(hours=self.retention_hours)
+        try:
+            async with self.session_factory() as db:
+                result = await db.execute(delete(ModerationEvent).where(ModerationEvent.created_at < cutoff))
+                await db.commit()
+        except Exception:
+            self.failures += 1
+            logger.exception("Pruning moderation events failed")
+            return 0
+        self.pruned += result.rowcount
+        return result.rowcount
+
+    async def _sleep(self, seconds: float) -> None:
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+        self._wake.clear()
+
+    async def _run(self) -> None:
+        next_prune = time.monotonic()
+        while not self._stopping:
+            if time.monotonic() >= next_prune:
+                await self.prune()
+                next_prune = time.monotonic() + PRUNE_INTERVAL_SECONDS
+
+            if not self._subscribers:
+                await self._sleep(max(next_prune - time.monotonic(), 0))
+                continue
+
+            try:
+                delivered = await self.poll()
+            except Exception:
+                self.failures += 1
+                logger.exception("Polling moderation events failed")
+                delivered = 0
+            # A full batch means more are waiting
+            if delivered < EVENT_BATCH_SIZE:
+                await self._sleep(self.poll_seconds)
+
+    def start(self) -> None:
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._stopping = True
+            self._wake.set()
+            await self._task
+            self._task = None
+
+    def snapshot(self) -> Dict:
+        return {
+            "streams": len(self._subscribers),
+            "position": encode_position(self._position) if self._position is not None else None,
+            "polls": self.polls,
+            "delivered": self.delivered,
+            "overflows": self.overflows,
+            "failures": self.failures,
+            "pruned": self.pruned,
+            "last_poll_at": self.last_poll_at,
+            "poll_seconds": self.poll_seconds
+        }
+
+
+event_hub = EventHub()
+
+
+async def stream_events(
+    after: Optional[Position] = None,
+    event_types: Optional[Set[str]] = None,
+    hub: EventHub = event_hub,
+    keepalive_seconds: float = EVENT_KEEPALIVE_SECONDS
+) -> AsyncIterator[str]:
+    """
+    Server-sent events after `after`, or from now on. The stream reads what it
+    missed from the outbox, then follows the hub, skipping what it already sent.
+    """
+    async with hub.session_factory() as db:
+        head = await head_position(db)
+        reset = after is not None and not await event_exists(db, after)
+    subscription = hub.subscribe(head)
+
+    try:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+        if reset:
+            # Events after `after` were pruned; the dashboard reloads its lists
+            yield f"event: reset\ndata: {json.dumps({'reason': 'Event id is no longer available'})}\n\n"
+        last = after if after is not None and not reset else head
+
+        while True:
+            async with hub.session_factory() as db:
+                events = await fetch_events(db, last)
+            for moderation_event in events:
+                last = moderation_event["position"]
+                if event_types is None or moderation_event["event_type"] in event_types:
+                    yield format_event(moderation_event)
+            if len(events) < EVENT_BATCH_SIZE:
+                break
+
+        while True:
+            if subscription.overflowed and subscription.queue.empty():
+                return
+            try:
+                moderation_event = await asyncio.wait_for(subscription.queue.get(), timeout=keepalive_seconds)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+                continue
+            if moderation_event["position"] <= last:
+                continue
+            last = moderation_event["position"]
+            if event_types is None or moderation_event["event_type"] in event_types:
+                yield format_event(moderation_event)
+    finally:
+        hub.unsubscribe(subscription)
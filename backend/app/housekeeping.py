@@ -0,0 +1,74 @@
+"""
+Periodic cleanup of tables that only ever grow.
+
+Each worker runs one Housekeeper. Every HOUSEKEEPING_INTERVAL_SECONDS it
+deletes idempotency keys older than IDEMPOTENCY_WINDOW_SECONDS. The deletes
+are indexed, batched and idempotent, so workers running them at the same
+time only share the work.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+from .database import AsyncSessionLocal
+from .services.idempotency import purge_submission_keys
+
+HOUSEKEEPING_INTERVAL_SECONDS = float(os.getenv("HOUSEKEEPING_INTERVAL_SECONDS", "3600"))
+
+logger = logging.getLogger(__name__)
+
+
+class Housekeeper:
+    def __init__(self, session_factory=AsyncSessionLocal, interval_seconds: float = HOUSEKEEPING_INTERVAL_SECONDS):
+        self.session_factory = session_factory
+        self.interval_seconds = interval_seconds
+
+        self._stop = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.runs = 0
+        self.failures = 0
+        self.purged_submission_keys = 0
+        self.last_run_at: Optional[float] = None
+
+    async def run_once(self) -> None:
+        try:
+            async with self.session_factory() as db:
+                self.purged_submission_keys += await purge_submission_keys(db)
+        except Exception:
+            self.failures += 1
+            logger.exception("Purging idempotency keys failed")
+        self.runs += 1
+        self.last_run_at = time.time()
+
+    async def _run(self) -> None:
+        while not self._stop.is_set():
+            await self.run_once()
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._stop.set()
+            await self._task
+            self._task = None
+
+    def snapshot(self) -> Dict:
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "purged_submission_keys": self.purged_submission_keys,
+            "last_run_at": self.last_run_at,
+            "interval_seconds": self.interval_seconds
+        }
+
+
+housekeeper = Housekeeper()
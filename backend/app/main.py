@@ -1,11 +1,41 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from .api import public, admin
+from .ai.pool import inference_pool
+from .counters import counter_buffer
+from .database import AsyncSessionLocal, ReadYourWritesMiddleware, pool_stats
+from .events import event_hub
+from .housekeeping import housekeeper
+from .metrics import METRICS_CONTENT_TYPE, MetricsMiddleware, registry, register_pool_metrics
+from .profiling import ProfilingMiddleware
+from .services.partitioning import reviews_partitioned
+from .services.reviews import configure_partition_pruning
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Store filters only once the review tables are partitioned; see migration 008
+    async with AsyncSessionLocal() as db:
+        configure_partition_pruning(await reviews_partitioned(db))
+    counter_buffer.start()
+    event_hub.start()
+    housekeeper.start()
+    # Replicas load their models in the background; requests wait for them on the pipes
+    inference_pool.start()
+    yield
+    await run_in_threadpool(inference_pool.stop)
+    await housekeeper.stop()
+    await event_hub.stop()
+    # Write buffered counters before the worker exits
+    await counter_buffer.stop()
 
 app = FastAPI(
     title="REVI - AI Review Moderation System",
     description="Automated review moderation using local AI models",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -16,6 +46,11 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(ProfilingMiddleware)
+# Outermost, so the recorded latency includes the other middleware
+app.add_middleware(MetricsMiddleware)
+register_pool_metrics(pool_stats)
 
 # Include routers
 app.include_router(public.router, prefix="/api", tags=["public"])
@@ -32,3 +67,8 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint for this worker process."""
+    return Response(registry.render(), media_type=METRICS_CONTENT_TYPE)
@@ -0,0 +1,256 @@
+"""
+Process-local metrics in the Prometheus text format.
+
+Request latency is recorded per route template by MetricsMiddleware, and the
+handlers time their own stages with `stage(...)`, so a slow submit can be
+split into lookups, inference, inserts and commit. Model batch sizes and
+cache hits are counted where they happen. Pool figures are read from
+pool_stats when /metrics is scraped.
+
+Recording a sample is a perf_counter pair, a bisect and a short lock, so the
+metrics stay on in production. Every worker process keeps its own series;
+scrape each worker, or let Prometheus sum them.
+"""
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from .pool_stats import WAIT_BUCKETS_MS
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds in seconds, from index lookups to cold model loads
+LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in sorted(values):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = list(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(series[0]), series[1], series[2]) for labels, series in self._series.items()]
+        for labels, counts, total, count in sorted(snapshot, key=lambda item: item[0]):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + [math.inf], counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class GaugeCollector:
+    """Gauges read from a callback at scrape time; collect() returns (labels, value) pairs."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], collect: Callable, kind: str = "gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+        self.kind = kind
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in self.collect():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+request_seconds = registry.register(Histogram(
+    "revi_http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ["method", "route", "status"]
+))
+stage_seconds = registry.register(Histogram(
+    "revi_stage_duration_seconds",
+    "Time spent in each stage of a request handler or pipeline.",
+    ["endpoint", "stage"]
+))
+model_batch_size = registry.register(Histogram(
+    "revi_model_batch_size",
+    "Number of texts per model call.",
+    ["model"],
+    buckets=BATCH_SIZE_BUCKETS
+))
+cache_requests = registry.register(Counter(
+    "revi_cache_requests_total",
+    "Cache lookups by cache and result (hit or miss).",
+    ["cache", "result"]
+))
+
+
+@contextmanager
+def stage(endpoint: str, name: str):
+    """Time a block as one stage of endpoint; failed stages are recorded too."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - started, endpoint, name)
+
+
+def record_cache(cache: str, hits: int, misses: int) -> None:
+    if hits:
+        cache_requests.inc(cache, "hit", amount=hits)
+    if misses:
+        cache_requests.inc(cache, "miss", amount=misses)
+
+
+def register_pool_metrics(pool_stats: Dict) -> None:
+    """Export the PoolStats of each engine as gauges and counters read at scrape time."""
+    def snapshots():
+        return [stats.snapshot() for stats in pool_stats.values()]
+
+    for key, name, documentation, kind in [
+        ("pool_size", "revi_db_pool_size", "Configured connection pool size.", "gauge"),
+        ("in_use", "revi_db_pool_in_use", "Connections checked out of the pool.", "gauge"),
+        ("idle", "revi_db_pool_idle", "Idle connections in the pool.", "gauge"),
+        ("overflow", "revi_db_pool_overflow", "Connections open beyond pool_size.", "gauge"),
+        ("checkouts", "revi_db_pool_checkouts_total", "Connections checked out by request sessions.", "counter"),
+        ("overflow_events", "revi_db_pool_overflow_events_total", "Connections opened beyond pool_size.", "counter"),
+        ("timeouts", "revi_db_pool_timeouts_total", "Checkouts that timed out waiting for a connection.", "counter"),
+    ]:
+        registry.register(GaugeCollector(
+            name, documentation, ["engine"],
+            lambda key=key: [((snapshot["engine"],), snapshot[key]) for snapshot in snapshots()],
+            kind=kind
+        ))
+
+    # Wait times are already bucketed by PoolStats; export them as a histogram in seconds
+    registry.register(_PoolWaitHistogram(pool_stats))
+
+
+class _PoolWaitHistogram:
+    name = "revi_db_pool_wait_seconds"
+
+    def __init__(self, pool_stats: Dict):
+        self.pool_stats = pool_stats
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} Time request sessions waited for a pooled connection.",
+            f"# TYPE {self.name} histogram"
+        ]
+        for stats in self.pool_stats.values():
+            cumulative = 0
+            for bound_ms, bucket_count in zip(WAIT_BUCKETS_MS + [math.inf], stats.wait_buckets):
+                cumulative += bucket_count
+                bound = bound_ms if bound_ms == math.inf else bound_ms / 1000
+                lines.append(f'{self.name}_bucket{{engine="{stats.name}",le="{_format_value(bound)}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{engine="{stats.name}"}} {_format_value(stats.wait_seconds_total)}')
+            lines.append(f'{self.name}_count{{engine="{stats.name}"}} {stats.checkouts}')
+        return lines
+
+
+class MetricsMiddleware:
+    """
+    Records the latency of every HTTP request, labelled with the matched
+    route template rather than the raw path so product ids do not create series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            request_seconds.observe(
+                time.perf_counter() - started,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status[0])
+            )
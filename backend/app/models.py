@@ -1,10 +1,35 @@
-from sqlalchemy import Column, String, Integer, Numeric, Boolean, DateTime, ARRAY, Text, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Integer, BigInteger, Numeric, Float, Boolean, Date, DateTime, ARRAY, Text, ForeignKey, text
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR, UUID
+from sqlalchemy.orm import deferred, relationship
+from sqlalchemy.types import UserDefinedType
 from datetime import datetime
 import uuid
 from .database import Base
 
+class Vector(UserDefinedType):
+    """pgvector column, exchanged with the driver in its '[x,y,...]' text form."""
+    cache_ok = True
+    
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+    
+    def get_col_spec(self, **kw):
+        return f"vector({self.dimensions})"
+    
+    def bind_processor(self, dialect):
+        def process(value):
+            if value is None or isinstance(value, str):
+                return value
+            return "[" + ",".join(str(float(x)) for x in value) + "]"
+        return process
+    
+    def result_processor(self, dialect, coltype):
+        def process(value):
+            if value is None or not isinstance(value, str):
+                return value
+            return [float(x) for x in value.strip("[]").split(",")]
+        return process
+
 class Store(Base):
     __tablename__ = "stores"
     
@@ -55,6 +80,8 @@ class BaseReview(Base):
     __tablename__ = "base_reviews"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # Partition key, copied from the product; the table's primary key is (id, store_id)
+    store_id = Column(UUID(as_uuid=True), nullable=False)
     product_id = Column(UUID(as_uuid=True), ForeignKey("products.id", ondelete="CASCADE"))
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"))
     reviewer_name = Column(String(255))
@@ -65,6 +92,8 @@ class BaseReview(Base):
     is_verified_purchase = Column(Boolean, default=False)
     submitted_at = Column(DateTime, default=datetime.utcnow)
     ip_address = Column(String(45))
+    # Filled by a database trigger from review_text; only used in search filters
+    search_vector = deferred(Column(TSVECTOR))
     
     product = relationship("Product", back_populates="reviews")
     user = relationship("User", back_populates="reviews")
@@ -77,6 +106,7 @@ class ReviewAnalysis(Base):
     __tablename__ = "review_analysis"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    store_id = Column(UUID(as_uuid=True), nullable=False)  # Partition key, the review's store_id
     review_id = Column(UUID(as_uuid=True), ForeignKey("base_reviews.id", ondelete="CASCADE"), unique=True)
     category = Column(String(50), nullable=False)
     confidence = Column(Numeric(3, 2))
@@ -98,6 +128,7 @@ class PublishedReview(Base):
     __tablename__ = "published_reviews"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    store_id = Column(UUID(as_uuid=True), nullable=False)  # Partition key, the review's store_id
     review_id = Column(UUID(as_uuid=True), ForeignKey("base_reviews.id", ondelete="CASCADE"))
     analysis_id = Column(UUID(as_uuid=True), ForeignKey("review_analysis.id", ondelete="CASCADE"))
     is_shadow = Column(Boolean, default=False)
@@ -154,4 +185,76 @@ class AdminAction(Base):
     reason = Column(Text)
     old_value = Column(Text)
     new_value = Column(Text)
-    performed_at = Column(DateTime, default=datetime.utcnow)
+    # Partition key, by month; the table's primary key is (id, performed_at)
+    performed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class ProductReviewFeed(Base):
+    __tablename__ = "product_review_feed"
+    
+    review_id = Column(UUID(as_uuid=True), ForeignKey("base_reviews.id", ondelete="CASCADE"), primary_key=True)
+    product_id = Column(UUID(as_uuid=True), ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    tab = Column(String(20), nullable=False)
+    is_shadow = Column(Boolean, nullable=False, default=False)
+    value_score = Column(Float, nullable=False, default=0)
+    category = Column(String(50), nullable=False)
+    reviewer_name = Column(String(255), nullable=False)
+    rating = Column(Integer, nullable=False)
+    review_text = Column(Text, nullable=False)
+    is_verified_purchase = Column(Boolean, nullable=False, default=False)
+    submitted_at = Column(DateTime, nullable=False)
+    automatic_response = Column(Text)
+    helpful_count = Column(Integer, nullable=False, default=0)
+
+class SubmissionKey(Base):
+    __tablename__ = "review_submission_keys"
+    
+    key = Column(String(160), primary_key=True)  # 'header:<hash of Idempotency-Key, product, reviewer>' or 'hash:<fingerprint>'
+    request_hash = Column(String(64), nullable=False)
+    review_id = Column(UUID(as_uuid=True), ForeignKey("base_reviews.id", ondelete="CASCADE"))
+    response = Column(JSONB)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class ReviewEmbedding(Base):
+    __tablename__ = "review_embeddings"
+    
+    review_id = Column(UUID(as_uuid=True), ForeignKey("base_reviews.id", ondelete="CASCADE"), primary_key=True)
+    product_id = Column(UUID(as_uuid=True), ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    embedding = Column(Vector(384), nullable=False)  # EMBEDDING_DIMENSIONS of app.ai.embeddings
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ModerationStats(Base):
+    __tablename__ = "moderation_stats_daily"
+    
+    day = Column(Date, primary_key=True)  # UTC submission day
+    product_id = Column(UUID(as_uuid=True), ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    category = Column(String(50), primary_key=True)
+    severity = Column(String(20), primary_key=True)  # 'unknown' when not classified
+    language = Column(String(10), primary_key=True)  # 'unknown' for reviews stored before detection
+    store_id = Column(UUID(as_uuid=True), ForeignKey("stores.id", ondelete="CASCADE"))
+    review_count = Column(Integer, nullable=False, default=0)
+
+class ReclassificationJob(Base):
+    __tablename__ = "reclassification_jobs"
+    
+    name = Column(String(100), primary_key=True)
+    dry_run = Column(Boolean, nullable=False)
+    product_id = Column(UUID(as_uuid=True))  # Only this product's reviews, when set
+    last_review_id = Column(UUID(as_uuid=True))  # Checkpoint; reviews are processed in id order
+    processed = Column(Integer, nullable=False, default=0)
+    flipped = Column(Integer, nullable=False, default=0)
+    applied = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)
+    flips = Column(JSONB, nullable=False, default=dict)  # {"old->new": count}
+    started_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime)
+
+class ModerationEvent(Base):
+    __tablename__ = "moderation_events"
+    
+    id = Column(BigInteger, primary_key=True)
+    # Writing transaction, set by the database; events are read in (tx_id, id) order
+    tx_id = Column(BigInteger, nullable=False, server_default=text("CAST(CAST(pg_current_xact_id() AS TEXT) AS BIGINT)"))
+    event_type = Column(String(50), nullable=False)
+    payload = Column(JSONB, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
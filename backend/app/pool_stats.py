@@ -0,0 +1,63 @@
+"""
+Per-engine connection pool instrumentation.
+
+Checkout wait is measured where request sessions acquire their connection.
+Pool size, in-use connections and overflow come from the pool itself, and
+overflow events are counted whenever a connection beyond pool_size is opened.
+"""
+from typing import Dict
+
+from sqlalchemy import event
+
+# Upper bounds of the checkout wait histogram, in milliseconds
+WAIT_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000]
+
+
+class PoolStats:
+    def __init__(self, name: str, engine):
+        self.name = name
+        self.engine = engine
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.overflow_events = 0
+        self.timeouts = 0
+
+        # Listeners on the engine carry over to pools recreated by dispose()
+        event.listen(engine.sync_engine, "connect", self._on_connect)
+
+    def _on_connect(self, dbapi_connection, connection_record) -> None:
+        if self.engine.pool.overflow() > 0:
+            self.overflow_events += 1
+
+    def record_wait(self, seconds: float) -> None:
+        self.checkouts += 1
+        self.wait_seconds_total += seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+        wait_ms = seconds * 1000
+        for index, bound in enumerate(WAIT_BUCKETS_MS):
+            if wait_ms <= bound:
+                self.wait_buckets[index] += 1
+                return
+        self.wait_buckets[-1] += 1
+
+    def snapshot(self) -> Dict:
+        pool = self.engine.pool
+        return {
+            "engine": self.name,
+            "pool_size": pool.size(),
+            "in_use": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "checkouts": self.checkouts,
+            "avg_wait_ms": round(self.wait_seconds_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "max_wait_ms": round(self.wait_seconds_max * 1000, 3),
+            "wait_histogram_ms": {
+                **{f"le_{bound}": count for bound, count in zip(WAIT_BUCKETS_MS, self.wait_buckets)},
+                "inf": self.wait_buckets[-1]
+            },
+            "overflow_events": self.overflow_events,
+            "timeouts": self.timeouts
+        }
@@ -0,0 +1,243 @@
+"""
+On-demand request profiling.
+
+A request is profiled when it carries the header X-Revi-Profile with the
+value of PROFILING_TOKEN, or when it is picked by PROFILE_SAMPLE_RATE
+(optionally only under PROFILE_SAMPLE_PATH_PREFIX). A profiled request runs
+under cProfile with tracemalloc tracing, and the result is stored in
+PROFILE_DIR as a pstats dump plus a JSON summary with the hottest functions,
+the top allocation sites and peak traced memory. The response carries the
+profile id in X-Revi-Profile-Id; /api/admin/profiles lists and serves them
+to requests that send X-Revi-Profile-Token: <PROFILING_TOKEN>.
+
+Requests that are not profiled only pay a header lookup. cProfile follows the
+event loop thread, so coroutines of concurrent requests on the same worker
+show up in the profile too, and work handed to the threadpool (model
+inference) shows up as the wait for it. One request per worker is profiled at
+a time; other requests that ask meanwhile are served unprofiled and get
+X-Revi-Profile-Id: busy.
+"""
+import cProfile
+import hmac
+import json
+import os
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from fastapi import Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+
+# Header-triggered profiling is disabled while no token is configured
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+PROFILE_HEADER = b"x-revi-profile"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SAMPLE_PATH_PREFIX = os.getenv("PROFILE_SAMPLE_PATH_PREFIX", "/")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/revi-profiles")
+# Oldest profiles are deleted beyond this many
+PROFILE_MAX_STORED = int(os.getenv("PROFILE_MAX_STORED", "50"))
+PROFILE_TOP_FUNCTIONS = 40
+PROFILE_TOP_ALLOCATIONS = 25
+
+
+class ProfileStore:
+    """Profiles on disk: <id>.prof (pstats) and <id>.json (summary)."""
+
+    def __init__(self, directory: str, max_stored: int):
+        self.directory = directory
+        self.max_stored = max_stored
+
+    def path(self, profile_id: str, suffix: str) -> Optional[str]:
+        # Ids are uuid4 hex; anything else cannot name a stored profile
+        if len(profile_id) != 32 or not all(c in "0123456789abcdef" for c in profile_id):
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.{suffix}")
+        return path if os.path.exists(path) else None
+
+    def save(self, profile_id: str, profiler: cProfile.Profile, summary: Dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        profiler.dump_stats(os.path.join(self.directory, f"{profile_id}.prof"))
+        summary["functions"] = _top_functions(profiler)
+        with open(os.path.join(self.directory, f"{profile_id}.json"), "w") as handle:
+            json.dump(summary, handle)
+        self._prune()
+
+    def _prune(self) -> None:
+        summaries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in summaries[:max(len(summaries) - self.max_stored, 0)]:
+            profile_id = entry.name[:-len(".json")]
+            for suffix in ("json", "prof"):
+                try:
+                    os.remove(os.path.join(self.directory, f"{profile_id}.{suffix}"))
+                except FileNotFoundError:
+                    pass
+
+    def list(self) -> List[Dict]:
+        """Summaries without the function and allocation tables, newest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        summaries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                with open(entry.path) as handle:
+                    summary = json.load(handle)
+            except (OSError, ValueError):
+                continue
+            summary.pop("functions", None)
+            summary.pop("allocations", None)
+            summaries.append(summary)
+        summaries.sort(key=lambda summary: summary["started_at"], reverse=True)
+        return summaries
+
+    def summary(self, profile_id: str) -> Optional[Dict]:
+        path = self.path(profile_id, "json")
+        if path is None:
+            return None
+        with open(path) as handle:
+            return json.load(handle)
+
+
+def _top_functions(profiler: cProfile.Profile) -> List[Dict]:
+    stats = pstats.Stats(profiler).sort_stats("cumulative")
+    functions = []
+    for func in stats.fcn_list[:PROFILE_TOP_FUNCTIONS]:
+        primitive_calls, calls, own_time, cumulative_time, _ = stats.stats[func]
+        filename, line, name = func
+        functions.append({
+            "function": f"{filename}:{line}({name})",
+            "calls": calls,
+            "primitive_calls": primitive_calls,
+            "own_ms": round(own_time * 1000, 3),
+            "cumulative_ms": round(cumulative_time * 1000, 3)
+        })
+    return functions
+
+
+def _top_allocations(snapshot: tracemalloc.Snapshot) -> List[Dict]:
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    ])
+    return [
+        {
+            "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "size_kb": round(stat.size / 1024, 1),
+            "count": stat.count
+        }
+        for stat in snapshot.statistics("lineno")[:PROFILE_TOP_ALLOCATIONS]
+    ]
+
+
+profile_store = ProfileStore(PROFILE_DIR, PROFILE_MAX_STORED)
+
+
+def _token_matches(value: bytes) -> bool:
+    return bool(PROFILING_TOKEN) and hmac.compare_digest(value, PROFILING_TOKEN.encode())
+
+
+def require_profiling_token(x_revi_profile_token: Optional[str] = Header(None)) -> None:
+    """
+    Route dependency for the stored profiles, which show source paths and
+    request query strings. They are hidden while no token is configured.
+    """
+    if not PROFILING_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_revi_profile_token is None or not _token_matches(x_revi_profile_token.encode()):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+
+class ProfilingMiddleware:
+    """Profiles requests that ask for it with the token, or are sampled."""
+
+    def __init__(self, app, store: ProfileStore = profile_store):
+        self.app = app
+        self.store = store
+        self._active = threading.Lock()
+
+    def _wants_profile(self, scope) -> bool:
+        if PROFILING_TOKEN:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER:
+                    return _token_matches(value)
+        if PROFILE_SAMPLE_RATE > 0 and scope["path"].startswith(PROFILE_SAMPLE_PATH_PREFIX):
+            return random.random() < PROFILE_SAMPLE_RATE
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if not self._active.acquire(blocking=False):
+            async def send_busy(message):
+                if message["type"] == "http.response.start":
+                    MutableHeaders(scope=message).append("x-revi-profile-id", "busy")
+                await send(message)
+
+            await self.app(scope, receive, send_busy)
+            return
+
+        try:
+            await self._profile(scope, receive, send)
+        finally:
+            self._active.release()
+
+    async def _profile(self, scope, receive, send):
+        profile_id = uuid.uuid4().hex
+        status = [500]
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                MutableHeaders(scope=message).append("x-revi-profile-id", profile_id)
+            await send(message)
+
+        # Leave tracing on if the process was started with PYTHONTRACEMALLOC
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        traced_before = tracemalloc.get_traced_memory()[0]
+
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.disable()
+            duration = time.perf_counter() - started
+            traced_after, traced_peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            if not was_tracing:
+                tracemalloc.stop()
+
+            summary = {
+                "id": profile_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope.get("query_string", b"").decode("latin-1"),
+                "status": status[0],
+                "started_at": started_at.isoformat(),
+                "duration_ms": round(duration * 1000, 3),
+                "memory": {
+                    "allocated_kb": round((traced_after - traced_before) / 1024, 1),
+                    "peak_kb": round((traced_peak - traced_before) / 1024, 1)
+                },
+                "allocations": _top_allocations(snapshot)
+            }
+            # The response is already sent; writing the files does not delay it
+            await run_in_threadpool(self.store.save, profile_id, profiler, summary)
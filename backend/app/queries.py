@@ -0,0 +1,38 @@
+"""
+Column expressions shared by the list endpoints.
+
+List queries select only the columns a response needs, labelled with the
+response field names, so each result row maps straight onto the JSON object
+without loading ORM entities. Conversions that used to happen per row in
+Python (UUID to str, Numeric to float, the "Anonymous" fallback) are done in
+SQL, and datetimes are left for orjson to serialize.
+"""
+from typing import Dict, List
+
+from sqlalchemy import Float, String, cast, func
+
+
+def as_str(column, label: str = None):
+    """UUID column as text; asyncpg's UUID type is not serializable by orjson."""
+    return cast(column, String).label(label or column.key)
+
+
+def reviewer_name(column, label: str = "reviewer_name"):
+    """Reviewer name with the "Anonymous" fallback for empty or missing names."""
+    return func.coalesce(func.nullif(column, ""), "Anonymous").label(label)
+
+
+def as_float(column, label: str, default=None):
+    """
+    Numeric column as a float. Zero and NULL both become `default`, matching
+    the `float(x) if x else default` conversions the endpoints used before.
+    """
+    value = func.nullif(cast(column, Float), 0)
+    if default is not None:
+        value = func.coalesce(value, default)
+    return value.label(label)
+
+
+def rows_as_dicts(result) -> List[Dict]:
+    """Plain dicts from a labelled projection, ready for ORJSONResponse."""
+    return [dict(row) for row in result.mappings()]
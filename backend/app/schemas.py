@@ -1,8 +1,10 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List
 from datetime import datetime
 from uuid import UUID
 
+from .utils.timestamps import to_naive_utc
+
 class ReviewSubmission(BaseModel):
     product_id: str
     reviewer_name: Optional[str] = None
@@ -11,6 +13,17 @@ class ReviewSubmission(BaseModel):
     review_text: str
     is_verified_purchase: bool = False
 
+class ReviewImportRow(ReviewSubmission):
+    # Historical reviews keep their original submission date
+    submitted_at: Optional[datetime] = None
+    
+    # Exports usually carry an offset; submitted_at is stored as naive UTC
+    _submitted_at_utc = field_validator("submitted_at")(to_naive_utc)
+
+class ReviewViews(BaseModel):
+    # Reviews shown on one page view
+    review_ids: List[UUID] = Field(..., min_length=1, max_length=100)
+
 class ReviewAnalysisResult(BaseModel):
     review_id: str
     category: str
@@ -93,3 +106,22 @@ class ReviewOverride(BaseModel):
     new_category: str
     reason: str
     admin_user: str
+
+class BulkOverrideFilter(BaseModel):
+    product_id: Optional[UUID] = None
+    category: Optional[str] = None
+    rating: Optional[int] = Field(None, ge=1, le=5)
+    # Full-text query, as in the review search
+    q: Optional[str] = Field(None, min_length=1, max_length=200)
+    submitted_from: Optional[datetime] = None
+    submitted_to: Optional[datetime] = None
+    
+    # submitted_at is TIMESTAMP; bounds with an offset are compared in UTC
+    _submitted_utc = field_validator("submitted_from", "submitted_to")(to_naive_utc)
+
+class BulkReviewOverride(ReviewOverride):
+    # Either explicit ids or a filter; ids are reported one by one, so bad ids do not fail the batch
+    review_ids: Optional[List[str]] = Field(None, min_length=1, max_length=10000)
+    filter: Optional[BulkOverrideFilter] = None
+    # Most reviews a filter overrides in one request, newest first
+    limit: int = Field(1000, ge=1, le=10000)
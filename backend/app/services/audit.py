@@ -0,0 +1,250 @@
+"""
+Append-only audit log of admin and job actions (admin_actions).
+
+record() and record_many() buffer entries on the database session. They are
+written as one multi-row INSERT right before the session commits, inside the
+transaction of the change they describe, so an entry is stored exactly when
+its action is and a rolled back action leaves none. A database trigger
+rejects updates and deletes.
+
+admin_actions is range partitioned by month of performed_at:
+
+- ensure_partitions creates the partitions of the coming months, and of any
+  month whose entries fell into the default partition;
+- archive_partitions exports every month older than the retention to a
+  gzipped CSV file, checks the row count, then detaches and drops the
+  partition. The file is complete before the partition goes, so an
+  interrupted run loses nothing and can be repeated.
+"""
+import base64
+import gzip
+import json
+import os
+import re
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import desc, event, insert, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..models import AdminAction
+from ..queries import as_str, rows_as_dicts
+
+AUDIT_PARTITIONS_AHEAD = int(os.getenv("AUDIT_PARTITIONS_AHEAD", "3"))
+# Months of entries kept in the database; 0 keeps everything
+AUDIT_RETENTION_MONTHS = int(os.getenv("AUDIT_RETENTION_MONTHS", "0"))
+AUDIT_ARCHIVE_DIR = os.getenv("AUDIT_ARCHIVE_DIR", "/var/lib/revi/audit-archive")
+
+PARTITION_NAME = re.compile(r"^admin_actions_(\d{4})_(\d{2})$")
+
+_PENDING_KEY = "audit_entries"
+
+
+def record(
+    db: AsyncSession,
+    admin_user: str,
+    action_type: str,
+    target_type: str,
+    target_id: UUID,
+    reason: Optional[str] = None,
+    old_value: Optional[str] = None,
+    new_value: Optional[str] = None
+) -> None:
+    """Add an audit entry to the session's next commit."""
+    record_many(db, [{
+        "admin_user": admin_user,
+        "action_type": action_type,
+        "target_type": target_type,
+        "target_id": target_id,
+        "reason": reason,
+        "old_value": old_value,
+        "new_value": new_value
+    }])
+
+
+def record_many(db: AsyncSession, entries: List[Dict]) -> None:
+    """Add audit entries, dicts of AdminAction columns, to the session's next commit."""
+    db.info.setdefault(_PENDING_KEY, []).extend(entries)
+
+
+@event.listens_for(Session, "before_commit")
+def _write_entries(session):
+    entries = session.info.pop(_PENDING_KEY, None)
+    if entries:
+        # Executemany inserts are batched into multi-row VALUES statements
+        session.execute(insert(AdminAction), entries)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_entries(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def encode_cursor(performed_at: datetime, action_id: str) -> str:
+    payload = json.dumps([performed_at.isoformat(), action_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """(performed_at, id) of the last entry of the previous page; raises ValueError if malformed."""
+    try:
+        performed_at, action_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(performed_at), UUID(action_id)
+    except (TypeError, ValueError, UnicodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+async def audit_history(
+    db: AsyncSession,
+    target_id: Optional[UUID] = None,
+    admin_user: Optional[str] = None,
+    target_type: Optional[str] = None,
+    action_type: Optional[str] = None,
+    performed_from: Optional[datetime] = None,
+    performed_to: Optional[datetime] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    One page of a target's or an admin's entries, newest first, and the cursor
+    of the next page (None on the last page). Each partition walks its
+    (target_id | admin_user, performed_at, id) index, and a time range skips
+    the other months' partitions.
+    """
+    if target_id is None and admin_user is None:
+        raise ValueError("Provide target_id or admin_user")
+
+    filters = []
+    if target_id is not None:
+        filters.append(AdminAction.target_id == target_id)
+    if admin_user is not None:
+        filters.append(AdminAction.admin_user == admin_user)
+    if target_type is not None:
+        filters.append(AdminAction.target_type == target_type)
+    if action_type is not None:
+        filters.append(AdminAction.action_type == action_type)
+    if performed_from is not None:
+        filters.append(AdminAction.performed_at >= performed_from)
+    if performed_to is not None:
+        filters.append(AdminAction.performed_at < performed_to)
+    if cursor is not None:
+        filters.append(tuple_(AdminAction.performed_at, AdminAction.id) < tuple_(*decode_cursor(cursor)))
+
+    query = select(
+        as_str(AdminAction.id),
+        AdminAction.admin_user,
+        AdminAction.action_type,
+        AdminAction.target_type,
+        as_str(AdminAction.target_id),
+        AdminAction.reason,
+        AdminAction.old_value,
+        AdminAction.new_value,
+        AdminAction.performed_at
+    ).filter(*filters).order_by(
+        desc(AdminAction.performed_at), desc(AdminAction.id)
+    ).limit(limit + 1)
+
+    entries = rows_as_dicts(await db.execute(query))
+
+    next_cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        next_cursor = encode_cursor(entries[-1]["performed_at"], entries[-1]["id"])
+    return entries, next_cursor
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+async def monthly_partitions(db: AsyncSession) -> List[Tuple[str, date]]:
+    """(name, first day) of every monthly partition, oldest first."""
+    names = (await db.execute(text("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = CAST('admin_actions' AS REGCLASS)
+    """))).scalars().all()
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+async def ensure_partitions(db: AsyncSession, months_ahead: int = AUDIT_PARTITIONS_AHEAD) -> List[str]:
+    """Create missing partitions through `months_ahead` months from now; returns the created ones."""
+    this_month = datetime.utcnow().date().replace(day=1)
+    months = {add_months(this_month, offset) for offset in range(months_ahead + 1)}
+    # Months whose entries went to the default partition; creating their partition moves them
+    months.update((await db.execute(text("""
+        SELECT DISTINCT CAST(date_trunc('month', performed_at) AS DATE)
+        FROM admin_actions_default
+        WHERE performed_at > '-infinity' AND performed_at < 'infinity'
+    """))).scalars().all())
+
+    existing = {month for _, month in await monthly_partitions(db)}
+    created = []
+    for month in sorted(months - existing):
+        created.append((await db.execute(
+            text("SELECT admin_actions_create_partition(:month)"), {"month": month}
+        )).scalar_one())
+    await db.commit()
+    return created
+
+
+async def archive_partition(db: AsyncSession, name: str, archive_dir: str, lock_timeout: str = "5s") -> Dict:
+    """Export one partition to <archive_dir>/<name>.csv.gz, then detach and drop it."""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.csv.gz")
+    partial_path = f"{path}.partial"
+
+    await db.execute(text("SELECT set_config('lock_timeout', :timeout, true)"), {"timeout": lock_timeout})
+    # Nothing is written to the month while it is exported; old months get no writes anyway
+    await db.execute(text(f"LOCK TABLE {name} IN SHARE MODE"))
+    rows = (await db.execute(text(f"SELECT count(*) FROM {name}"))).scalar_one()
+
+    connection = await (await db.connection()).get_raw_connection()
+    with open(partial_path, "wb") as raw_file:
+        with gzip.GzipFile(fileobj=raw_file, mode="wb") as archive:
+            status = await connection.driver_connection.copy_from_table(
+                name, output=archive, format="csv", header=True
+            )
+        raw_file.flush()
+        os.fsync(raw_file.fileno())
+    exported = int(status.split()[-1])
+    if exported != rows:
+        await db.rollback()
+        os.remove(partial_path)
+        raise RuntimeError(f"{name}: exported {exported} rows, expected {rows}; partition kept")
+    os.replace(partial_path, path)
+
+    await db.execute(text(f"ALTER TABLE admin_actions DETACH PARTITION {name}"))
+    await db.execute(text(f"DROP TABLE {name}"))
+    await db.commit()
+    return {"partition": name, "rows": rows, "path": path, "bytes": os.path.getsize(path)}
+
+
+async def archive_partitions(
+    db: AsyncSession,
+    retention_months: int = AUDIT_RETENTION_MONTHS,
+    archive_dir: str = AUDIT_ARCHIVE_DIR,
+    lock_timeout: str = "5s"
+) -> List[Dict]:
+    """Archive the months that ended more than `retention_months` months ago, oldest first."""
+    if retention_months <= 0:
+        return []
+    cutoff = add_months(datetime.utcnow().date().replace(day=1), -retention_months)
+    partitions = await monthly_partitions(db)
+    await db.commit()
+
+    archived = []
+    for name, month in partitions:
+        if month >= cutoff:
+            break
+        archived.append(await archive_partition(db, name, archive_dir, lock_timeout))
+    return archived
@@ -0,0 +1,331 @@
+"""
+Bulk review ingestion for store migrations.
+
+Rows are streamed from NDJSON or CSV and validated against ReviewImportRow.
+Valid rows are processed in chunks. Each chunk does one user upsert, one
+batched classification pass and one multi-row insert per result table, then
+commits. A bad row is reported and skipped. A chunk that fails to write is
+rolled back and reported, and the import carries on with the next chunk.
+"""
+import csv
+import io
+import json
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..events import publish_events
+from ..models import Product, User, BaseReview, ReviewAnalysis, PublishedReview, SupportTicket
+from ..schemas import ReviewImportRow
+from ..ai.pool import analyze_reviews, inference_pool
+from .feed import add_to_feed
+from .semantic_search import add_embeddings
+from .stats import add_to_stats
+from .reviews import product_context, score_review, analysis_values, routing_values
+
+IMPORT_FORMATS = ["ndjson", "csv"]
+DEFAULT_CHUNK_SIZE = 500
+INFERENCE_BATCH_SIZE = 32
+INVALID_CHARACTER = "\ufffd"
+
+
+def detect_import_format(filename: Optional[str], requested_format: Optional[str] = None) -> str:
+    """Resolve the upload format from an explicit choice or the file extension."""
+    if requested_format:
+        import_format = requested_format.lower()
+    elif filename and filename.lower().endswith(".csv"):
+        import_format = "csv"
+    else:
+        import_format = "ndjson"
+
+    if import_format not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format: {requested_format}. Use one of: {', '.join(IMPORT_FORMATS)}")
+
+    return import_format
+
+
+def parse_import_rows(stream, import_format: str) -> Iterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    """
+    Lazily decode a binary stream into rows.
+
+    Yields:
+        (row_number, data, error) - exactly one of data and error is set
+    """
+    # Undecodable bytes become U+FFFD so only the rows containing them fail
+    lines = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline="")
+
+    if import_format == "csv":
+        reader = csv.DictReader(lines)
+        for data in reader:
+            # DictReader puts the cells beyond the header under the None key
+            if None in data:
+                yield reader.line_num, None, "Too many fields"
+                continue
+            if any(isinstance(value, str) and INVALID_CHARACTER in value for value in data.values()):
+                yield reader.line_num, None, "Invalid UTF-8"
+                continue
+            # Empty cells fall back to the schema defaults
+            yield reader.line_num, {key: value for key, value in data.items() if value not in ("", None)}, None
+        return
+
+    for row_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        if INVALID_CHARACTER in line:
+            yield row_number, None, "Invalid UTF-8"
+            continue
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield row_number, None, f"Invalid JSON: {exc.msg}"
+            continue
+        if not isinstance(data, dict):
+            yield row_number, None, "Each line must be a JSON object"
+            continue
+        yield row_number, data, None
+
+
+def _format_validation_error(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+        for error in exc.errors()
+    )
+
+
+class BulkReviewImporter:
+    """
+    Runs an import over parsed rows and yields progress events.
+
+    Events are dicts with an "event" key of "error", "progress" or "summary".
+    """
+
+    def __init__(self, db: AsyncSession, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.db = db
+        self.chunk_size = chunk_size
+        self.processed = 0
+        self.imported = 0
+        self.failed = 0
+        self._products = {}
+
+    async def run(self, rows: Iterable[Tuple[int, Optional[Dict], Optional[str]]]) -> AsyncIterator[Dict]:
+        chunk = []
+
+        for row_number, data, error in rows:
+            self.processed += 1
+
+            if error is None:
+                try:
+                    row = ReviewImportRow(**data)
+                    product_uuid = UUID(row.product_id)
+                except ValidationError as exc:
+                    error = _format_validation_error(exc)
+                except ValueError:
+                    error = "Invalid product ID format"
+                except TypeError:
+                    error = "Invalid field names"
+
+            if error is not None:
+                yield self._error(row_number, error)
+                continue
+
+            chunk.append((row_number, row, product_uuid))
+            if len(chunk) >= self.chunk_size:
+                for chunk_error in await self._process_chunk(chunk):
+                    yield chunk_error
+                yield self._progress("progress")
+                chunk = []
+
+        if chunk:
+            for chunk_error in await self._process_chunk(chunk):
+                yield chunk_error
+
+        yield self._progress("summary")
+
+    def _error(self, row_number: int, detail: str) -> Dict:
+        self.failed += 1
+        return {"event": "error", "row": row_number, "detail": detail}
+
+    def _progress(self, event: str) -> Dict:
+        return {
+            "event": event,
+            "processed": self.processed,
+            "imported": self.imported,
+            "failed": self.failed
+        }
+
+    async def _process_chunk(self, chunk: List[Tuple[int, ReviewImportRow, UUID]]) -> List[Dict]:
+        await self._load_products({product_uuid for _, _, product_uuid in chunk})
+
+        errors = []
+        valid = []
+        for row_number, row, product_uuid in chunk:
+            if product_uuid not in self._products:
+                errors.append(self._error(row_number, "Product not found"))
+            else:
+                valid.append((row_number, row, self._products[product_uuid]))
+
+        if not valid:
+            return errors
+
+        try:
+            analyses = await self._analyze(valid)
+            user_ids = await self._upsert_users([row for _, row, _ in valid])
+            await self._write_reviews(valid, analyses, user_ids)
+            await self.db.commit()
+        except Exception as exc:
+            await self.db.rollback()
+            for row_number, _, _ in valid:
+                errors.append(self._error(row_number, f"Chunk failed: {exc}"))
+            return errors
+
+        self.imported += len(valid)
+        return errors
+
+    async def _load_products(self, product_ids) -> None:
+        missing = [product_id for product_id in product_ids if product_id not in self._products]
+        if not missing:
+            return
+
+        # Plain rows instead of entities so they survive commits without refreshes
+        rows = (await self.db.execute(
+            select(
+                Product.id,
+                Product.store_id,
+                Product.description,
+                Product.long_description,
+                Product.keypoints
+            ).filter(Product.id.in_(missing))
+        )).all()
+        for product in rows:
+            self._products[product.id] = product
+
+    async def _upsert_users(self, rows: List[ReviewImportRow]) -> Dict[str, UUID]:
+        users = {}
+        for row in rows:
+            if row.reviewer_email and row.reviewer_email not in users:
+                users[row.reviewer_email] = {
+                    "id": uuid.uuid4(),
+                    "name": row.reviewer_name,
+                    "email": row.reviewer_email,
+                    "is_verified_purchaser": row.is_verified_purchase
+                }
+
+        if not users:
+            return {}
+
+        await self.db.execute(
+            pg_insert(User).values(list(users.values())).on_conflict_do_nothing(index_elements=[User.email])
+        )
+        results = (await self.db.execute(
+            select(User.email, User.id).filter(User.email.in_(list(users)))
+        )).all()
+
+        return {email: user_id for email, user_id in results}
+
+    async def _analyze(self, valid: List[Tuple[int, ReviewImportRow, object]]) -> List[Tuple[UUID, Dict, float, object]]:
+        review_ids = [uuid.uuid4() for _ in valid]
+        contexts = [product_context(product) for _, _, product in valid]
+        reviews = [
+            {
+                "review_id": str(review_id),
+                "review_text": row.review_text,
+                "rating": row.rating,
+                "product_description": description,
+                "product_keypoints": keypoints,
+                "is_verified_purchase": row.is_verified_purchase
+            }
+            for review_id, (_, row, _), (description, keypoints) in zip(review_ids, valid, contexts)
+        ]
+
+        if inference_pool.enabled:
+            results = await inference_pool.analyze(reviews)
+        else:
+            # Model inference is CPU bound and runs off the event loop
+            results = await run_in_threadpool(analyze_reviews, reviews, INFERENCE_BATCH_SIZE)
+
+        return [(review_id, *result) for review_id, result in zip(review_ids, results)]
+
+    async def _write_reviews(
+        self,
+        valid: List[Tuple[int, ReviewImportRow, object]],
+        analyses: List[Tuple[UUID, Dict, float, object]],
+        user_ids: Dict[str, UUID]
+    ) -> None:
+        now = datetime.utcnow()
+        base_rows = []
+        analysis_rows = []
+        routed_rows = {}
+        classified_events = []
+
+        for (_, row, product), (review_id, classification, similarity, _) in zip(valid, analyses):
+            base_rows.append({
+                "id": review_id,
+                "store_id": product.store_id,
+                "product_id": product.id,
+                "user_id": user_ids.get(row.reviewer_email),
+                "reviewer_name": row.reviewer_name,
+                "reviewer_email": row.reviewer_email,
+                "rating": row.rating,
+                "review_text": row.review_text,
+                "language": classification["language"],
+                "is_verified_purchase": row.is_verified_purchase,
+                "submitted_at": row.submitted_at or now
+            })
+
+            value_score = score_review(row.review_text, product, classification, similarity, row.is_verified_purchase)
+            analysis = analysis_values(review_id, product.store_id, classification, value_score)
+            analysis["id"] = uuid.uuid4()
+            analysis_rows.append(analysis)
+
+            model, values = routing_values(
+                review_id,
+                analysis["id"],
+                product.store_id,
+                classification,
+                row.review_text,
+                row.reviewer_email,
+                row.is_verified_purchase
+            )
+            if model is not None:
+                values["id"] = uuid.uuid4()
+                routed_rows.setdefault(model, []).append(values)
+            classified_events.append({
+                "review_id": review_id,
+                "product_id": product.id,
+                "category": classification["category"],
+                "source": "import"
+            })
+
+        # Executemany inserts are batched into multi-row VALUES statements
+        await self.db.execute(insert(BaseReview), base_rows)
+        await self.db.execute(insert(ReviewAnalysis), analysis_rows)
+        for model, rows in routed_rows.items():
+            await self.db.execute(insert(model), rows)
+
+        published = routed_rows.get(PublishedReview, [])
+        await add_to_feed(self.db, [values["review_id"] for values in published])
+        await add_embeddings(self.db, [
+            (review_id, product.id, embedding)
+            for (_, _, product), (review_id, _, _, embedding) in zip(valid, analyses)
+        ])
+        await add_to_stats(self.db, [review_id for review_id, _, _, _ in analyses])
+
+        # Dashboard events; written with the chunk's commit
+        product_ids = {review["review_id"]: review["product_id"] for review in classified_events}
+        publish_events(self.db, "review_classified", classified_events)
+        publish_events(self.db, "ticket_created", [
+            {
+                "ticket_id": ticket["id"],
+                "review_id": ticket["review_id"],
+                "product_id": product_ids[ticket["review_id"]],
+                "priority": ticket["priority"]
+            }
+            for ticket in routed_rows.get(SupportTicket, [])
+        ])
@@ -0,0 +1,86 @@
+"""
+Maintenance of product_review_feed, the read model behind the public review page.
+
+Feed rows are always derived in SQL from published_reviews, base_reviews and
+review_analysis, so every write path produces the same row for a review.
+Call add_to_feed for reviews that were just published, and refresh_feed
+whenever a review's category, publication or shadow state may have changed.
+"""
+from typing import Iterable
+from uuid import UUID
+
+from sqlalchemy import Float, and_, case, cast, delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import BaseReview, ReviewAnalysis, PublishedReview, ProductReviewFeed
+from .reviews import same_review
+
+FEED_TABS = ["positive", "negative", "other"]
+
+# Column order of the INSERT ... SELECT built by _feed_source
+FEED_COLUMNS = [
+    "review_id", "product_id", "tab", "is_shadow", "value_score", "category", "reviewer_name",
+    "rating", "review_text", "is_verified_purchase", "submitted_at", "automatic_response", "helpful_count"
+]
+
+
+def feed_tab(category, is_shadow):
+    """
+    Tab a published review belongs to. Shadow reviews sit in the positive tab
+    and are only shown there when the caller asks for shadow reviews.
+    """
+    return case(
+        (and_(category == "public_positive", is_shadow == False), "positive"),
+        (and_(category == "shadow", is_shadow == True), "positive"),
+        (and_(category == "public_negative", is_shadow == False), "negative"),
+        else_="other"
+    )
+
+
+def _feed_source(review_ids):
+    is_shadow = func.coalesce(PublishedReview.is_shadow, False)
+    return select(
+        BaseReview.id,
+        BaseReview.product_id,
+        feed_tab(ReviewAnalysis.category, is_shadow),
+        is_shadow,
+        func.coalesce(cast(ReviewAnalysis.value_score, Float), 0),
+        ReviewAnalysis.category,
+        func.coalesce(func.nullif(BaseReview.reviewer_name, ""), "Anonymous"),
+        BaseReview.rating,
+        BaseReview.review_text,
+        func.coalesce(BaseReview.is_verified_purchase, False),
+        BaseReview.submitted_at,
+        PublishedReview.automatic_response,
+        func.coalesce(PublishedReview.helpful_count, 0)
+    ).select_from(
+        PublishedReview
+    ).join(
+        BaseReview, same_review(PublishedReview)
+    ).join(
+        ReviewAnalysis, same_review(ReviewAnalysis)
+    ).filter(
+        PublishedReview.review_id.in_(review_ids)
+    )
+
+
+async def add_to_feed(db: AsyncSession, review_ids: Iterable[UUID]) -> None:
+    """Insert feed rows for newly published reviews, in the caller's transaction."""
+    review_ids = list(review_ids)
+    if not review_ids:
+        return
+    await db.flush()
+    await db.execute(
+        pg_insert(ProductReviewFeed).from_select(FEED_COLUMNS, _feed_source(review_ids)).on_conflict_do_nothing()
+    )
+
+
+async def refresh_feed(db: AsyncSession, review_ids: Iterable[UUID]) -> None:
+    """Rebuild the feed rows of reviews whose publication state may have changed."""
+    review_ids = list(review_ids)
+    if not review_ids:
+        return
+    await db.flush()
+    await db.execute(delete(ProductReviewFeed).where(ProductReviewFeed.review_id.in_(review_ids)))
+    await add_to_feed(db, review_ids)
@@ -0,0 +1,147 @@
+"""
+Idempotent review submission.
+
+A submission claims a key in review_submission_keys before any model runs.
+The key is the client's Idempotency-Key header, scoped to product and
+reviewer (email, else client IP), or, without one, a fingerprint of
+product, reviewer, rating and normalized text. The claim commits right away
+as a pending row, so no transaction or row lock is held while the models
+run; the response is stored with the review in the request's final
+transaction. The primary key
+serializes concurrent duplicates: a duplicate that finds a pending claim
+polls for up to IDEMPOTENCY_WAIT_SECONDS and returns the stored response,
+so inference and row writes happen once. A request that fails releases its
+claim. A key can be claimed again once it is older than
+IDEMPOTENCY_WINDOW_SECONDS, or, while still pending, older than
+IDEMPOTENCY_PENDING_SECONDS, which covers a worker that died mid-request.
+Expired keys are deleted by purge_submission_keys.
+"""
+import asyncio
+import hashlib
+import os
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import SubmissionKey
+
+IDEMPOTENCY_WINDOW_SECONDS = int(os.getenv("IDEMPOTENCY_WINDOW_SECONDS", "600"))
+# A pending claim older than this belongs to a request that died; it can be claimed again
+IDEMPOTENCY_PENDING_SECONDS = int(os.getenv("IDEMPOTENCY_PENDING_SECONDS", "60"))
+# How long a duplicate waits for the first submission's response before answering 409
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+IDEMPOTENCY_KEY_MAX_LENGTH = 128
+IDEMPOTENCY_POLL_SECONDS = 0.2
+PURGE_BATCH_SIZE = 5000
+
+
+def normalize_review_text(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _reviewer(reviewer_email: Optional[str], client_ip: Optional[str]) -> str:
+    return reviewer_email.strip().lower() if reviewer_email else f"ip:{client_ip or ''}"
+
+
+def _digest(parts: List[str]) -> str:
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def submission_fingerprint(product_id: UUID, reviewer_email: Optional[str], client_ip: Optional[str], rating: int, review_text: str) -> str:
+    return _digest([str(product_id), _reviewer(reviewer_email, client_ip), str(rating), normalize_review_text(review_text)])
+
+
+def submission_key(
+    idempotency_key: Optional[str], fingerprint: str, product_id: UUID, reviewer_email: Optional[str], client_ip: Optional[str]
+) -> str:
+    if idempotency_key:
+        # Scoped to product and reviewer, so unrelated clients picking the same key do not collide
+        return f"header:{_digest([idempotency_key, str(product_id), _reviewer(reviewer_email, client_ip)])}"
+    return f"hash:{fingerprint}"
+
+
+async def claim_submission(db: AsyncSession, key: str, fingerprint: str) -> Optional[Dict]:
+    """
+    Claim key for this request and commit the claim. Returns None when the
+    caller should process the submission, or the stored response of an
+    earlier identical submission. The caller must release_submission() if
+    processing fails.
+    """
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        claim = pg_insert(SubmissionKey).values(key=key, request_hash=fingerprint, created_at=func.now())
+        claim = claim.on_conflict_do_update(
+            index_elements=[SubmissionKey.key],
+            set_={"request_hash": claim.excluded.request_hash, "review_id": None, "response": None, "created_at": func.now()},
+            where=or_(
+                SubmissionKey.created_at < func.now() - timedelta(seconds=IDEMPOTENCY_WINDOW_SECONDS),
+                SubmissionKey.response.is_(None)
+                & (SubmissionKey.created_at < func.now() - timedelta(seconds=IDEMPOTENCY_PENDING_SECONDS))
+            )
+        ).returning(SubmissionKey.key)
+        claimed = (await db.execute(claim)).first() is not None
+
+        existing = None
+        if not claimed:
+            existing = (await db.execute(
+                select(SubmissionKey.request_hash, SubmissionKey.response).filter(SubmissionKey.key == key)
+            )).first()
+        # Ends the claim's transaction, or the read's, so nothing is held while the models run or we wait
+        await db.commit()
+
+        if claimed:
+            return None
+        if existing is None:
+            # The claim was released by a failed request between the insert and the read
+            continue
+        if existing.request_hash != fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency key was already used for a different review")
+        if existing.response is not None:
+            return existing.response
+        if time.monotonic() >= deadline:
+            raise HTTPException(status_code=409, detail="An identical review is still being processed")
+        await asyncio.sleep(IDEMPOTENCY_POLL_SECONDS)
+
+
+async def release_submission(db: AsyncSession, key: str) -> None:
+    """
+    Drop a pending claim after its request failed, so a retry is processed at
+    once. Use a session other than the failed request's, after rolling that
+    one back; its transaction may hold the key's row.
+    """
+    await db.execute(delete(SubmissionKey).where(SubmissionKey.key == key, SubmissionKey.response.is_(None)))
+    await db.commit()
+
+
+async def complete_submission(db: AsyncSession, key: str, review_id: UUID, response: Dict) -> None:
+    """Store the response for key, in the caller's transaction."""
+    await db.flush()
+    await db.execute(
+        update(SubmissionKey)
+        .where(SubmissionKey.key == key)
+        .values(review_id=review_id, response=response)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def purge_submission_keys(db: AsyncSession, batch_size: int = PURGE_BATCH_SIZE) -> int:
+    """Delete keys older than the window, in batches that each commit. Returns the number deleted."""
+    expired = SubmissionKey.created_at < func.now() - timedelta(seconds=IDEMPOTENCY_WINDOW_SECONDS)
+    deleted = 0
+    while True:
+        # The age is checked again on delete, so a key claimed again in the meantime stays
+        result = await db.execute(
+            delete(SubmissionKey)
+            .where(SubmissionKey.key.in_(select(SubmissionKey.key).where(expired).limit(batch_size)), expired)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
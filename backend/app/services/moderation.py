@@ -0,0 +1,154 @@
+"""
+Bulk category overrides for moderators.
+
+An override moves reviews to a new category with the same state transitions
+as the single-review override: a public category removes the rejection and
+publishes the review, "rejected" unpublishes it and records the rejection,
+other categories only change the category. Here each transition is one
+set-based statement over all target reviews, and the audit rows are written
+with one multi-row insert, so a wave of thousands of reviews is a handful of
+statements in one transaction. The target rows of review_analysis are locked
+first, so concurrent overrides of the same reviews apply one after the other.
+"""
+from typing import List, Optional
+
+from sqlalchemy import delete, desc, exists, false, func, insert, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..events import publish_events
+from ..models import BaseReview, ReviewAnalysis, PublishedReview, RejectedReview
+from ..schemas import BulkOverrideFilter
+from . import audit
+from .feed import refresh_feed
+from .reviews import PUBLIC_CATEGORIES, in_product_store, same_review
+from .search import search_query
+from .stats import add_to_stats, remove_from_stats
+
+OVERRIDE_CATEGORIES = PUBLIC_CATEGORIES + ["shadow", "support", "rejected"]
+
+MANUAL_APPROVAL_RESPONSE = "Review manually approved by admin"
+
+
+async def lock_override_targets(
+    db: AsyncSession,
+    review_ids: Optional[List] = None,
+    review_filter: Optional[BulkOverrideFilter] = None,
+    limit: Optional[int] = None
+) -> List:
+    """
+    (id, analysis_id, category) of the analysed reviews to override, locked
+    for the rest of the transaction. Takes explicit ids, or the newest `limit`
+    reviews matching review_filter.
+    """
+    query = select(
+        BaseReview.id,
+        ReviewAnalysis.id.label("analysis_id"),
+        ReviewAnalysis.category
+    ).join(
+        ReviewAnalysis, same_review(ReviewAnalysis)
+    )
+
+    if review_ids is not None:
+        query = query.filter(BaseReview.id.in_(review_ids)).order_by(BaseReview.id)
+    else:
+        if review_filter.product_id is not None:
+            query = query.filter(
+                BaseReview.product_id == review_filter.product_id, in_product_store(review_filter.product_id)
+            )
+        if review_filter.category is not None:
+            query = query.filter(ReviewAnalysis.category == review_filter.category)
+        if review_filter.rating is not None:
+            query = query.filter(BaseReview.rating == review_filter.rating)
+        if review_filter.q is not None:
+            query = query.filter(BaseReview.search_vector.op("@@")(search_query(review_filter.q)))
+        if review_filter.submitted_from is not None:
+            query = query.filter(BaseReview.submitted_at >= review_filter.submitted_from)
+        if review_filter.submitted_to is not None:
+            query = query.filter(BaseReview.submitted_at < review_filter.submitted_to)
+        query = query.order_by(desc(BaseReview.submitted_at), BaseReview.id).limit(limit)
+
+    return (await db.execute(query.with_for_update(of=ReviewAnalysis))).all()
+
+
+async def override_reviews(
+    db: AsyncSession,
+    targets: List,
+    new_category: str,
+    reason: str,
+    admin_user: str
+) -> None:
+    """Apply the override to locked targets, audit it and publish it, in the caller's transaction."""
+    review_ids = [target.id for target in targets]
+    if not review_ids:
+        return
+
+    # Uncount the reviews under their old categories; they are counted again below
+    await remove_from_stats(db, review_ids)
+
+    await db.execute(
+        update(ReviewAnalysis)
+        .where(ReviewAnalysis.review_id.in_(review_ids))
+        .values(category=new_category)
+        .execution_options(synchronize_session=False)
+    )
+
+    # Python-side defaults are evaluated once per statement, so new ids come from the database
+    if new_category in PUBLIC_CATEGORIES:
+        await db.execute(delete(RejectedReview).where(RejectedReview.review_id.in_(review_ids)))
+        await db.execute(insert(PublishedReview).from_select(
+            ["id", "review_id", "analysis_id", "store_id", "is_shadow", "automatic_response"],
+            select(
+                func.gen_random_uuid(),
+                ReviewAnalysis.review_id,
+                ReviewAnalysis.id,
+                ReviewAnalysis.store_id,
+                false(),
+                literal(MANUAL_APPROVAL_RESPONSE)
+            ).where(
+                ReviewAnalysis.review_id.in_(review_ids),
+                ~exists().where(PublishedReview.review_id == ReviewAnalysis.review_id)
+            )
+        ))
+
+    elif new_category == "rejected":
+        await db.execute(delete(PublishedReview).where(PublishedReview.review_id.in_(review_ids)))
+        await db.execute(insert(RejectedReview).from_select(
+            ["id", "review_id", "analysis_id", "rejection_reason", "user_notified"],
+            select(
+                func.gen_random_uuid(),
+                ReviewAnalysis.review_id,
+                ReviewAnalysis.id,
+                literal(reason),
+                false()
+            ).where(
+                ReviewAnalysis.review_id.in_(review_ids),
+                ~exists().where(RejectedReview.review_id == ReviewAnalysis.review_id)
+            )
+        ))
+
+    audit.record_many(db, [
+        {
+            "admin_user": admin_user,
+            "action_type": "override_category",
+            "target_id": target.id,
+            "target_type": "review",
+            "reason": reason,
+            "old_value": target.category,
+            "new_value": new_category
+        }
+        for target in targets
+    ])
+
+    publish_events(db, "review_overridden", [
+        {
+            "review_id": target.id,
+            "old_category": target.category,
+            "new_category": new_category,
+            "admin_user": admin_user
+        }
+        for target in targets
+    ])
+
+    # Category and publication changes move the reviews between feed tabs
+    await refresh_feed(db, review_ids)
+    await add_to_stats(db, review_ids)
@@ -0,0 +1,182 @@
+"""
+Online move of the review tables to their store-partitioned layout.
+
+Migration 008 creates base_reviews_partitioned, review_analysis_partitioned
+and published_reviews_partitioned next to the live tables and installs
+triggers that mirror every insert, update and delete into them. What is left
+is done here, while the API keeps serving:
+
+- copy_table copies the rows that existed before the triggers, in id order
+  and in batches that commit as they go. The copy functions of migration 008
+  lock each batch FOR SHARE, so concurrent writes wait for at most one batch,
+  and skip rows the triggers already copied. Progress is checkpointed in
+  review_partition_copy, so an interrupted copy resumes after its last batch.
+- verify_copies compares the old and new tables.
+- swap_tables renames the partitioned tables into place in one transaction
+  that holds ACCESS EXCLUSIVE locks for a few catalog updates. It gives up
+  after lock_timeout instead of queueing requests behind a long transaction.
+  The old tables stay as <name>_unpartitioned until drop_unpartitioned.
+"""
+import asyncio
+import time
+from typing import AsyncIterator, Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+DEFAULT_BATCH_SIZE = 5000
+
+# Copy order; rows reference rows of the tables before them
+PARTITIONED_TABLES = ["base_reviews", "review_analysis", "published_reviews"]
+
+MIRROR_EVENTS = ["insert", "update", "delete"]
+
+
+async def reviews_partitioned(db: AsyncSession) -> bool:
+    """True once swap_tables has put the partitioned tables in place, or on a fresh install."""
+    return (await db.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('base_reviews'))"
+    ))).scalar_one()
+
+
+async def copy_progress(db: AsyncSession) -> Dict[str, Dict]:
+    rows = (await db.execute(text(
+        "SELECT table_name, last_id, copied, finished_at FROM review_partition_copy"
+    ))).mappings()
+    return {row["table_name"]: dict(row) for row in rows}
+
+
+async def copy_table(
+    db: AsyncSession, table: str, batch_size: int = DEFAULT_BATCH_SIZE, pause: float = 0.0, restart: bool = False
+) -> AsyncIterator[Dict]:
+    """Copy `table` into its partitioned replacement, yielding a progress event per batch."""
+    if table not in PARTITIONED_TABLES:
+        raise ValueError(f"Unknown table {table}")
+
+    if restart:
+        await db.execute(text("DELETE FROM review_partition_copy WHERE table_name = :table"), {"table": table})
+    await db.execute(text(
+        "INSERT INTO review_partition_copy (table_name) VALUES (:table) ON CONFLICT DO NOTHING"
+    ), {"table": table})
+    await db.commit()
+
+    progress = (await copy_progress(db))[table]
+    if progress["finished_at"] is not None:
+        return
+    last_id, copied = progress["last_id"], progress["copied"]
+
+    started = time.perf_counter()
+    read = 0
+    while True:
+        after = "" if last_id is None else "WHERE id > :after"
+        ids = (await db.execute(
+            text(f"SELECT id FROM {table} {after} ORDER BY id LIMIT :limit"),
+            {"after": last_id, "limit": batch_size} if last_id is not None else {"limit": batch_size}
+        )).scalars().all()
+        if not ids:
+            await db.execute(text(
+                "UPDATE review_partition_copy SET finished_at = now(), updated_at = now() WHERE table_name = :table"
+            ), {"table": table})
+            await db.commit()
+            return
+
+        copied += (await db.execute(
+            text(f"SELECT partition_copy_{table}(CAST(:ids AS UUID[]))"), {"ids": ids}
+        )).scalar_one()
+        last_id = ids[-1]
+        read += len(ids)
+        await db.execute(text(
+            "UPDATE review_partition_copy SET last_id = :last_id, copied = :copied, updated_at = now() "
+            "WHERE table_name = :table"
+        ), {"table": table, "last_id": last_id, "copied": copied})
+        await db.commit()
+
+        yield {
+            "event": "progress",
+            "table": table,
+            "copied": copied,
+            "last_id": str(last_id),
+            "rows_per_second": round(read / max(time.perf_counter() - started, 1e-9))
+        }
+        if pause:
+            await asyncio.sleep(pause)
+
+
+async def verify_copies(db: AsyncSession) -> List[Dict]:
+    """Row counts of every old and new table, and old rows missing from the new one."""
+    results = []
+    for table in PARTITIONED_TABLES:
+        row = (await db.execute(text(f"""
+            SELECT
+                (SELECT count(*) FROM {table}) AS old_rows,
+                (SELECT count(*) FROM {table}_partitioned) AS new_rows,
+                (SELECT count(*) FROM {table} o
+                 WHERE NOT EXISTS (SELECT 1 FROM {table}_partitioned n WHERE n.id = o.id)) AS missing
+        """))).mappings().one()
+        results.append({"table": table, **row, "ok": row["missing"] == 0 and row["old_rows"] == row["new_rows"]})
+    await db.commit()
+    return results
+
+
+async def swap_tables(db: AsyncSession, lock_timeout: str = "2s") -> None:
+    """
+    Rename the partitioned tables into place. Raises ValueError when a copy has
+    not finished; a lock timeout surfaces as the driver's error, and leaves
+    everything as it was.
+    """
+    progress = await copy_progress(db)
+    unfinished = [table for table in PARTITIONED_TABLES if progress.get(table, {}).get("finished_at") is None]
+    if unfinished:
+        await db.rollback()
+        raise ValueError(f"Copy not finished for {', '.join(unfinished)}; run partition-reviews copy first")
+
+    await db.execute(text("SELECT set_config('lock_timeout', :timeout, true)"), {"timeout": lock_timeout})
+    # Old tables first, in the order the mirror triggers lock them
+    await db.execute(text(
+        f"LOCK TABLE {', '.join(PARTITIONED_TABLES + [f'{table}_partitioned' for table in PARTITIONED_TABLES])} "
+        "IN ACCESS EXCLUSIVE MODE"
+    ))
+
+    for table in PARTITIONED_TABLES:
+        for event in MIRROR_EVENTS:
+            await db.execute(text(f"DROP TRIGGER IF EXISTS trg_mirror_{table}_{event} ON {table}"))
+
+    # Foreign keys from the unpartitioned tables (rejected_reviews, support_tickets, ...) to the
+    # old tables; trg_base_reviews_delete_dependents takes over their ON DELETE CASCADE
+    foreign_keys = (await db.execute(text("""
+        SELECT conrelid::regclass::text AS table_name, conname
+        FROM pg_constraint
+        WHERE contype = 'f'
+          AND confrelid = ANY(CAST(CAST(:tables AS TEXT[]) AS REGCLASS[]))
+          AND NOT conrelid = ANY(CAST(CAST(:tables AS TEXT[]) AS REGCLASS[]))
+    """), {"tables": PARTITIONED_TABLES})).all()
+    for foreign_key in foreign_keys:
+        await db.execute(text(f'ALTER TABLE {foreign_key.table_name} DROP CONSTRAINT "{foreign_key.conname}"'))
+
+    for table in PARTITIONED_TABLES:
+        await db.execute(text(f"ALTER TABLE {table} RENAME TO {table}_unpartitioned"))
+        await db.execute(text(f"ALTER TABLE {table}_partitioned RENAME TO {table}"))
+    await db.commit()
+
+    # Autovacuum analyzes the partitions but never the parent tables
+    for table in PARTITIONED_TABLES:
+        await db.execute(text(f"ANALYZE {table}"))
+    await db.commit()
+
+
+async def drop_unpartitioned(db: AsyncSession) -> None:
+    """Drop the old tables and the copy machinery once the swap has proven itself."""
+    swapped = (await db.execute(text(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = CAST('base_reviews' AS REGCLASS)"
+    ))).scalar_one()
+    if not swapped:
+        await db.rollback()
+        raise ValueError("base_reviews is not partitioned yet; the mirror triggers still need the copy functions")
+    await db.execute(text(
+        f"DROP TABLE IF EXISTS {', '.join(f'{table}_unpartitioned' for table in reversed(PARTITIONED_TABLES))}"
+    ))
+    for table in PARTITIONED_TABLES:
+        await db.execute(text(f"DROP FUNCTION IF EXISTS mirror_{table}()"))
+        await db.execute(text(f"DROP FUNCTION IF EXISTS partition_copy_{table}(UUID[])"))
+    await db.execute(text("DROP TABLE IF EXISTS review_partition_copy"))
+    await db.commit()
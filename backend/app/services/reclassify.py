@@ -0,0 +1,382 @@
+"""
+Reclassification of stored reviews after a model or rule change.
+
+Reviews are read in id order in chunks. Each chunk is split into batches that
+a process pool classifies with the current classifier, while the previous
+chunk's changes are written. A review whose category changed ("flip") gets the
+new verdict in review_analysis and is moved between published_reviews,
+rejected_reviews and support_tickets the way a new submission would be routed.
+The feed, the stats rollups, the audit trail and the dashboard events follow.
+
+Progress is checkpointed in reclassification_jobs in the same transaction as
+the chunk's changes, so an interrupted job resumes after the last committed
+chunk without applying anything twice. A dry run classifies and reports the
+flips without changing reviews, and is resumable too.
+
+Reviews a moderator overrode by hand, and reviews whose support ticket is
+already being worked on, keep their category; their flips are reported as
+skipped. Value scores are left as they are.
+"""
+import asyncio
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import delete, exists, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import (
+    BaseReview, ReviewAnalysis, PublishedReview, RejectedReview, SupportTicket, AdminAction, Product,
+    ReclassificationJob
+)
+from ..ai.classifier import get_classifier
+from ..events import publish_events
+from . import audit
+from .feed import refresh_feed
+from .moderation import lock_override_targets
+from .reviews import PUBLIC_CATEGORIES, in_product_store, product_context, routing_values, same_review
+from .stats import add_to_stats, remove_from_stats
+
+DEFAULT_CHUNK_SIZE = 1000
+INFERENCE_BATCH_SIZE = 32
+
+# review_analysis columns that come from the classifier
+CLASSIFICATION_FIELDS = [
+    "category", "confidence", "reason", "tags", "severity", "recommended_action",
+    "matched_description_points", "suggested_automatic_response"
+]
+
+
+def _load_classifier() -> None:
+    get_classifier()
+
+
+def _classify_batch(reviews: List[Dict], batch_size: int) -> List[Dict]:
+    """Runs in a pool process, which loads its own copy of the models once."""
+    return get_classifier().classify_reviews(reviews, batch_size=batch_size)
+
+
+def _is_published(category: str) -> bool:
+    return category in PUBLIC_CATEGORIES or category == "shadow"
+
+
+class Reclassifier:
+    """
+    Runs or resumes one named job and yields events.
+
+    Events are dicts with an "event" key of "flip", "progress" or "summary".
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        job_name: str,
+        workers: int,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        batch_size: int = INFERENCE_BATCH_SIZE,
+        dry_run: bool = False,
+        product_id: Optional[UUID] = None
+    ):
+        self.db = db
+        self.job_name = job_name
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.product_id = product_id
+        self.job = None
+        self._products = {}
+        self._classified = 0
+        self._started = None
+
+    async def start(self, restart: bool = False) -> ReclassificationJob:
+        """Load the job's checkpoint, or create the job. Raises ValueError on a mode mismatch."""
+        job = await self.db.get(ReclassificationJob, self.job_name)
+        if job is not None and restart:
+            await self.db.delete(job)
+            await self.db.flush()
+            job = None
+
+        if job is None:
+            job = ReclassificationJob(name=self.job_name, dry_run=self.dry_run, product_id=self.product_id, flips={})
+            self.db.add(job)
+            await self.db.commit()
+        elif job.dry_run != self.dry_run or job.product_id != self.product_id:
+            raise ValueError(
+                f"Job {self.job_name} was started with dry_run={job.dry_run}, product_id={job.product_id}; "
+                "resume it with the same options or pass --restart"
+            )
+
+        self.job = job
+        return job
+
+    async def run(self) -> AsyncIterator[Dict]:
+        self._started = time.perf_counter()
+        if self.job.finished_at is None:
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(self.workers, mp_context=context, initializer=_load_classifier) as pool:
+                async for event in self._run_chunks(pool):
+                    yield event
+
+            self.job.finished_at = datetime.utcnow()
+            await self.db.commit()
+
+        yield self._progress("summary")
+
+    async def _run_chunks(self, pool) -> AsyncIterator[Dict]:
+        # Classification of one chunk overlaps with writing the previous one
+        pending = None
+        last_id = self.job.last_review_id
+        while True:
+            rows = await self._read_chunk(last_id)
+            classifying = asyncio.ensure_future(self._classify(pool, rows)) if rows else None
+
+            if pending is not None:
+                for event in await self._finish_chunk(*pending):
+                    yield event
+                yield self._progress("progress")
+
+            if classifying is None:
+                return
+            pending = (rows, await classifying)
+            last_id = rows[-1].id
+
+    async def _read_chunk(self, after: Optional[UUID]) -> List:
+        overridden = exists().where(
+            AdminAction.target_id == BaseReview.id,
+            AdminAction.action_type == "override_category"
+        )
+        ticket_in_progress = exists().where(SupportTicket.review_id == BaseReview.id, SupportTicket.status != "open")
+        query = select(
+            BaseReview.id,
+            BaseReview.store_id,
+            BaseReview.product_id,
+            BaseReview.review_text,
+            BaseReview.rating,
+            BaseReview.reviewer_email,
+            BaseReview.is_verified_purchase,
+            ReviewAnalysis.id.label("analysis_id"),
+            ReviewAnalysis.category,
+            exists().where(same_review(PublishedReview)).label("is_published"),
+            exists().where(RejectedReview.review_id == BaseReview.id).label("is_rejected"),
+            exists().where(SupportTicket.review_id == BaseReview.id).label("has_ticket"),
+            (overridden | ticket_in_progress).label("protected")
+        ).join(
+            ReviewAnalysis, same_review(ReviewAnalysis)
+        )
+        if after is not None:
+            query = query.filter(BaseReview.id > after)
+        if self.product_id is not None:
+            query = query.filter(BaseReview.product_id == self.product_id, in_product_store(self.product_id))
+        rows = (await self.db.execute(query.order_by(BaseReview.id).limit(self.chunk_size))).all()
+
+        await self._load_products({row.product_id for row in rows})
+        # Plain reads; end the snapshot so the chunk does not hold a transaction while classifying
+        await self.db.commit()
+        return rows
+
+    async def _load_products(self, product_ids) -> None:
+        missing = [product_id for product_id in product_ids if product_id not in self._products]
+        if not missing:
+            return
+        products = (await self.db.execute(
+            select(Product.id, Product.description, Product.long_description, Product.keypoints)
+            .filter(Product.id.in_(missing))
+        )).all()
+        for product in products:
+            self._products[product.id] = product_context(product)
+
+    async def _classify(self, pool, rows: List) -> List[Dict]:
+        reviews = []
+        for row in rows:
+            description, keypoints = self._products[row.product_id]
+            reviews.append({
+                "review_id": str(row.id),
+                "review_text": row.review_text,
+                "rating": row.rating,
+                "product_description": description,
+                "product_keypoints": keypoints,
+                "is_verified_purchase": bool(row.is_verified_purchase)
+            })
+
+        # About one task per worker, and never smaller than a model batch
+        task_size = max(self.batch_size, -(-len(reviews) // self.workers))
+        loop = asyncio.get_running_loop()
+        batches = await asyncio.gather(*[
+            loop.run_in_executor(pool, _classify_batch, reviews[start:start + task_size], self.batch_size)
+            for start in range(0, len(reviews), task_size)
+        ])
+        self._classified += len(reviews)
+        return [classification for batch in batches for classification in batch]
+
+    async def _finish_chunk(self, rows: List, classifications: List[Dict]) -> List[Dict]:
+        events = []
+        flips = []
+        skipped = 0
+        for row, classification in zip(rows, classifications):
+            if classification["category"] == row.category:
+                continue
+            skip = "protected" if row.protected else None
+            if skip is None and not self.dry_run:
+                flips.append((row, classification))
+            else:
+                skipped += skip is not None
+            events.append(self._flip_event(row, classification, skip))
+
+        if flips:
+            applied, raced = await self._apply(flips)
+            skipped += len(raced)
+            for event in events:
+                if event["review_id"] in raced:
+                    event["skipped"] = "changed_during_run"
+        else:
+            applied = 0
+
+        self.job.last_review_id = rows[-1].id
+        self.job.processed += len(rows)
+        self.job.flipped += len(events)
+        self.job.applied += applied
+        self.job.skipped += skipped
+        flip_counts = dict(self.job.flips)
+        for event in events:
+            transition = f"{event['old_category']}->{event['new_category']}"
+            flip_counts[transition] = flip_counts.get(transition, 0) + 1
+        self.job.flips = flip_counts
+        await self.db.commit()
+        return events
+
+    def _flip_event(self, row, classification: Dict, skip: Optional[str]) -> Dict:
+        event = {
+            "event": "flip",
+            "review_id": str(row.id),
+            "old_category": row.category,
+            "new_category": classification["category"],
+            "confidence": classification["confidence"]
+        }
+        if skip is not None:
+            event["skipped"] = skip
+        return event
+
+    async def _apply(self, flips: List[Tuple]) -> Tuple[int, set]:
+        """Write the flips of one chunk. Returns (applied, ids of reviews changed since they were read)."""
+        # Moderators may have overridden a review since it was read; those keep their category
+        locked = {target.id: target.category for target in await lock_override_targets(
+            self.db, review_ids=[row.id for row, _ in flips]
+        )}
+        raced = {str(row.id) for row, _ in flips if locked.get(row.id) != row.category}
+        flips = [(row, classification) for row, classification in flips if str(row.id) not in raced]
+        if not flips:
+            return 0, raced
+        review_ids = [row.id for row, _ in flips]
+
+        await remove_from_stats(self.db, review_ids)
+
+        # Bulk UPDATE by primary key, batched by the driver
+        await self.db.execute(update(ReviewAnalysis), [
+            {"id": row.analysis_id, **{field: classification[field] for field in CLASSIFICATION_FIELDS}}
+            for row, classification in flips
+        ])
+
+        def ids(condition):
+            return [row.id for row, classification in flips if condition(row, classification["category"])]
+
+        unpublished = ids(lambda row, category: row.is_published and not _is_published(category))
+        unrejected = ids(lambda row, category: row.is_rejected and category != "rejected")
+        # Tickets someone is working on are protected, so only untouched open tickets are removed
+        unticketed = ids(lambda row, category: row.has_ticket and category != "support")
+        if unpublished:
+            await self.db.execute(delete(PublishedReview).where(PublishedReview.review_id.in_(unpublished)))
+        if unrejected:
+            await self.db.execute(delete(RejectedReview).where(RejectedReview.review_id.in_(unrejected)))
+        if unticketed:
+            await self.db.execute(delete(SupportTicket).where(SupportTicket.review_id.in_(unticketed)))
+
+        # Reviews that stay published move in or out of the shadow
+        for is_shadow in (True, False):
+            reshadowed = ids(lambda row, category: row.is_published and _is_published(category) and (category == "shadow") == is_shadow)
+            if reshadowed:
+                await self.db.execute(
+                    update(PublishedReview)
+                    .where(PublishedReview.review_id.in_(reshadowed))
+                    .values(is_shadow=is_shadow)
+                    .execution_options(synchronize_session=False)
+                )
+
+        routed_rows = {}
+        for row, classification in flips:
+            model, values = routing_values(
+                row.id,
+                row.analysis_id,
+                row.store_id,
+                classification,
+                row.review_text,
+                row.reviewer_email,
+                bool(row.is_verified_purchase)
+            )
+            already_routed = {PublishedReview: row.is_published, RejectedReview: row.is_rejected, SupportTicket: row.has_ticket}
+            if model is None or already_routed[model]:
+                continue
+            values["id"] = uuid.uuid4()
+            if model is RejectedReview:
+                # Nobody is told about a rejection found in hindsight
+                values.update(user_notified=False, notification_message=None)
+            routed_rows.setdefault(model, []).append(values)
+        for model, values in routed_rows.items():
+            await self.db.execute(insert(model), values)
+
+        product_ids = {row.id: row.product_id for row, _ in flips}
+        publish_events(self.db, "review_classified", [
+            {
+                "review_id": row.id,
+                "product_id": row.product_id,
+                "category": classification["category"],
+                "old_category": row.category,
+                "source": f"reclassify:{self.job_name}"
+            }
+            for row, classification in flips
+        ])
+        publish_events(self.db, "ticket_created", [
+            {
+                "ticket_id": ticket["id"],
+                "review_id": ticket["review_id"],
+                "product_id": product_ids[ticket["review_id"]],
+                "priority": ticket["priority"]
+            }
+            for ticket in routed_rows.get(SupportTicket, [])
+        ])
+
+        audit.record_many(self.db, [
+            {
+                "admin_user": f"reclassify:{self.job_name}",
+                "action_type": "reclassify",
+                "target_id": row.id,
+                "target_type": "review",
+                "reason": f"Reclassified by job {self.job_name}",
+                "old_value": row.category,
+                "new_value": classification["category"]
+            }
+            for row, classification in flips
+        ])
+
+        await refresh_feed(self.db, review_ids)
+        await add_to_stats(self.db, review_ids)
+        return len(flips), raced
+
+    def _progress(self, event: str) -> Dict:
+        elapsed = time.perf_counter() - self._started
+        return {
+            "event": event,
+            "job": self.job_name,
+            "dry_run": self.dry_run,
+            "processed": self.job.processed,
+            "flipped": self.job.flipped,
+            "applied": self.job.applied,
+            "skipped": self.job.skipped,
+            "flips": self.job.flips,
+            # This run only, so a resumed job reports its own speed
+            "reviews_per_second": round(self._classified / elapsed, 1) if self._classified else None
+        }
@@ -0,0 +1,33 @@
+"""
+Loading a review together with the rows that hang off it.
+
+Per-review endpoints need the review with its analysis, publication,
+rejection, support ticket and product. load_review fetches all of them in a
+single statement by joined-eager-loading the BaseReview relationships. Each
+relationship has at most one row per review, so the joins cannot multiply
+rows. Share it instead of querying each table on its own.
+"""
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from ..models import BaseReview, Product
+
+REVIEW_AGGREGATE = (
+    joinedload(BaseReview.analysis),
+    joinedload(BaseReview.published),
+    joinedload(BaseReview.rejected),
+    joinedload(BaseReview.ticket),
+    # Product descriptions are large and only the title is shown next to a review
+    joinedload(BaseReview.product).load_only(Product.id, Product.title)
+)
+
+
+async def load_review(db: AsyncSession, review_id: UUID) -> Optional[BaseReview]:
+    """The review with analysis, published, rejected, ticket and product loaded, or None."""
+    return (await db.execute(
+        select(BaseReview).options(*REVIEW_AGGREGATE).filter(BaseReview.id == review_id)
+    )).unique().scalar_one_or_none()
@@ -0,0 +1,146 @@
+"""
+Review processing steps shared by single submissions and bulk imports.
+
+Everything here is pure: it turns a classification result into the column
+values for review_analysis and the table the review is routed to, and builds
+the conditions that keep review queries inside one store's partitions.
+"""
+import os
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, true
+
+from ..models import Product, BaseReview, PublishedReview, SupportTicket, RejectedReview
+from ..utils.scoring import calculate_value_score
+
+PUBLIC_CATEGORIES = ["public_positive", "public_negative"]
+
+REJECTION_NOTIFICATION = "Your review was not published because it was marked as irrelevant to the product."
+
+# Rows written before migration 008 have no store_id until partition-reviews swaps the tables,
+# so the store conditions below stay off until the review tables are partitioned. "auto" turns
+# them on at startup once base_reviews is partitioned; "true" and "false" override that
+REVIEW_PARTITION_PRUNING_SETTING = os.getenv("REVIEW_PARTITION_PRUNING", "auto").lower()
+REVIEW_PARTITION_PRUNING = REVIEW_PARTITION_PRUNING_SETTING == "true"
+
+
+def configure_partition_pruning(tables_partitioned: bool) -> bool:
+    """Resolve REVIEW_PARTITION_PRUNING=auto from whether the review tables are partitioned."""
+    global REVIEW_PARTITION_PRUNING
+    if REVIEW_PARTITION_PRUNING_SETTING == "auto":
+        REVIEW_PARTITION_PRUNING = tables_partitioned
+    return REVIEW_PARTITION_PRUNING
+
+
+def product_context(product) -> Tuple[str, List[str]]:
+    """Description and keypoints the AI pipeline compares a review against."""
+    return product.long_description or product.description, product.keypoints or []
+
+
+def in_product_store(product_id):
+    """
+    Condition limiting base_reviews to the store of `product_id`. The review
+    tables are hash partitioned by store_id, so next to a product_id filter it
+    lets Postgres scan one partition instead of all of them. The store is
+    looked up in the same statement, which prunes at execution time.
+    """
+    if not REVIEW_PARTITION_PRUNING:
+        return true()
+    return BaseReview.store_id == select(Product.store_id).where(Product.id == product_id).scalar_subquery()
+
+
+def same_review(model):
+    """
+    Join condition from base_reviews to review_analysis or published_reviews
+    including the partition key, so a store filter on base_reviews prunes the
+    joined table as well.
+    """
+    if not REVIEW_PARTITION_PRUNING:
+        return model.review_id == BaseReview.id
+    return (model.review_id == BaseReview.id) & (model.store_id == BaseReview.store_id)
+
+
+def score_review(
+    review_text: str,
+    product,
+    classification: Dict,
+    semantic_similarity: float,
+    is_verified_purchase: bool
+) -> float:
+    description, keypoints = product_context(product)
+
+    return calculate_value_score(
+        review_text=review_text,
+        product_description=description,
+        keypoints=keypoints,
+        matched_keypoints=classification["matched_description_points"],
+        is_verified_purchase=is_verified_purchase,
+        sentiment_score=classification["confidence"],
+        semantic_similarity=semantic_similarity,
+        is_shadow=classification["category"] == "shadow"
+    )
+
+
+def analysis_values(review_id, store_id, classification: Dict, value_score: float) -> Dict:
+    return {
+        "review_id": review_id,
+        "store_id": store_id,
+        "category": classification["category"],
+        "confidence": classification["confidence"],
+        "reason": classification["reason"],
+        "tags": classification["tags"],
+        "severity": classification["severity"],
+        "recommended_action": classification["recommended_action"],
+        "matched_description_points": classification["matched_description_points"],
+        "suggested_automatic_response": classification["suggested_automatic_response"],
+        "value_score": value_score
+    }
+
+
+def routing_values(
+    review_id,
+    analysis_id,
+    store_id,
+    classification: Dict,
+    review_text: str,
+    reviewer_email: Optional[str],
+    is_verified_purchase: bool
+) -> Tuple[Optional[type], Optional[Dict]]:
+    """
+    Decide which table a classified review lands in. store_id is the review's
+    partition key, only published_reviews is partitioned.
+
+    Returns:
+        (model, column values), or (None, None) for unknown categories
+    """
+    category = classification["category"]
+
+    if category in PUBLIC_CATEGORIES or category == "shadow":
+        return PublishedReview, {
+            "review_id": review_id,
+            "analysis_id": analysis_id,
+            "store_id": store_id,
+            "is_shadow": category == "shadow",
+            "automatic_response": classification["suggested_automatic_response"]
+        }
+
+    if category == "support":
+        return SupportTicket, {
+            "review_id": review_id,
+            "analysis_id": analysis_id,
+            "priority": "high" if is_verified_purchase else "normal",
+            "issue_description": review_text,
+            "customer_email": reviewer_email,
+            "automatic_response": classification["suggested_automatic_response"]
+        }
+
+    if category == "rejected":
+        return RejectedReview, {
+            "review_id": review_id,
+            "analysis_id": analysis_id,
+            "rejection_reason": classification["reason"],
+            "user_notified": True,
+            "notification_message": REJECTION_NOTIFICATION
+        }
+
+    return None, None
@@ -0,0 +1,145 @@
+"""
+Full-text review search for moderators.
+
+base_reviews.search_vector holds each review's text under the english_unaccent
+and romanian_unaccent configurations, and a query is parsed with both, so
+searches match either language, with or without diacritics. The GIN index on
+search_vector finds the matches.
+
+Results come in pages with keyset cursors. "newest" walks (submitted_at, id).
+"relevance" ranks the SEARCH_RANK_CANDIDATES most recent matches and walks
+(rank, id). Capping the candidates keeps a query for a very common word from
+ranking every review in the table.
+"""
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import desc, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import BaseReview, ReviewAnalysis
+from ..queries import reviewer_name, as_float, as_str, rows_as_dicts
+from .reviews import in_product_store, same_review
+
+SEARCH_CONFIGURATIONS = ["english_unaccent", "romanian_unaccent"]
+SEARCH_SORTS = ["relevance", "newest"]
+SEARCH_RANK_CANDIDATES = int(os.getenv("SEARCH_RANK_CANDIDATES", "1000"))
+
+
+def encode_cursor(sort_value, review_id: str) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    payload = json.dumps([sort_value, review_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii")
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple:
+    """(sort value, review id) of the last row of the previous page; raises ValueError if malformed."""
+    try:
+        sort_value, review_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        review_id = UUID(review_id)
+        if sort == "newest":
+            return datetime.fromisoformat(sort_value), review_id
+        return float(sort_value), review_id
+    except (TypeError, ValueError, UnicodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def search_query(text: str):
+    """The query under every search configuration, OR-ed together."""
+    query = func.websearch_to_tsquery(SEARCH_CONFIGURATIONS[0], text)
+    for configuration in SEARCH_CONFIGURATIONS[1:]:
+        query = query.op("||")(func.websearch_to_tsquery(configuration, text))
+    return query
+
+
+async def search_reviews(
+    db: AsyncSession,
+    text: str,
+    sort: str = "relevance",
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    product_id: Optional[UUID] = None,
+    category: Optional[str] = None,
+    rating: Optional[int] = None,
+    submitted_from: Optional[datetime] = None,
+    submitted_to: Optional[datetime] = None
+) -> Tuple[List[Dict], Optional[str]]:
+    """One page of matching reviews and the cursor of the next page (None on the last page)."""
+    after = decode_cursor(cursor, sort) if cursor else None
+    ts_query = search_query(text)
+
+    filters = [BaseReview.search_vector.op("@@")(ts_query)]
+    if product_id is not None:
+        filters.extend([BaseReview.product_id == product_id, in_product_store(product_id)])
+    if category is not None:
+        filters.append(ReviewAnalysis.category == category)
+    if rating is not None:
+        filters.append(BaseReview.rating == rating)
+    if submitted_from is not None:
+        filters.append(BaseReview.submitted_at >= submitted_from)
+    if submitted_to is not None:
+        filters.append(BaseReview.submitted_at < submitted_to)
+
+    # The candidates carry every column of the result, so ranking them needs no second lookup by id,
+    # which would probe each partition of base_reviews and review_analysis per candidate
+    matches = select(
+        BaseReview.id,
+        BaseReview.product_id,
+        BaseReview.reviewer_name,
+        BaseReview.reviewer_email,
+        BaseReview.rating,
+        BaseReview.review_text,
+        BaseReview.language,
+        BaseReview.is_verified_purchase,
+        BaseReview.submitted_at,
+        BaseReview.search_vector,
+        ReviewAnalysis.category,
+        ReviewAnalysis.value_score
+    ).outerjoin(
+        ReviewAnalysis, same_review(ReviewAnalysis)
+    ).filter(*filters)
+
+    if sort == "newest":
+        if after is not None:
+            matches = matches.filter(tuple_(BaseReview.submitted_at, BaseReview.id) < tuple_(*after))
+        matches = matches.order_by(desc(BaseReview.submitted_at), desc(BaseReview.id)).limit(limit + 1)
+    else:
+        matches = matches.order_by(desc(BaseReview.submitted_at)).limit(SEARCH_RANK_CANDIDATES)
+    matches = matches.subquery("matches")
+
+    rank = func.ts_rank_cd(matches.c.search_vector, ts_query)
+    query = select(
+        as_str(matches.c.id),
+        as_str(matches.c.product_id),
+        reviewer_name(matches.c.reviewer_name),
+        matches.c.reviewer_email,
+        matches.c.rating,
+        matches.c.review_text,
+        matches.c.language,
+        matches.c.is_verified_purchase,
+        matches.c.submitted_at,
+        matches.c.category,
+        as_float(matches.c.value_score, "value_score"),
+        rank.label("rank")
+    )
+
+    if sort == "newest":
+        query = query.order_by(desc(matches.c.submitted_at), desc(matches.c.id))
+    else:
+        if after is not None:
+            query = query.filter(tuple_(rank, matches.c.id) < tuple_(*after))
+        query = query.order_by(desc(rank), desc(matches.c.id)).limit(limit + 1)
+
+    reviews = rows_as_dicts(await db.execute(query))
+
+    next_cursor = None
+    if len(reviews) > limit:
+        reviews = reviews[:limit]
+        last = reviews[-1]
+        next_cursor = encode_cursor(last["submitted_at"] if sort == "newest" else last["rank"], last["id"])
+    return reviews, next_cursor
@@ -0,0 +1,103 @@
+"""
+Semantic review search over stored review embeddings.
+
+Each review's sentence embedding is written to review_embeddings in the same
+transaction as the review, from the vector the submission pipeline already
+computes for the product similarity score. The embeddings are indexed with
+pgvector's HNSW index, so the index lives in Postgres: it is durable, updated
+with every insert, shared by all workers and replicated to read replicas.
+A search encodes only the query. The model is multilingual, so English
+queries find Romanian reviews and the reverse.
+
+Filters are applied to the candidates the HNSW scan returns, so filtered
+searches widen the scan (hnsw.ef_search) to still fill k results. When a
+product filter is too selective even for that, the product's own reviews
+are ranked exactly through the product_id index.
+"""
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import Float, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import BaseReview, ReviewAnalysis, ReviewEmbedding
+from ..queries import reviewer_name, as_str, rows_as_dicts
+from .reviews import same_review
+
+SEMANTIC_SEARCH_EF_SEARCH = int(os.getenv("SEMANTIC_SEARCH_EF_SEARCH", "100"))
+# ef_search is multiplied by this when results are filtered; pgvector caps it at 1000
+SEMANTIC_SEARCH_FILTER_FACTOR = 4
+SEMANTIC_SEARCH_MAX_EF_SEARCH = 1000
+
+
+async def add_embeddings(db: AsyncSession, rows: Iterable[Tuple[UUID, UUID, object]]) -> None:
+    """Store (review_id, product_id, embedding) rows, in the caller's transaction."""
+    values = [
+        {"review_id": review_id, "product_id": product_id, "embedding": embedding}
+        for review_id, product_id, embedding in rows
+    ]
+    if not values:
+        return
+    await db.flush()
+    await db.execute(pg_insert(ReviewEmbedding).on_conflict_do_nothing(), values)
+
+
+async def semantic_search(
+    db: AsyncSession,
+    query_embedding,
+    k: int = 20,
+    product_id: Optional[UUID] = None,
+    category: Optional[str] = None
+) -> List[Dict]:
+    """The k reviews closest to query_embedding by cosine distance."""
+    ef_search = SEMANTIC_SEARCH_EF_SEARCH
+    if product_id is not None or category is not None:
+        ef_search *= SEMANTIC_SEARCH_FILTER_FACTOR
+    ef_search = min(max(ef_search, k), SEMANTIC_SEARCH_MAX_EF_SEARCH)
+    # Transaction-local, so pooled connections keep the server default
+    await db.execute(select(func.set_config("hnsw.ef_search", str(ef_search), True)))
+
+    distance = ReviewEmbedding.embedding.op("<=>", return_type=Float)(query_embedding)
+    query = select(
+        as_str(BaseReview.id),
+        as_str(BaseReview.product_id),
+        reviewer_name(BaseReview.reviewer_name),
+        BaseReview.rating,
+        BaseReview.review_text,
+        BaseReview.language,
+        BaseReview.submitted_at,
+        ReviewAnalysis.category,
+        (1 - distance).label("similarity")
+    ).select_from(ReviewEmbedding).join(
+        BaseReview, BaseReview.id == ReviewEmbedding.review_id
+    ).outerjoin(
+        ReviewAnalysis, same_review(ReviewAnalysis)
+    )
+
+    if product_id is not None:
+        query = query.filter(ReviewEmbedding.product_id == product_id)
+    if category is not None:
+        query = query.filter(ReviewAnalysis.category == category)
+
+    reviews = rows_as_dicts(await db.execute(query.order_by(distance).limit(k)))
+    if len(reviews) < k and product_id is not None:
+        # Too few of the approximate candidates belong to the product. Rank the
+        # product's own reviews exactly instead; "+ 0" keeps the planner off the
+        # HNSW index and on the product_id index.
+        reviews = rows_as_dicts(await db.execute(query.order_by(distance + 0).limit(k)))
+    return reviews
+
+
+async def reviews_missing_embeddings(db: AsyncSession, limit: int, after: Optional[UUID] = None) -> List:
+    """(id, product_id, review_text) of reviews without an embedding, in id order after `after`."""
+    query = select(BaseReview.id, BaseReview.product_id, BaseReview.review_text).outerjoin(
+        ReviewEmbedding, ReviewEmbedding.review_id == BaseReview.id
+    ).filter(
+        ReviewEmbedding.review_id.is_(None),
+        BaseReview.product_id.isnot(None)
+    )
+    if after is not None:
+        query = query.filter(BaseReview.id > after)
+    return (await db.execute(query.order_by(BaseReview.id).limit(limit))).all()
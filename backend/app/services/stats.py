@@ -0,0 +1,179 @@
+"""
+Moderation statistics rollups.
+
+moderation_stats_daily counts reviews per (day, product, category, severity,
+language), with the product's store alongside. Days are UTC submission days.
+The rows are maintained in the writer's transaction: add_to_stats counts
+reviews that were just written, and an override brackets its change with
+remove_from_stats and add_to_stats. Like the feed, the increments are derived
+in SQL from base_reviews and review_analysis, so every write path counts a
+review the same way.
+
+A date range is answered from the rollups alone, so its cost depends on the
+number of days and products in range, not on the number of reviews.
+rebuild_stats recomputes whole days from the review tables; it backfills
+history and repairs drift.
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy import Date, cast, delete, func, select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import BaseReview, ReviewAnalysis, Product, ModerationStats
+from .reviews import same_review
+
+# Stored for reviews without a detected severity or language
+UNKNOWN = "unknown"
+
+STATS_KEY = ["day", "product_id", "category", "severity", "language"]
+
+
+def _stats_source(sign: int, *filters):
+    key = [
+        cast(BaseReview.submitted_at, Date),
+        BaseReview.product_id,
+        ReviewAnalysis.category,
+        func.coalesce(ReviewAnalysis.severity, UNKNOWN),
+        func.coalesce(BaseReview.language, UNKNOWN)
+    ]
+    return select(
+        *key,
+        Product.store_id,
+        (func.count() * sign).label("review_count")
+    ).select_from(
+        BaseReview
+    ).join(
+        ReviewAnalysis, same_review(ReviewAnalysis)
+    ).join(
+        Product, BaseReview.product_id == Product.id
+    ).filter(
+        *filters
+    ).group_by(
+        *key, Product.store_id
+    ).order_by(
+        # Concurrent writers lock rollup rows in the same order, so they cannot deadlock
+        *key
+    )
+
+
+async def _apply(db: AsyncSession, review_ids: Iterable[UUID], sign: int) -> None:
+    review_ids = list(review_ids)
+    if not review_ids:
+        return
+    await db.flush()
+    increment = pg_insert(ModerationStats).from_select(
+        STATS_KEY + ["store_id", "review_count"],
+        _stats_source(sign, BaseReview.id.in_(review_ids))
+    )
+    await db.execute(increment.on_conflict_do_update(
+        index_elements=STATS_KEY,
+        set_={"review_count": ModerationStats.review_count + increment.excluded.review_count}
+    ))
+
+
+async def add_to_stats(db: AsyncSession, review_ids: Iterable[UUID]) -> None:
+    """Count newly written, classified reviews, in the caller's transaction."""
+    await _apply(db, review_ids, 1)
+
+
+async def remove_from_stats(db: AsyncSession, review_ids: Iterable[UUID]) -> None:
+    """Uncount reviews as they are stored now; call before changing their category."""
+    await _apply(db, review_ids, -1)
+
+
+async def rebuild_stats(db: AsyncSession, day: date) -> None:
+    """
+    Recompute one day's rollups from the review tables and commit.
+
+    The table lock holds off concurrent increments until the commit, so a
+    review written during the rebuild is counted exactly once: either it is
+    visible to the rebuild, or its increment lands on the rebuilt rows.
+    """
+    start = datetime.combine(day, time.min)
+    await db.execute(text("LOCK TABLE moderation_stats_daily IN SHARE ROW EXCLUSIVE MODE"))
+    await db.execute(delete(ModerationStats).where(ModerationStats.day == day))
+    await db.execute(pg_insert(ModerationStats).from_select(
+        STATS_KEY + ["store_id", "review_count"],
+        _stats_source(
+            1,
+            BaseReview.submitted_at >= start,
+            BaseReview.submitted_at < start + timedelta(days=1)
+        )
+    ))
+    await db.commit()
+
+
+async def review_days(db: AsyncSession):
+    """First and last UTC submission day of any review, or (None, None)."""
+    first, last = (await db.execute(
+        select(func.min(BaseReview.submitted_at), func.max(BaseReview.submitted_at))
+    )).one()
+    if first is None:
+        return None, None
+    return first.date(), last.date()
+
+
+async def moderation_stats(
+    db: AsyncSession,
+    day_from: date,
+    day_to: date,
+    store_id: Optional[UUID] = None,
+    product_id: Optional[UUID] = None
+) -> Dict:
+    """Review counts by category, severity, language and day for day_from..day_to inclusive."""
+    filters = [ModerationStats.day >= day_from, ModerationStats.day <= day_to]
+    if store_id is not None:
+        filters.append(ModerationStats.store_id == store_id)
+    if product_id is not None:
+        filters.append(ModerationStats.product_id == product_id)
+
+    # One pass over the rollups; grouping() tells the sets apart
+    grouping = func.grouping(ModerationStats.day, ModerationStats.category, ModerationStats.severity, ModerationStats.language)
+    rows = (await db.execute(
+        select(
+            grouping.label("grouping"),
+            ModerationStats.day,
+            ModerationStats.category,
+            ModerationStats.severity,
+            ModerationStats.language,
+            func.sum(ModerationStats.review_count).label("review_count")
+        ).filter(
+            *filters
+        ).group_by(
+            func.grouping_sets(
+                tuple_(ModerationStats.day, ModerationStats.category),
+                tuple_(ModerationStats.severity),
+                tuple_(ModerationStats.language)
+            )
+        ).order_by(
+            ModerationStats.day
+        )
+    )).all()
+
+    by_category, by_severity, by_language, by_day = {}, {}, {}, {}
+    for row in rows:
+        count = int(row.review_count)
+        if not count:
+            continue
+        if row.grouping == 0b0011:
+            by_category[row.category] = by_category.get(row.category, 0) + count
+            day = by_day.setdefault(row.day, {"day": row.day.isoformat(), "total": 0, "by_category": {}})
+            day["total"] += count
+            day["by_category"][row.category] = count
+        elif row.grouping == 0b1101:
+            by_severity[row.severity] = count
+        elif row.grouping == 0b1110:
+            by_language[row.language] = count
+
+    return {
+        "from": day_from.isoformat(),
+        "to": day_to.isoformat(),
+        "total": sum(by_category.values()),
+        "by_category": by_category,
+        "by_severity": by_severity,
+        "by_language": by_language,
+        "by_day": list(by_day.values())
+    }
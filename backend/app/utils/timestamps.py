@@ -0,0 +1,11 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    Naive UTC for TIMESTAMP columns, which store no offset and which asyncpg
+    refuses aware datetimes for. Naive values are taken to be UTC already.
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
@@ -0,0 +1,6 @@
+"""
+Benchmarks and load tools for the REVI backend.
+
+Run modules from the backend directory, e.g. `python -m benchmarks.submit_roundtrips`.
+They expect DATABASE_URL to point at a disposable database.
+"""
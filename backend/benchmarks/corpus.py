@@ -0,0 +1,124 @@
+"""
+Deterministic synthetic review corpus in English and Romanian.
+
+The same seed always yields the same products and reviews, so benchmark runs
+on different machines or commits measure identical inputs. Reviews cycle
+through the shapes the classifier treats differently:
+
+- generic: short 5-star praise ("Great product!"), shadow candidates;
+- detailed: long reviews that mention keypoints, numbers and comparisons;
+- support: complaints with support keywords and a low rating;
+- contradiction: reviews naming a color the description does not have.
+"""
+import random
+from typing import Dict, List
+
+REVIEW_KINDS = ["generic", "detailed", "support", "contradiction"]
+
+PRODUCTS = [
+    {
+        "title": "Wireless Noise Cancelling Headphones",
+        "description": "Black over-ear wireless headphones with active noise cancellation and 30 hour battery life.",
+        "keypoints": ["active noise cancellation", "30 hour battery", "bluetooth 5.2", "foldable design"],
+        "category": "Electronics",
+        "language": "en",
+    },
+    {
+        "title": "Stainless Steel Espresso Machine",
+        "description": "White espresso machine with a 15 bar pump, milk frother and 1.8 liter water tank.",
+        "keypoints": ["15 bar pump", "milk frother", "1.8 liter tank", "stainless steel body"],
+        "category": "Home & Kitchen",
+        "language": "en",
+    },
+    {
+        "title": "Casti wireless cu anulare activa a zgomotului",
+        "description": "Casti over-ear de culoare negru, cu anulare activa a zgomotului si autonomie de 30 de ore.",
+        "keypoints": ["anulare activa a zgomotului", "autonomie 30 ore", "bluetooth 5.2", "design pliabil"],
+        "category": "Electronics",
+        "language": "ro",
+    },
+    {
+        "title": "Rucsac impermeabil pentru laptop",
+        "description": "Rucsac albastru impermeabil cu compartiment pentru laptop de 15.6 inch si port USB.",
+        "keypoints": ["impermeabil", "compartiment laptop 15.6", "port usb", "bretele ergonomice"],
+        "category": "Accessories",
+        "language": "ro",
+    },
+]
+
+TEMPLATES = {
+    "en": {
+        "generic": ["Great product!", "Excellent!", "Love it!", "Perfect!", "Amazing", "Good"],
+        "detailed": [
+            "I have used it every day for {weeks} weeks. The {keypoint} is excellent and works better than my previous one, "
+            "and the {keypoint2} makes a real difference. Build quality feels premium for the price.",
+            "After {weeks} weeks of commuting I can say the {keypoint} is the main reason to buy it. Compared to the "
+            "older model the {keypoint2} is much better. Worth the money, I would recommend it.",
+        ],
+        "support": [
+            "Stopped working after {weeks} days, the {keypoint} is broken. I need a refund or an exchange under warranty.",
+            "There is a problem with the {keypoint}, it does not work anymore. Please help, support did not answer.",
+        ],
+        "contradiction": [
+            "The {color} color looks nothing like the photos and the {keypoint} feels cheap.",
+            "I bought it for the {color} finish but it feels poor, the {keypoint} is disappointing.",
+        ],
+    },
+    "ro": {
+        "generic": ["Produs bun!", "Excelent!", "Foarte bun", "Recomand!", "Perfect!"],
+        "detailed": [
+            "Folosesc produsul de {weeks} saptamani. Calitatea este excelenta, {keypoint} functioneaza foarte bine si "
+            "{keypoint2} face diferenta fata de modelul vechi. Recomand, merita pretul.",
+            "Dupa {weeks} saptamani pot spune ca {keypoint} este motivul principal pentru care l-am cumparat. "
+            "Comparat cu alte produse, {keypoint2} este mult mai bun.",
+        ],
+        "support": [
+            "Nu mai functioneaza dupa {weeks} zile, {keypoint} este stricat. Vreau returnare sau garantie.",
+            "Am o problema cu {keypoint}, nu merge deloc. Va rog ajutor, produsul este defect.",
+        ],
+        "contradiction": [
+            "Culoarea {color} nu seamana cu pozele, iar {keypoint} pare ieftin.",
+            "L-am luat pentru finisajul {color}, dar {keypoint} este dezamagitor.",
+        ],
+    },
+}
+
+# Colors absent from every product description above
+CONTRADICTION_COLORS = {"en": ["red", "pink", "purple", "yellow"], "ro": ["rosu", "verde"]}
+
+RATINGS = {"generic": [5], "detailed": [4, 5, 2, 3], "support": [1, 2, 3], "contradiction": [1, 2]}
+
+
+def generate_reviews(count: int, seed: int = 0, product_index: int = None) -> List[Dict]:
+    """
+    `count` reviews with review_text, rating, is_verified_purchase, language,
+    kind and the product's description and keypoints. Kinds and languages
+    rotate so any prefix of the corpus has a similar mix.
+    """
+    rng = random.Random(seed)
+    reviews = []
+    for index in range(count):
+        kind = REVIEW_KINDS[index % len(REVIEW_KINDS)]
+        language = "en" if (index // len(REVIEW_KINDS)) % 2 == 0 else "ro"
+        if product_index is not None:
+            product = PRODUCTS[product_index]
+        else:
+            product = rng.choice([product for product in PRODUCTS if product["language"] == language])
+        keypoint, keypoint2 = rng.sample(product["keypoints"], 2)
+
+        text = rng.choice(TEMPLATES[language][kind]).format(
+            weeks=rng.randint(2, 12),
+            keypoint=keypoint,
+            keypoint2=keypoint2,
+            color=rng.choice(CONTRADICTION_COLORS[language])
+        )
+        reviews.append({
+            "review_text": text,
+            "rating": rng.choice(RATINGS[kind]),
+            "is_verified_purchase": rng.random() < 0.6,
+            "language": language,
+            "kind": kind,
+            "product_description": product["description"],
+            "product_keypoints": product["keypoints"],
+        })
+    return reviews
@@ -0,0 +1,253 @@
+"""
+Microbenchmarks for the CPU-bound moderation hot paths.
+
+Times the classifier's rule helpers, full batch classification, the value
+and specificity scores, the weighted product rating and insight generation
+over the synthetic corpus of benchmarks.corpus at several input sizes. The
+models are the deterministic stubs of app.ai.stubs unless --real-models is
+given, so a run takes seconds and its inputs never change; no database is
+needed.
+
+Each case is run --repeats times per size after one warm-up run; results are
+the median and minimum wall time of a run and the median per input item.
+
+    cd backend && python -m benchmarks.hot_paths run --output baseline.json
+    # ... change the code ...
+    python -m benchmarks.hot_paths run --output current.json
+    python -m benchmarks.hot_paths compare baseline.json current.json --threshold 0.10
+
+compare prints the change of every case's median and exits with status 1
+when any case got slower by more than the threshold.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from app.ai.classifier import get_classifier
+from app.ai.embeddings import get_embedding_service, EmbeddingService
+from app.ai.insights import ReviewInsightsGenerator
+from app.ai.stubs import install_stub_models
+from app.utils.scoring import calculate_value_score, calculate_specificity_score, calculate_weighted_product_rating
+from benchmarks.corpus import generate_reviews
+
+DEFAULT_SIZES = [10, 100, 1000]
+
+
+def build_cases(reviews: List[Dict]) -> Dict[str, Callable[[], object]]:
+    """Benchmark name -> zero-argument callable processing all of `reviews`."""
+    classifier = get_classifier()
+    embedding_service = get_embedding_service()
+
+    classify_inputs = [
+        {
+            "review_id": str(index),
+            "review_text": review["review_text"],
+            "rating": review["rating"],
+            "product_description": review["product_description"],
+            "product_keypoints": review["product_keypoints"],
+            "is_verified_purchase": review["is_verified_purchase"],
+        }
+        for index, review in enumerate(reviews)
+    ]
+
+    # Inputs of the scoring and rule stages come from one untimed classification pass
+    classifications = classifier.classify_reviews(classify_inputs)
+    sentiments = classifier.sentiment_pipeline([review["review_text"][:512] for review in reviews])
+    support_flags = [
+        any(keyword in review["review_text"].lower() for keyword in classifier.support_keywords)
+        for review in reviews
+    ]
+    generic_flags = [classifier._is_generic_review(review["review_text"], review["rating"]) for review in reviews]
+    similarities = embedding_service.calculate_similarities_to_descriptions(
+        [review["review_text"] for review in reviews],
+        [EmbeddingService.product_text(review["product_description"], review["product_keypoints"]) for review in reviews]
+    )
+    value_scores = [
+        calculate_value_score(
+            review_text=review["review_text"],
+            product_description=review["product_description"],
+            keypoints=review["product_keypoints"],
+            matched_keypoints=result["matched_description_points"],
+            is_verified_purchase=review["is_verified_purchase"],
+            sentiment_score=result["confidence"],
+            semantic_similarity=similarity,
+            is_shadow=result["category"] == "shadow"
+        )
+        for review, result, similarity in zip(reviews, classifications, similarities)
+    ]
+    rated_reviews = [
+        {
+            "rating": review["rating"],
+            "value_score": value_score,
+            "category": result["category"],
+            "is_shadow": result["category"] == "shadow",
+            "is_verified_purchase": review["is_verified_purchase"],
+            "review_text": review["review_text"],
+        }
+        for review, result, value_score in zip(reviews, classifications, value_scores)
+    ]
+    insights_generator = ReviewInsightsGenerator()
+
+    def each(function):
+        return lambda: [function(review) for review in reviews]
+
+    return {
+        "classifier.detect_language": each(lambda review: classifier._detect_language(review["review_text"])),
+        "classifier.is_generic_review": each(
+            lambda review: classifier._is_generic_review(review["review_text"], review["rating"])
+        ),
+        "classifier.match_keypoints": each(lambda review: classifier._match_keypoints(
+            review["review_text"], review["product_keypoints"], review["product_description"]
+        )),
+        "classifier.extract_tags": each(
+            lambda review: classifier._extract_tags(review["review_text"], review["product_keypoints"])
+        ),
+        "classifier.contradicts_description": each(
+            lambda review: classifier._contradicts_description(review["review_text"], review["product_description"])
+        ),
+        "classifier.determine_category": lambda: [
+            classifier._determine_category(
+                review_text=review["review_text"],
+                rating=review["rating"],
+                sentiment_label=sentiment["label"].lower(),
+                sentiment_score=sentiment["score"],
+                has_support_keywords=has_support_keywords,
+                is_generic=is_generic,
+                matched_points=result["matched_description_points"],
+                product_description=review["product_description"]
+            )
+            for review, sentiment, result, has_support_keywords, is_generic
+            in zip(reviews, sentiments, classifications, support_flags, generic_flags)
+        ],
+        "classifier.classify_reviews": lambda: classifier.classify_reviews(classify_inputs),
+        "scoring.calculate_value_score": lambda: [
+            calculate_value_score(
+                review_text=review["review_text"],
+                product_description=review["product_description"],
+                keypoints=review["product_keypoints"],
+                matched_keypoints=result["matched_description_points"],
+                is_verified_purchase=review["is_verified_purchase"],
+                sentiment_score=result["confidence"],
+                semantic_similarity=similarity,
+                is_shadow=result["category"] == "shadow"
+            )
+            for review, result, similarity in zip(reviews, classifications, similarities)
+        ],
+        "scoring.calculate_specificity_score": each(lambda review: calculate_specificity_score(
+            review["review_text"], review["product_description"], review["product_keypoints"]
+        )),
+        "scoring.calculate_weighted_product_rating": lambda: calculate_weighted_product_rating(rated_reviews),
+        "insights.generate_insights.positive": lambda: insights_generator.generate_insights(
+            rated_reviews, category="positive"
+        ),
+        "insights.generate_insights.negative": lambda: insights_generator.generate_insights(
+            rated_reviews, category="negative"
+        ),
+    }
+
+
+def time_case(function: Callable[[], object], repeats: int) -> Dict:
+    function()
+    durations = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - started)
+    return {
+        "median_ms": round(statistics.median(durations) * 1000, 4),
+        "min_ms": round(min(durations) * 1000, 4),
+    }
+
+
+def run(sizes: List[int], repeats: int, seed: int, real_models: bool, only) -> Dict:
+    if not real_models:
+        install_stub_models()
+
+    results = {}
+    for size in sizes:
+        reviews = generate_reviews(size, seed=seed)
+        for name, function in build_cases(reviews).items():
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            timing = time_case(function, repeats)
+            timing["per_item_us"] = round(timing["median_ms"] * 1000 / size, 3)
+            results[f"{name}[{size}]"] = {"case": name, "size": size, **timing}
+
+    return {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "models": "real" if real_models else "stub",
+            "seed": seed,
+            "repeats": repeats,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> bool:
+    """Print the change per case; False when a case regressed beyond threshold."""
+    if baseline["meta"].get("models") != current["meta"].get("models"):
+        print(f"warning: baseline used {baseline['meta'].get('models')} models, current used {current['meta'].get('models')}")
+
+    ok = True
+    print(f"{'case':56} {'baseline ms':>12} {'current ms':>12} {'change':>8}")
+    for key in sorted(set(baseline["results"]) | set(current["results"])):
+        before = baseline["results"].get(key)
+        after = current["results"].get(key)
+        if before is None or after is None:
+            print(f"{key:56} {'-' if before is None else before['median_ms']:>12} {'-' if after is None else after['median_ms']:>12}    only in one run")
+            continue
+        change = after["median_ms"] / before["median_ms"] - 1 if before["median_ms"] else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"{key:56} {before['median_ms']:>12.4f} {after['median_ms']:>12.4f} {change:>+8.1%}{flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Reviews per input")
+    run_parser.add_argument("--repeats", type=int, default=7)
+    run_parser.add_argument("--seed", type=int, default=0, help="Corpus seed")
+    run_parser.add_argument("--real-models", action="store_true", help="Load the transformer models instead of the stubs")
+    run_parser.add_argument("--only", nargs="*", help="Case name prefixes to run, e.g. scoring classifier.match")
+    run_parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+
+    compare_parser = commands.add_parser("compare", help="Compare two saved runs")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown of a median, 0.10 = 10%%")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = run(args.sizes, args.repeats, args.seed, args.real_models, args.only)
+        if args.output:
+            with open(args.output, "w") as handle:
+                json.dump(results, handle, indent=2)
+            print(f"wrote {len(results['results'])} results to {args.output}")
+        else:
+            print(json.dumps(results, indent=2))
+    else:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+        with open(args.current) as handle:
+            current = json.load(handle)
+        if not compare(baseline, current, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
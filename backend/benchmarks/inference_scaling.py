@@ -0,0 +1,171 @@
+"""
+Reviews per second of the inference pool as replicas are added.
+
+For every replica count the pool of app.ai.pool is started with
+--cores-per-replica cores per replica, and the reviews of benchmarks.corpus
+are sent to it as --concurrency concurrent requests of --request-size reviews,
+the way concurrent submissions (1) or import chunks (500) arrive. The first
+row is the in-process path used with INFERENCE_REPLICAS=0: analyze_reviews in
+the worker's thread pool, at the same concurrency.
+
+The models are the deterministic stubs of app.ai.stubs unless --real-models
+is given; with the stubs the rule-based classifier and the IPC are what is
+measured, and scaling stops at the cores the machine has.
+
+    cd backend && python -m benchmarks.inference_scaling --real-models --replicas 1 2 4 8 --cores-per-replica 4
+
+Reported per row: reviews per second, speedup over one replica and scaling
+efficiency (speedup / replicas).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.ai.pool import InferencePool, analyze_reviews, parse_cpu_list
+from app.ai.stubs import install_stub_models
+from benchmarks.corpus import generate_reviews
+
+
+def classify_inputs(count: int, seed: int) -> List[Dict]:
+    return [
+        {
+            "review_id": str(index),
+            "review_text": review["review_text"],
+            "rating": review["rating"],
+            "product_description": review["product_description"],
+            "product_keypoints": review["product_keypoints"],
+            "is_verified_purchase": review["is_verified_purchase"],
+        }
+        for index, review in enumerate(generate_reviews(count, seed=seed))
+    ]
+
+
+async def drive(analyze: Callable, reviews: List[Dict], request_size: int, concurrency: int) -> float:
+    """Seconds to analyze all `reviews` with at most `concurrency` requests in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request(batch):
+        async with semaphore:
+            await analyze(batch)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        request(reviews[start:start + request_size]) for start in range(0, len(reviews), request_size)
+    ])
+    return time.perf_counter() - started
+
+
+async def measure(analyze: Callable, reviews: List[Dict], args) -> float:
+    # Warm-up: first batches pay for lazy imports and allocator growth
+    await drive(analyze, reviews[:max(len(reviews) // 10, args.request_size)], args.request_size, args.concurrency)
+    seconds = await drive(analyze, reviews, args.request_size, args.concurrency)
+    return len(reviews) / seconds
+
+
+async def run(args) -> Dict:
+    reviews = classify_inputs(args.reviews, args.seed)
+    cpus = parse_cpu_list(args.cpus) if args.cpus else sorted(os.sched_getaffinity(0))
+    replica_counts = args.replicas or [
+        count for count in (1, 2, 4, 8, 16, 32, 64) if count * args.cores_per_replica <= len(cpus)
+    ]
+
+    rows = []
+    if not args.no_baseline:
+        if not args.real_models:
+            install_stub_models()
+        reviews_per_second = await measure(
+            lambda batch: run_in_threadpool(analyze_reviews, batch, args.max_batch), reviews, args
+        )
+        rows.append({"replicas": 0, "cores": None, "reviews_per_second": round(reviews_per_second, 1)})
+
+    for replicas in replica_counts:
+        pool = InferencePool(
+            replicas=replicas,
+            cpus=cpus,
+            threads_per_replica=args.cores_per_replica,
+            max_batch=args.max_batch,
+            stub_models=not args.real_models
+        )
+        pool.start()
+        try:
+            if not pool.wait_ready(timeout=args.load_timeout):
+                raise RuntimeError(f"{replicas} replicas did not load their models within {args.load_timeout}s")
+            reviews_per_second = await measure(pool.analyze, reviews, args)
+        finally:
+            pool.stop()
+        rows.append({
+            "replicas": replicas,
+            "cores": replicas * args.cores_per_replica,
+            "reviews_per_second": round(reviews_per_second, 1)
+        })
+
+    single = next((row["reviews_per_second"] for row in rows if row["replicas"] == 1), None)
+    for row in rows:
+        if single and row["replicas"]:
+            row["speedup"] = round(row["reviews_per_second"] / single, 2)
+            row["efficiency"] = round(row["speedup"] / row["replicas"], 2)
+
+    return {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": len(set(cpus)),
+            "models": "real" if args.real_models else "stub",
+            "reviews": args.reviews,
+            "request_size": args.request_size,
+            "concurrency": args.concurrency,
+            "max_batch": args.max_batch,
+            "cores_per_replica": args.cores_per_replica,
+        },
+        "results": rows,
+    }
+
+
+def print_table(results: Dict) -> None:
+    meta = results["meta"]
+    print(
+        f"{meta['models']} models, {meta['reviews']} reviews in requests of {meta['request_size']}, "
+        f"concurrency {meta['concurrency']}, {meta['cpus']} CPUs"
+    )
+    print(f"{'replicas':>9} {'cores':>6} {'reviews/s':>11} {'speedup':>8} {'efficiency':>11}")
+    for row in results["results"]:
+        label = "in-proc" if row["replicas"] == 0 else row["replicas"]
+        print(
+            f"{label:>9} {row['cores'] if row['cores'] is not None else '-':>6} {row['reviews_per_second']:>11.1f} "
+            f"{row.get('speedup', '-'):>8} {row.get('efficiency', '-'):>11}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replicas", type=int, nargs="+", help="Replica counts; default powers of two that fit the CPUs")
+    parser.add_argument("--cores-per-replica", type=int, default=1)
+    parser.add_argument("--cpus", help='CPUs to pin replicas to, e.g. "0-15"; default the CPUs this process may use')
+    parser.add_argument("--reviews", type=int, default=2000)
+    parser.add_argument("--request-size", type=int, default=1, help="Reviews per request")
+    parser.add_argument("--concurrency", type=int, default=64, help="Requests in flight")
+    parser.add_argument("--max-batch", type=int, default=32, help="Reviews a replica runs in one pass")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus seed")
+    parser.add_argument("--real-models", action="store_true", help="Load the transformer models instead of the stubs")
+    parser.add_argument("--no-baseline", action="store_true", help="Skip the in-process row")
+    parser.add_argument("--load-timeout", type=float, default=600, help="Seconds to wait for replicas to load their models")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+
+
+if __name__ == "__main__":
+    main()
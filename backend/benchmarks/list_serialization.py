@@ -0,0 +1,242 @@
+"""
+Memory and serialization cost of the list endpoints at a large page size.
+
+Seeds one product with N published reviews inside a transaction that is
+rolled back at the end, then compares per request:
+
+- legacy: full ORM entities for every joined table, dicts built field by
+  field in Python and the default jsonable_encoder + json.dumps response;
+- current: the handlers as they are now, with column projections and
+  ORJSONResponse.
+
+Timings are medians over several requests. Serialization is the time spent
+turning the response content into the body (jsonable_encoder included for
+the legacy path). Peak memory is the tracemalloc high-water mark of one
+extra request, measured separately because tracing slows everything down.
+
+    cd backend && python -m benchmarks.list_serialization --rows 10000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from sqlalchemy import desc, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import async_engine
+from app.models import Product, BaseReview, ReviewAnalysis, PublishedReview
+from app.api.public import get_public_reviews
+from app.api.admin import get_all_reviews
+
+CATEGORIES = ["public_positive", "public_negative", "shadow"]
+
+
+class LegacyJSONResponse(JSONResponse):
+    """What FastAPI did with a returned dict: jsonable_encoder, then json.dumps."""
+
+    def render(self, content) -> bytes:
+        return super().render(jsonable_encoder(content))
+
+
+class RenderTimer:
+    """Accumulates time spent in Response.render for the wrapped classes."""
+
+    def __init__(self):
+        self.seconds = 0.0
+
+    @contextmanager
+    def patch(self, *response_classes):
+        originals = {cls: cls.render for cls in response_classes}
+
+        def timed(original):
+            def render(response, content):
+                started = time.perf_counter()
+                try:
+                    return original(response, content)
+                finally:
+                    self.seconds += time.perf_counter() - started
+            return render
+
+        for cls, original in originals.items():
+            cls.render = timed(original)
+        try:
+            yield self
+        finally:
+            for cls, original in originals.items():
+                cls.render = original
+
+
+async def seed(db: AsyncSession, rows: int) -> uuid.UUID:
+    product = (await db.execute(select(Product.id, Product.store_id))).first()
+    if product is None:
+        raise SystemExit("No products found; load database/init.sql first")
+
+    started = datetime.utcnow()
+    reviews, analyses, published = [], [], []
+    for i in range(rows):
+        review_id, analysis_id = uuid.uuid4(), uuid.uuid4()
+        category = CATEGORIES[i % len(CATEGORIES)]
+        reviews.append({
+            "id": review_id,
+            "store_id": product.store_id,
+            "product_id": product.id,
+            "reviewer_name": f"Bench Reviewer {i}" if i % 4 else None,
+            "reviewer_email": f"bench-{i}@example.com",
+            "rating": (i % 5) + 1,
+            "review_text": "Solid build and the battery lasts a full week of commuting. " * 4,
+            "is_verified_purchase": i % 2 == 0,
+            "submitted_at": started - timedelta(seconds=i)
+        })
+        analyses.append({
+            "id": analysis_id,
+            "store_id": product.store_id,
+            "review_id": review_id,
+            "category": category,
+            "confidence": 0.85,
+            "reason": "Positive review with relevant product details.",
+            "tags": ["battery", "comfort"],
+            "severity": "low",
+            "matched_description_points": ["battery life"],
+            "value_score": 40 + (i % 60)
+        })
+        published.append({
+            "id": uuid.uuid4(),
+            "review_id": review_id,
+            "analysis_id": analysis_id,
+            "store_id": product.store_id,
+            "is_shadow": category == "shadow",
+            "automatic_response": "Thank you for your feedback!"
+        })
+
+    await db.execute(insert(BaseReview), reviews)
+    await db.execute(insert(ReviewAnalysis), analyses)
+    await db.execute(insert(PublishedReview), published)
+    return product.id
+
+
+async def legacy_public_reviews(db: AsyncSession, product_id):
+    query = select(PublishedReview, BaseReview, ReviewAnalysis).join(
+        BaseReview, PublishedReview.review_id == BaseReview.id
+    ).join(
+        ReviewAnalysis, PublishedReview.analysis_id == ReviewAnalysis.id
+    ).filter(
+        BaseReview.product_id == product_id
+    ).order_by(
+        desc(ReviewAnalysis.value_score), PublishedReview.is_shadow.asc()
+    )
+    reviews = []
+    for pub_review, base_review, analysis in (await db.execute(query)).all():
+        reviews.append({
+            "id": str(base_review.id),
+            "reviewer_name": base_review.reviewer_name or "Anonymous",
+            "rating": base_review.rating,
+            "review_text": base_review.review_text,
+            "is_verified_purchase": base_review.is_verified_purchase,
+            "submitted_at": base_review.submitted_at.isoformat(),
+            "automatic_response": pub_review.automatic_response,
+            "value_score": float(analysis.value_score) if analysis.value_score else 0,
+            "helpful_count": pub_review.helpful_count,
+            "category": analysis.category,
+            "is_shadow": pub_review.is_shadow
+        })
+    return LegacyJSONResponse({"reviews": reviews, "insights": None, "total": len(reviews)})
+
+
+async def legacy_all_reviews(db: AsyncSession, limit: int):
+    query = select(BaseReview, ReviewAnalysis).outerjoin(
+        ReviewAnalysis, BaseReview.id == ReviewAnalysis.review_id
+    ).order_by(desc(BaseReview.submitted_at))
+    total = (await db.execute(select(func.count(BaseReview.id)))).scalar_one()
+    reviews = []
+    for base_review, analysis in (await db.execute(query.limit(limit))).all():
+        reviews.append({
+            "id": str(base_review.id),
+            "product_id": str(base_review.product_id),
+            "reviewer_name": base_review.reviewer_name or "Anonymous",
+            "reviewer_email": base_review.reviewer_email,
+            "rating": base_review.rating,
+            "review_text": base_review.review_text,
+            "language": base_review.language,
+            "is_verified_purchase": base_review.is_verified_purchase,
+            "submitted_at": base_review.submitted_at.isoformat(),
+            "category": analysis.category if analysis else None,
+            "confidence": float(analysis.confidence) if analysis and analysis.confidence else None,
+            "reason": analysis.reason if analysis else None,
+            "tags": analysis.tags if analysis else [],
+            "value_score": float(analysis.value_score) if analysis and analysis.value_score else None
+        })
+    return LegacyJSONResponse({"reviews": reviews, "total": total, "skip": 0, "limit": limit})
+
+
+async def measure(db: AsyncSession, make_request, repeats: int):
+    timings, render_times = [], []
+    for _ in range(repeats):
+        # Start every request with an empty identity map, as a fresh session would
+        db.expunge_all()
+        timer = RenderTimer()
+        with timer.patch(LegacyJSONResponse, ORJSONResponse):
+            started = time.perf_counter()
+            response = await make_request()
+            timings.append(time.perf_counter() - started)
+        render_times.append(timer.seconds)
+
+    db.expunge_all()
+    tracemalloc.start()
+    await make_request()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "total_ms": statistics.median(timings) * 1000,
+        "serialize_ms": statistics.median(render_times) * 1000,
+        "peak_mib": peak / (1024 * 1024),
+        "body_kib": len(response.body) / 1024
+    }
+
+
+async def run(rows: int, repeats: int) -> None:
+    async with async_engine.connect() as conn:
+        transaction = await conn.begin()
+        try:
+            db = AsyncSession(bind=conn, autoflush=False, expire_on_commit=False)
+            product_id = await seed(db, rows)
+
+            cases = {
+                "public feed / legacy": lambda: legacy_public_reviews(db, product_id),
+                "public feed / current": lambda: get_public_reviews(str(product_id), tab="all", include_shadow=True, db=db),
+                "admin all / legacy": lambda: legacy_all_reviews(db, rows),
+                "admin all / current": lambda: get_all_reviews(skip=0, limit=rows, db=db),
+            }
+
+            print(f"{rows} rows, median of {repeats} requests")
+            print(f"{'case':<24}{'total ms':>10}{'serialize ms':>14}{'peak MiB':>10}{'body KiB':>10}")
+            for name, make_request in cases.items():
+                # Warm up statement caches before measuring
+                await make_request()
+                result = await measure(db, make_request, repeats)
+                print(
+                    f"{name:<24}{result['total_ms']:>10.1f}{result['serialize_ms']:>14.1f}"
+                    f"{result['peak_mib']:>10.1f}{result['body_kib']:>10.0f}"
+                )
+        finally:
+            await transaction.rollback()
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
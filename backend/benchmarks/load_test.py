@@ -0,0 +1,429 @@
+"""
+End-to-end load test of the HTTP API.
+
+    cd backend
+    # Seed 5 stores x 20 products x 200 reviews through the bulk import pipeline
+    python -m benchmarks.load_test seed --stores 5 --products-per-store 20 --reviews-per-product 200
+    # Start a server with stub models and drive 100 requests/s for 60s
+    python -m benchmarks.load_test run --rate 100 --duration 60 --stub-models --output load.json
+    # Or drive a server that is already running (real models, several workers)
+    python -m benchmarks.load_test run --base-url http://localhost:8000 --rate 100 --duration 60
+    # Remove the seeded stores, products, reviews and users
+    python -m benchmarks.load_test drop
+
+Seeding uses benchmarks.corpus and the same BulkReviewImporter as
+/api/admin/reviews/import, so feed rows, embeddings and stats rollups are
+written as in production. Seeded products have category 'loadtest' and the
+stores a *.revi-loadtest.example domain; seeding is deterministic for a given
+--seed.
+
+The workload is open loop: requests start on a fixed schedule at --rate
+regardless of how fast responses come back, and latency is measured from the
+scheduled start, so a slow server shows up as latency instead of a lower
+request rate. The mix covers catalog browsing, both feed tabs, review
+submissions and admin listings, and can be reweighted with --mix. The report
+has p50/p95/p99 per endpoint and the status codes of failed requests; 429 and
+503 from admission control count as errors.
+
+Without --base-url, a single-worker server is started on --port against
+DATABASE_URL, with the stub models of app.ai.stubs when --stub-models is set.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import httpx
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.database import AsyncSessionLocal
+from app.models import Store, Product, User
+from app.services.bulk_import import BulkReviewImporter
+from benchmarks.corpus import PRODUCTS, generate_reviews
+
+LOADTEST_CATEGORY = "loadtest"
+LOADTEST_DOMAIN = "revi-loadtest.example"
+LOADTEST_EMAIL_DOMAIN = "loadtest.example"
+LOADTEST_NAMESPACE = uuid.UUID("3f0c5c1e-6d0a-4f7e-9d7a-6c1f1b9e2a10")
+
+# Relative weight of each endpoint in the workload
+DEFAULT_MIX = {
+    "products": 8,
+    "product": 8,
+    "rating": 8,
+    "feed_positive": 30,
+    "feed_negative": 20,
+    "submit": 10,
+    "admin_all": 6,
+    "admin_shadow": 4,
+    "admin_support": 3,
+    "admin_stats": 3,
+}
+
+
+# --- seeding -----------------------------------------------------------------
+
+def _review_rows(product_ids: List[uuid.UUID], reviews_per_product: int, seed: int):
+    now = datetime.utcnow()
+    row_number = 0
+    for product_index, product_id in enumerate(product_ids):
+        # The same template the product was created from, so reviews match its keypoints
+        corpus_index = product_index % len(PRODUCTS)
+        reviews = generate_reviews(reviews_per_product, seed=seed + product_index, product_index=corpus_index)
+        for review in reviews:
+            row_number += 1
+            yield row_number, {
+                "product_id": str(product_id),
+                "reviewer_name": f"Load Tester {row_number % 5000}",
+                "reviewer_email": f"reviewer{row_number % 5000}@{LOADTEST_EMAIL_DOMAIN}",
+                "rating": review["rating"],
+                "review_text": review["review_text"],
+                "is_verified_purchase": review["is_verified_purchase"],
+                # Spread over the last 90 days so stats and feeds see history
+                "submitted_at": now - timedelta(seconds=(row_number * 7919) % (90 * 86400)),
+            }, None
+
+
+async def seed(stores: int, products_per_store: int, reviews_per_product: int, seed_value: int) -> None:
+    async with AsyncSessionLocal() as db:
+        store_ids = []
+        for store_index in range(stores):
+            store_id = uuid.uuid5(LOADTEST_NAMESPACE, f"store-{store_index}")
+            await db.execute(pg_insert(Store).values(
+                id=store_id,
+                name=f"Load Test Store {store_index}",
+                domain=f"store{store_index}.{LOADTEST_DOMAIN}"
+            ).on_conflict_do_nothing())
+            store_ids.append(store_id)
+
+        product_ids = []
+        for store_index, store_id in enumerate(store_ids):
+            for product_index in range(products_per_store):
+                template = PRODUCTS[(store_index * products_per_store + product_index) % len(PRODUCTS)]
+                product_id = uuid.uuid5(LOADTEST_NAMESPACE, f"product-{store_index}-{product_index}")
+                await db.execute(pg_insert(Product).values(
+                    id=product_id,
+                    store_id=store_id,
+                    title=f"{template['title']} #{store_index}-{product_index}",
+                    description=template["description"],
+                    price=49.99,
+                    category=LOADTEST_CATEGORY,
+                    keypoints=template["keypoints"]
+                ).on_conflict_do_nothing())
+                product_ids.append(product_id)
+        await db.commit()
+        print(f"seeded {len(store_ids)} stores and {len(product_ids)} products", file=sys.stderr)
+
+        importer = BulkReviewImporter(db)
+        started = time.perf_counter()
+        async for event in importer.run(_review_rows(product_ids, reviews_per_product, seed_value)):
+            if event["event"] == "error":
+                print(f"row {event['row']}: {event['detail']}", file=sys.stderr)
+            else:
+                print(
+                    f"{event['event']}: {event['imported']} imported, {event['failed']} failed, "
+                    f"{time.perf_counter() - started:.1f}s",
+                    file=sys.stderr
+                )
+
+
+async def drop() -> None:
+    async with AsyncSessionLocal() as db:
+        products = (await db.execute(
+            delete(Product).where(Product.category == LOADTEST_CATEGORY)
+        )).rowcount
+        stores = (await db.execute(
+            delete(Store).where(Store.domain.like(f"%.{LOADTEST_DOMAIN}"))
+        )).rowcount
+        users = (await db.execute(
+            delete(User).where(User.email.like(f"%@{LOADTEST_EMAIL_DOMAIN}"))
+        )).rowcount
+        await db.commit()
+    print(f"deleted {stores} stores, {products} products with their reviews and {users} users", file=sys.stderr)
+
+
+# --- workload ----------------------------------------------------------------
+
+def build_requests(product_ids: List[str], rng: random.Random) -> Dict:
+    """Endpoint name -> function returning (method, path, json body)."""
+    corpus = generate_reviews(200, seed=rng.randint(0, 10 ** 6))
+    submissions = itertools.count()
+
+    def product():
+        return rng.choice(product_ids)
+
+    def submit():
+        number = next(submissions)
+        review = corpus[number % len(corpus)]
+        # A fresh email per submission keeps the idempotency fingerprint unique
+        return "POST", "/api/reviews", {
+            "product_id": product(),
+            "reviewer_name": "Load Tester",
+            "reviewer_email": f"submit{os.getpid()}-{number}@{LOADTEST_EMAIL_DOMAIN}",
+            "rating": review["rating"],
+            "review_text": review["review_text"],
+            "is_verified_purchase": review["is_verified_purchase"],
+        }
+
+    return {
+        "products": lambda: ("GET", "/api/products", None),
+        "product": lambda: ("GET", f"/api/products/{product()}", None),
+        "rating": lambda: ("GET", f"/api/products/{product()}/rating", None),
+        "feed_positive": lambda: ("GET", f"/api/products/{product()}/reviews/public?tab=positive", None),
+        "feed_negative": lambda: ("GET", f"/api/products/{product()}/reviews/public?tab=negative", None),
+        "submit": submit,
+        "admin_all": lambda: ("GET", "/api/admin/reviews/all?limit=50", None),
+        "admin_shadow": lambda: ("GET", "/api/admin/reviews/shadow", None),
+        "admin_support": lambda: ("GET", "/api/admin/support", None),
+        "admin_stats": lambda: ("GET", f"/api/admin/stats?product_id={product()}", None),
+    }
+
+
+def percentile(sorted_values: List[float], percent: float):
+    if not sorted_values:
+        return None
+    index = max(math.ceil(percent / 100 * len(sorted_values)) - 1, 0)
+    return round(sorted_values[index] * 1000, 2)
+
+
+class LoadRecorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self.dropped = 0
+
+    def record(self, name: str, seconds: float, status) -> None:
+        self.latencies[name].append(seconds)
+        if not isinstance(status, int) or status >= 400:
+            self.errors[name][str(status)] += 1
+
+    def report(self, elapsed: float) -> Dict:
+        endpoints = {}
+        for name in sorted(self.latencies):
+            latencies = sorted(self.latencies[name])
+            endpoints[name] = {
+                "requests": len(latencies),
+                "errors": sum(self.errors[name].values()),
+                "error_statuses": dict(self.errors[name]),
+                "rps": round(len(latencies) / elapsed, 2),
+                "p50_ms": percentile(latencies, 50),
+                "p95_ms": percentile(latencies, 95),
+                "p99_ms": percentile(latencies, 99),
+                "max_ms": round(latencies[-1] * 1000, 2),
+            }
+        every = sorted(latency for latencies in self.latencies.values() for latency in latencies)
+        return {
+            "total": {
+                "requests": len(every),
+                "errors": sum(endpoint["errors"] for endpoint in endpoints.values()),
+                "dropped": self.dropped,
+                "rps": round(len(every) / elapsed, 2),
+                "p50_ms": percentile(every, 50),
+                "p95_ms": percentile(every, 95),
+                "p99_ms": percentile(every, 99),
+            },
+            "endpoints": endpoints,
+        }
+
+
+async def drive(client: httpx.AsyncClient, requests: Dict, mix: Dict[str, float], rate: float,
+                duration: float, max_in_flight: int, rng: random.Random) -> Dict:
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    recorder = LoadRecorder()
+    in_flight = set()
+
+    async def fire(name: str, scheduled: float):
+        method, path, body = requests[name]()
+        try:
+            response = await client.request(method, path, json=body)
+            status = response.status_code
+        except httpx.HTTPError as exc:
+            status = type(exc).__name__
+        recorder.record(name, time.perf_counter() - scheduled, status)
+
+    started = time.perf_counter()
+    for number in range(int(rate * duration)):
+        scheduled = started + number / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) >= max_in_flight:
+            # The client cannot keep up the schedule; reported instead of silently slowing down
+            recorder.dropped += 1
+            continue
+        task = asyncio.create_task(fire(rng.choices(names, weights)[0], scheduled))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    if in_flight:
+        await asyncio.gather(*in_flight)
+    return recorder.report(time.perf_counter() - started)
+
+
+async def load_product_ids(client: httpx.AsyncClient) -> List[str]:
+    products = (await client.get("/api/products")).json()
+    seeded = [product["id"] for product in products if product.get("category") == LOADTEST_CATEGORY]
+    return seeded or [product["id"] for product in products]
+
+
+async def run_load(base_url: str, rate: float, duration: float, warmup: float,
+                   mix: Dict[str, float], max_in_flight: int, seed_value: int) -> Dict:
+    rng = random.Random(seed_value)
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        product_ids = await load_product_ids(client)
+        if not product_ids:
+            raise SystemExit("no products to load test; run the seed command first")
+        requests = build_requests(product_ids, rng)
+
+        if warmup > 0:
+            await drive(client, requests, mix, rate, warmup, max_in_flight, rng)
+        result = await drive(client, requests, mix, rate, duration, max_in_flight, rng)
+
+    result["config"] = {
+        "base_url": base_url,
+        "rate": rate,
+        "duration": duration,
+        "warmup": warmup,
+        "mix": mix,
+        "products": len(product_ids),
+        "seed": seed_value,
+    }
+    return result
+
+
+# --- server ------------------------------------------------------------------
+
+def serve(port: int, stub_models: bool) -> None:
+    import uvicorn
+
+    if stub_models:
+        from app.ai.stubs import install_stub_models
+        install_stub_models()
+    from app.main import app
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_server(port: int, stub_models: bool) -> subprocess.Popen:
+    command = [sys.executable, "-m", "benchmarks.load_test", "serve", "--port", str(port)]
+    if stub_models:
+        command.append("--stub-models")
+    server = subprocess.Popen(command, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"server exited with status {server.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    server.terminate()
+    raise SystemExit("server did not become healthy within 120s")
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = dict(DEFAULT_MIX)
+    for item in filter(None, value.split(",")):
+        name, _, weight = item.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name!r}; choose from {', '.join(DEFAULT_MIX)}")
+        mix[name] = float(weight)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def print_report(result: Dict) -> None:
+    print(f"{'endpoint':16} {'requests':>9} {'errors':>7} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in list(result["endpoints"].items()) + [("TOTAL", result["total"])]:
+        print(
+            f"{name:16} {stats['requests']:>9} {stats['errors']:>7} {stats['rps']:>8} "
+            f"{stats['p50_ms'] if stats['p50_ms'] is not None else '-':>9} "
+            f"{stats['p95_ms'] if stats['p95_ms'] is not None else '-':>9} "
+            f"{stats['p99_ms'] if stats['p99_ms'] is not None else '-':>9}"
+        )
+    for name, stats in result["endpoints"].items():
+        if stats["error_statuses"]:
+            print(f"  {name} errors: {stats['error_statuses']}")
+    if result["total"]["dropped"]:
+        print(f"  {result['total']['dropped']} scheduled requests dropped at the in-flight limit")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="Seed stores, products and reviews")
+    seed_parser.add_argument("--stores", type=int, default=5)
+    seed_parser.add_argument("--products-per-store", type=int, default=20)
+    seed_parser.add_argument("--reviews-per-product", type=int, default=200)
+    seed_parser.add_argument("--seed", type=int, default=0)
+    seed_parser.add_argument("--real-models", action="store_true", help="Classify seeded reviews with the transformer models")
+
+    commands.add_parser("drop", help="Delete everything the seed command created")
+
+    run_parser = commands.add_parser("run", help="Drive the mixed workload")
+    run_parser.add_argument("--base-url", help="Server to drive; started locally when omitted")
+    run_parser.add_argument("--port", type=int, default=8010, help="Port of the locally started server")
+    run_parser.add_argument("--stub-models", action="store_true", help="Start the local server with stub models")
+    run_parser.add_argument("--rate", type=float, default=50, help="Requests started per second")
+    run_parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    run_parser.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds before the run")
+    run_parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX),
+                            help="Endpoint weights to override, e.g. submit=0,feed_negative=40")
+    run_parser.add_argument("--max-in-flight", type=int, default=256)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--output", help="Also write the JSON report to this file")
+
+    serve_parser = commands.add_parser("serve", help=argparse.SUPPRESS)
+    serve_parser.add_argument("--port", type=int, required=True)
+    serve_parser.add_argument("--stub-models", action="store_true")
+
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        if not args.real_models:
+            from app.ai.stubs import install_stub_models
+            install_stub_models()
+        asyncio.run(seed(args.stores, args.products_per_store, args.reviews_per_product, args.seed))
+    elif args.command == "drop":
+        asyncio.run(drop())
+    elif args.command == "serve":
+        serve(args.port, args.stub_models)
+    else:
+        server = None
+        base_url = args.base_url
+        if base_url is None:
+            server = start_server(args.port, args.stub_models)
+            base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            result = asyncio.run(run_load(
+                base_url, args.rate, args.duration, args.warmup, args.mix, args.max_in_flight, args.seed
+            ))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+        print_report(result)
+        if args.output:
+            with open(args.output, "w") as handle:
+                json.dump(result, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+"""
+Plan regression check for the API's read queries.
+
+Calls each read endpoint in-process while recording the SQL it sends, then
+runs EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) for every recorded SELECT with
+the same parameters. The check fails (exit code 1) when a plan sequentially
+scans a large table, when an endpoint's statements together exceed its
+latency budget, or when an endpoint sends more queries than it is allowed.
+
+Seed a disposable database with synthetic reviews first. Synthetic products
+are tagged with category 'synthetic' and belong to stores under the
+synthetic.example domain, and seeding is idempotent, so it can be re-run with
+a larger count:
+
+    cd backend
+    python -m benchmarks.plan_check --seed 2000000
+    python -m benchmarks.plan_check
+    python -m benchmarks.plan_check --only feed_positive --show-plans
+    python -m benchmarks.plan_check --drop-synthetic
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import httpx
+from sqlalchemy import event, text
+
+from app.database import engine, async_engine
+from app.main import app
+
+SEED_BATCH_SIZE = 200_000
+REVIEWS_PER_PRODUCT = 2000
+# Review counts per product follow u ** PRODUCT_SKEW, so a few products are hot
+PRODUCT_SKEW = 1.5
+# Synthetic products are spread over this many synthetic stores, several per review partition as in production
+SYNTHETIC_STORES = 64
+
+# Tables with at least this many rows must not be read with a sequential scan
+LARGE_TABLE_ROWS = 50_000
+
+FEED_BACKFILL = Path(__file__).resolve().parents[2] / "database" / "migrations" / "001_product_review_feed.sql"
+
+
+class Check:
+    def __init__(
+        self, name: str, path: str, budget_ms: float, allow_seq_scan=(), reason: str = None, max_statements: int = None
+    ):
+        self.name = name
+        self.path = path
+        self.budget_ms = budget_ms
+        # Most SELECTs the endpoint may send, for endpoints that load in a single round trip
+        self.max_statements = max_statements
+        # Large tables this endpoint may scan in full, with the reason why
+        self.allow_seq_scan = set(allow_seq_scan)
+        self.reason = reason
+
+
+CHECKS = [
+    Check("products", "/api/products", 20),
+    # Aggregates every review of the product; hot synthetic products have ~20k
+    Check("product_rating", "/api/products/{product_id}/rating", 400),
+    Check("feed_positive", "/api/products/{product_id}/reviews/public?tab=positive", 100),
+    Check("feed_positive_shadow", "/api/products/{product_id}/reviews/public?tab=positive&include_shadow=true", 100),
+    Check("feed_negative", "/api/products/{product_id}/reviews/public?tab=negative", 100),
+    Check("feed_all", "/api/products/{product_id}/reviews/public?tab=all", 150),
+    Check("admin_all", "/api/admin/reviews/all?limit=50", 1500, allow_seq_scan={"base_reviews"},
+          reason="the exact total is a count over every review"),
+    Check("admin_all_deep_page", "/api/admin/reviews/all?skip=10000&limit=50", 1500, allow_seq_scan={"base_reviews"},
+          reason="the exact total is a count over every review"),
+    Check("admin_shadow", "/api/admin/reviews/shadow", 5000,
+          allow_seq_scan={"base_reviews", "review_analysis"},
+          reason="the list is unpaginated and returns every shadow review"),
+    Check("admin_rejected", "/api/admin/reviews/rejected", 5000,
+          allow_seq_scan={"base_reviews", "review_analysis", "rejected_reviews"},
+          reason="the list is unpaginated and returns every rejected review"),
+    Check("admin_support_open", "/api/admin/support?status=open", 1500, allow_seq_scan={"support_tickets"},
+          reason="the list is unpaginated and returns every open ticket"),
+    # The review and its analysis, publication, rejection, ticket and product in one query
+    Check("review_detail", "/api/admin/reviews/{review_id}", 20, max_statements=1),
+    # "battery" appears in an eighth of the synthetic reviews, each k<n> code in about 100
+    Check("search_common", "/api/admin/reviews/search?q=battery", 100),
+    Check("search_common_newest", "/api/admin/reviews/search?q=battery&sort=newest", 50),
+    Check("search_rare", "/api/admin/reviews/search?q=k1234", 50),
+    # The common word's GIN bitmap is intersected with the hot product's ~20k reviews
+    Check("search_product", "/api/admin/reviews/search?q=battery&product_id={product_id}", 150),
+    Check("search_romanian", "/api/admin/reviews/search?q=sunetul+clar&rating=5", 100),
+    # One index probe per monthly partition of admin_actions
+    Check("audit_target", "/api/admin/audit?target_id={review_id}", 20, max_statements=1),
+    Check("audit_admin", "/api/admin/audit?admin_user=admin&limit=50", 50, max_statements=1),
+]
+
+# Seeded review texts, mixing English and Romanian so search has a realistic vocabulary
+SYNTHETIC_TEXTS = [
+    "the battery life is great and the fit is comfortable on long commutes.",
+    "sound quality is crisp but the ear cushions wear out after a few months.",
+    "noise cancellation works well on flights, the case feels cheap.",
+    "bateria ține o săptămână și sunetul este foarte clar.",
+    "căștile sunt comode, dar microfonul este slab la apeluri.",
+    "stopped charging after two weeks, support replaced them quickly.",
+    "bass is punchy and the app equalizer is easy to use.",
+    "livrare rapidă, ambalaj frumos, recomand cu încredere.",
+]
+
+
+def seed(total_reviews: int) -> None:
+    products = max(total_reviews // REVIEWS_PER_PRODUCT, 50)
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO stores (id, name, domain)
+            SELECT md5('store-' || s)::uuid, 'Synthetic store ' || s, 'store' || s || '.synthetic.example'
+            FROM generate_series(0, :stores - 1) AS s
+            ON CONFLICT DO NOTHING
+        """), {"stores": SYNTHETIC_STORES})
+        conn.execute(text("""
+            INSERT INTO products (id, store_id, title, description, price, category, keypoints)
+            SELECT md5('product-' || i)::uuid, md5('store-' || (i % :stores))::uuid,
+                   'Synthetic product ' || i, 'Synthetic product used by the plan check', 10, 'synthetic',
+                   ARRAY['battery life', 'comfort', 'sound quality']
+            FROM generate_series(1, :products) AS i
+            ON CONFLICT DO NOTHING
+        """), {"products": products, "stores": SYNTHETIC_STORES})
+
+    for start in range(1, total_reviews + 1, SEED_BATCH_SIZE):
+        end = min(start + SEED_BATCH_SIZE - 1, total_reviews)
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            params = {
+                "start": start, "end": end, "products": products, "skew": PRODUCT_SKEW, "stores": SYNTHETIC_STORES,
+                "texts": SYNTHETIC_TEXTS, "text_count": len(SYNTHETIC_TEXTS)
+            }
+            # bucket picks the category: 60% positive, 15% negative, 8% shadow, 8% support, 9% rejected;
+            # store is the partition key the review tables share with the product
+            series = """
+                FROM generate_series(:start, :end) AS i,
+                     LATERAL (SELECT (i::bigint * 7919) % 100 AS bucket) AS b,
+                     LATERAL (SELECT 1 + floor(:products * power(((i::bigint * 2654435761) % 1000003) / 1000003.0, :skew))::int AS product) AS p,
+                     LATERAL (SELECT md5('store-' || (p.product % :stores))::uuid AS store_id) AS s
+            """
+            conn.execute(text(f"""
+                INSERT INTO base_reviews (id, store_id, product_id, reviewer_name, reviewer_email, rating, review_text,
+                                          language, is_verified_purchase, submitted_at)
+                SELECT md5('review-' || i)::uuid, s.store_id, md5('product-' || p.product)::uuid,
+                       CASE WHEN i % 5 = 0 THEN NULL ELSE 'Reviewer ' || (i % 50000) END,
+                       'reviewer' || (i % 50000) || '@example.com',
+                       1 + i % 5,
+                       'Synthetic review ' || i || ': ' || (:texts)[1 + i % :text_count] || ' Batch code k' || (i % 20000) || '.',
+                       CASE WHEN i % :text_count IN (3, 4, 7) THEN 'ro' ELSE 'en' END, i % 3 = 0,
+                       TIMESTAMP '2024-01-01' + (i || ' seconds')::interval
+                {series}
+                ON CONFLICT DO NOTHING
+            """), params)
+            conn.execute(text(f"""
+                INSERT INTO review_analysis (id, store_id, review_id, category, confidence, reason, tags, severity,
+                                             matched_description_points, value_score)
+                SELECT md5('analysis-' || i)::uuid, s.store_id, md5('review-' || i)::uuid,
+                       CASE WHEN bucket < 60 THEN 'public_positive' WHEN bucket < 75 THEN 'public_negative'
+                            WHEN bucket < 83 THEN 'shadow' WHEN bucket < 91 THEN 'support' ELSE 'rejected' END,
+                       0.85, 'Synthetic classification', ARRAY['synthetic'], 'low', ARRAY['battery life'],
+                       (i % 10000) / 100.0
+                {series}
+                ON CONFLICT DO NOTHING
+            """), params)
+            conn.execute(text(f"""
+                INSERT INTO published_reviews (id, store_id, review_id, analysis_id, is_shadow, automatic_response, helpful_count)
+                SELECT md5('published-' || i)::uuid, s.store_id, md5('review-' || i)::uuid, md5('analysis-' || i)::uuid,
+                       bucket >= 75, 'Thank you for your feedback!', i % 20
+                {series}
+                WHERE bucket < 83
+                ON CONFLICT DO NOTHING
+            """), params)
+            conn.execute(text(f"""
+                INSERT INTO support_tickets (id, review_id, analysis_id, priority, status, issue_description, customer_email)
+                SELECT md5('ticket-' || i)::uuid, md5('review-' || i)::uuid, md5('analysis-' || i)::uuid,
+                       CASE WHEN i % 3 = 0 THEN 'high' ELSE 'normal' END,
+                       (ARRAY['open', 'assigned', 'resolved', 'closed'])[1 + i % 4],
+                       'Synthetic support issue', 'reviewer' || (i % 50000) || '@example.com'
+                {series}
+                WHERE bucket >= 83 AND bucket < 91
+                ON CONFLICT DO NOTHING
+            """), params)
+            conn.execute(text(f"""
+                INSERT INTO rejected_reviews (id, review_id, analysis_id, rejection_reason, user_notified)
+                SELECT md5('rejected-' || i)::uuid, md5('review-' || i)::uuid, md5('analysis-' || i)::uuid,
+                       'Synthetic rejection', TRUE
+                {series}
+                WHERE bucket >= 91
+                ON CONFLICT DO NOTHING
+            """), params)
+        print(f"seeded reviews {start}-{end} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        print("backfilling product_review_feed", file=sys.stderr)
+        conn.exec_driver_sql(FEED_BACKFILL.read_text())
+        print("vacuum analyze", file=sys.stderr)
+        conn.exec_driver_sql("VACUUM ANALYZE")
+
+
+def drop_synthetic() -> None:
+    with engine.begin() as conn:
+        deleted = conn.execute(text("DELETE FROM products WHERE category = 'synthetic'")).rowcount
+        conn.execute(text("DELETE FROM stores WHERE domain LIKE '%.synthetic.example'"))
+    print(f"deleted {deleted} synthetic products and their reviews", file=sys.stderr)
+
+
+def walk(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from walk(child)
+
+
+class StatementRecorder:
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.statements.append((statement, parameters))
+
+
+async def explain_endpoint(client: httpx.AsyncClient, check: Check, path: str, large_tables) -> dict:
+    recorder = StatementRecorder()
+    event.listen(async_engine.sync_engine, "before_cursor_execute", recorder)
+    try:
+        response = await client.get(path)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", recorder)
+
+    result = {
+        "status": response.status_code,
+        "execution_ms": 0.0,
+        "planning_ms": 0.0,
+        "shared_hit": 0,
+        "shared_read": 0,
+        "seq_scans": [],
+        "plans": [],
+        "violations": []
+    }
+    async with async_engine.connect() as conn:
+        for statement, parameters in recorder.statements:
+            explained = await conn.exec_driver_sql(
+                "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement, parameters
+            )
+            plan = explained.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            plan = plan[0]
+            result["plans"].append({"statement": statement, "plan": plan})
+            result["execution_ms"] += plan["Execution Time"]
+            result["planning_ms"] += plan["Planning Time"]
+            result["shared_hit"] += plan["Plan"].get("Shared Hit Blocks", 0)
+            result["shared_read"] += plan["Plan"].get("Shared Read Blocks", 0)
+            for node in walk(plan["Plan"]):
+                relation = node.get("Relation Name")
+                # Partitions that run-time pruning skipped show up with zero loops
+                if node["Node Type"] == "Seq Scan" and relation in large_tables and node.get("Actual Loops"):
+                    table = large_tables[relation]
+                    result["seq_scans"].append(table)
+                    if table not in check.allow_seq_scan:
+                        result["violations"].append(f"sequential scan on {relation}")
+        await conn.rollback()
+
+    if response.status_code != 200:
+        result["violations"].append(f"endpoint returned {response.status_code}")
+    if check.max_statements is not None and len(recorder.statements) > check.max_statements:
+        result["violations"].append(f"{len(recorder.statements)} queries exceed the limit of {check.max_statements}")
+    if result["execution_ms"] > check.budget_ms:
+        result["violations"].append(f"{result['execution_ms']:.1f} ms exceeds budget of {check.budget_ms:.0f} ms")
+    return result
+
+
+async def run_checks(only, product_id, review_id, show_plans: bool) -> bool:
+    async with async_engine.connect() as conn:
+        # relation -> table, for relations of at least LARGE_TABLE_ROWS rows. A partition is judged by
+        # its own size, since that is what a scan of it reads, and reported under its parent's name
+        large_tables = dict((await conn.execute(text("""
+            SELECT c.relname, coalesce(parent.relname, c.relname)
+            FROM pg_class c
+            LEFT JOIN pg_inherits i ON i.inhrelid = c.oid
+            LEFT JOIN pg_class parent ON parent.oid = i.inhparent
+            WHERE c.relkind = 'r' AND c.reltuples >= :rows
+        """), {"rows": LARGE_TABLE_ROWS})).all())
+        if product_id is None:
+            # The product with the most published reviews exercises the feed hardest
+            product_id = (await conn.execute(text(
+                "SELECT product_id FROM product_review_feed GROUP BY product_id ORDER BY count(*) DESC LIMIT 1"
+            ))).scalar()
+        if review_id is None:
+            review_id = (await conn.execute(text("SELECT review_id FROM rejected_reviews LIMIT 1"))).scalar()
+    if product_id is None or review_id is None:
+        raise SystemExit("No reviews found; seed the database first with --seed")
+
+    ok = True
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://plan-check", timeout=None) as client:
+        print(f"{'endpoint':<22}{'exec ms':>10}{'budget':>8}{'hit':>10}{'read':>8}  result")
+        for check in CHECKS:
+            if only and check.name not in only:
+                continue
+            path = check.path.format(product_id=product_id, review_id=review_id)
+            result = await explain_endpoint(client, check, path, large_tables)
+
+            status = "ok" if not result["violations"] else "FAIL: " + "; ".join(result["violations"])
+            if result["seq_scans"] and not result["violations"]:
+                status += f" (full scan of {', '.join(sorted(set(result['seq_scans'])))}: {check.reason})"
+            print(
+                f"{check.name:<22}{result['execution_ms']:>10.1f}{check.budget_ms:>8.0f}"
+                f"{result['shared_hit']:>10}{result['shared_read']:>8}  {status}"
+            )
+            if show_plans:
+                for explained in result["plans"]:
+                    print(json.dumps(explained, indent=2))
+            ok = ok and not result["violations"]
+
+    await async_engine.dispose()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, metavar="REVIEWS", help="Seed this many synthetic reviews, then exit")
+    parser.add_argument("--drop-synthetic", action="store_true", help="Delete the synthetic products and reviews")
+    parser.add_argument("--only", nargs="*", help="Check names to run")
+    parser.add_argument("--product-id", help="Defaults to the product with the most published reviews")
+    parser.add_argument("--review-id", help="Defaults to a rejected review")
+    parser.add_argument("--show-plans", action="store_true", help="Print the EXPLAIN output for each statement")
+    args = parser.parse_args()
+
+    if args.drop_synthetic:
+        drop_synthetic()
+        return
+    if args.seed:
+        seed(args.seed)
+        return
+
+    ok = asyncio.run(run_checks(args.only, args.product_id, args.review_id, args.show_plans))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
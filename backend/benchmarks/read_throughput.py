@@ -0,0 +1,106 @@
+"""
+Closed-loop throughput benchmark for the read endpoints.
+
+Point it at a server started with a single worker, e.g.
+
+    uvicorn app.main:app --workers 1 --port 8000
+    python -m benchmarks.read_throughput --base-url http://localhost:8000 --concurrency 32
+
+To compare against the synchronous psycopg2 data layer, start a second
+server from a checkout before the async port on another port and run the
+benchmark against both. Results are requests per second for that one worker.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+
+def read_endpoints(product_id: str):
+    return {
+        "products": "/api/products",
+        "rating": f"/api/products/{product_id}/rating",
+        "feed_positive": f"/api/products/{product_id}/reviews/public?tab=positive",
+        "feed_negative": f"/api/products/{product_id}/reviews/public?tab=negative",
+        "admin_all": "/api/admin/reviews/all?limit=50",
+        "admin_shadow": "/api/admin/reviews/shadow",
+        "admin_support": "/api/admin/support",
+    }
+
+
+async def measure(client: httpx.AsyncClient, path: str, concurrency: int, duration: float):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await client.get(path)
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    if not latencies:
+        return {"requests": 0, "errors": errors, "rps": 0.0, "p50_ms": None, "p95_ms": None}
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+    }
+
+
+async def run(base_url: str, product_id: str, concurrency: int, duration: float, only):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        if product_id is None:
+            product_id = (await client.get("/api/products")).json()[0]["id"]
+
+        results = {}
+        for name, path in read_endpoints(product_id).items():
+            if only and name not in only:
+                continue
+            # Warm up connections and caches before measuring
+            await measure(client, path, concurrency, min(1.0, duration))
+            results[name] = await measure(client, path, concurrency, duration)
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--product-id", help="Defaults to the first product")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per endpoint")
+    parser.add_argument("--only", nargs="*", help="Endpoint names to run")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.base_url, args.product_id, args.concurrency, args.duration, args.only))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'endpoint':<16}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+    for name, result in results.items():
+        print(f"{name:<16}{result['rps']:>10}{result['p50_ms']:>10}{result['p95_ms']:>10}{result['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Startup cost of the API process per deployment profile.
+
+Each profile runs in a fresh interpreter that imports app.main, which is
+what uvicorn does before serving the first request:
+
+- model-free: MODELS_ENABLED=false, the read/admin profile;
+- models-lazy: the default profile right after import, before any
+  request has needed a model;
+- models-loaded: the default profile after get_classifier() and
+  get_embedding_service() have loaded both models, i.e. after the first
+  submission.
+
+Reported per profile: median import time, median time to load the models,
+peak RSS and which ML libraries ended up in sys.modules.
+
+    cd backend && python -m benchmarks.startup --repeats 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ML_MODULES = ["torch", "transformers", "sentence_transformers"]
+
+PROFILES = {
+    "model-free": {"env": {"MODELS_ENABLED": "false"}, "load_models": False},
+    "models-lazy": {"env": {"MODELS_ENABLED": "true"}, "load_models": False},
+    "models-loaded": {"env": {"MODELS_ENABLED": "true"}, "load_models": True},
+}
+
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import app.main
+result = {"import_seconds": time.perf_counter() - started, "model_load_seconds": None}
+if LOAD_MODELS:
+    from app.ai.classifier import get_classifier
+    from app.ai.embeddings import get_embedding_service
+    started = time.perf_counter()
+    get_classifier()
+    get_embedding_service()
+    result["model_load_seconds"] = time.perf_counter() - started
+# ru_maxrss is in kilobytes on Linux
+result["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+result["ml_modules"] = [name for name in ML_MODULES if name in sys.modules]
+print(json.dumps(result))
+"""
+
+
+def probe(profile: dict) -> dict:
+    code = f"LOAD_MODELS = {profile['load_models']}\nML_MODULES = {ML_MODULES!r}\n{PROBE}"
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        env={**os.environ, **profile["env"]},
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--only", nargs="*", choices=list(PROFILES), help="Profiles to run")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    results = {}
+    for name, profile in PROFILES.items():
+        if args.only and name not in args.only:
+            continue
+        runs = [probe(profile) for _ in range(args.repeats)]
+        load_times = [run["model_load_seconds"] for run in runs if run["model_load_seconds"] is not None]
+        results[name] = {
+            "import_ms": round(statistics.median(run["import_seconds"] for run in runs) * 1000, 1),
+            "model_load_ms": round(statistics.median(load_times) * 1000, 1) if load_times else None,
+            "max_rss_mb": round(statistics.median(run["max_rss_mb"] for run in runs), 1),
+            "ml_modules": runs[-1]["ml_modules"],
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'profile':15} {'import ms':>10} {'models ms':>10} {'max RSS MB':>11}  ML modules")
+    for name, result in results.items():
+        model_load = result["model_load_ms"] if result["model_load_ms"] is not None else "-"
+        print(f"{name:15} {result['import_ms']:>10} {model_load:>10} {result['max_rss_mb']:>11}  {', '.join(result['ml_modules']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
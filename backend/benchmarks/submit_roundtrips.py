@@ -0,0 +1,161 @@
+"""
+Count database round trips per review submission.
+
+Runs the same submissions through the current submit_review handler and
+through the previous write sequence (a commit and refresh after the user,
+the base review, the analysis and the routed row), using stub models.
+
+    cd backend && python -m benchmarks.submit_roundtrips --submissions 50
+"""
+import argparse
+import asyncio
+import uuid
+
+from fastapi import Request, Response
+from sqlalchemy import event
+
+from app.database import engine, SessionLocal, async_engine, AsyncSessionLocal
+from app.models import Product, User, BaseReview, ReviewAnalysis
+from app.schemas import ReviewSubmission
+from app.ai.classifier import get_classifier
+from app.ai.embeddings import get_embedding_service
+from app.ai.stubs import install_stub_models
+from app.api.public import submit_review
+from app.services.reviews import product_context, score_review, analysis_values, routing_values
+
+REVIEW_TEXTS = [
+    "The noise cancellation is excellent and the battery easily lasts a week of commuting.",
+    "Broken after two days, the left cup stopped working. I need a refund.",
+    "Great!",
+    "Terrible fit, poor sound and the red color looks nothing like the photos.",
+]
+
+# submit_review reads the client address from the request
+BENCH_REQUEST = Request({"type": "http", "headers": [], "client": ("127.0.0.1", 0)})
+
+
+class RoundTripCounter:
+    def __init__(self):
+        self.statements = 0
+        self.commits = 0
+
+    def attach(self):
+        for target in [engine, async_engine.sync_engine]:
+            event.listen(target, "before_cursor_execute", self._on_execute)
+            event.listen(target, "commit", self._on_commit)
+
+    def reset(self):
+        self.statements = 0
+        self.commits = 0
+
+    def _on_execute(self, *args):
+        self.statements += 1
+
+    def _on_commit(self, *args):
+        self.commits += 1
+
+
+def legacy_submit(db, review: ReviewSubmission, product) -> None:
+    """The pre-unit-of-work write sequence, kept here for comparison."""
+    user = None
+    if review.reviewer_email:
+        user = db.query(User).filter(User.email == review.reviewer_email).first()
+        if not user:
+            user = User(name=review.reviewer_name, email=review.reviewer_email,
+                        is_verified_purchaser=review.is_verified_purchase)
+            db.add(user)
+            db.commit()
+            db.refresh(user)
+
+    base_review = BaseReview(
+        store_id=product.store_id,
+        product_id=product.id,
+        user_id=user.id if user else None,
+        reviewer_name=review.reviewer_name,
+        reviewer_email=review.reviewer_email,
+        rating=review.rating,
+        review_text=review.review_text,
+        is_verified_purchase=review.is_verified_purchase
+    )
+    db.add(base_review)
+    db.commit()
+    db.refresh(base_review)
+
+    description, keypoints = product_context(product)
+    classification = get_classifier().classify_review(
+        str(base_review.id), review.review_text, review.rating, description, keypoints, review.is_verified_purchase
+    )
+    similarity = get_embedding_service().calculate_similarity_to_description(review.review_text, description, keypoints)
+    value_score = score_review(review.review_text, product, classification, similarity, review.is_verified_purchase)
+
+    analysis = ReviewAnalysis(**analysis_values(base_review.id, product.store_id, classification, value_score))
+    db.add(analysis)
+    db.commit()
+    db.refresh(analysis)
+
+    model, values = routing_values(base_review.id, analysis.id, product.store_id, classification, review.review_text,
+                                   review.reviewer_email, review.is_verified_purchase)
+    if model is not None:
+        db.add(model(**values))
+        db.commit()
+
+
+def make_submissions(product_id: str, count: int, repeat_users: bool):
+    run_id = uuid.uuid4().hex[:8]
+    for i in range(count):
+        user = i % 5 if repeat_users else i
+        yield ReviewSubmission(
+            product_id=product_id,
+            reviewer_name=f"Bench User {user}",
+            reviewer_email=f"bench-{run_id}-{user}@example.com",
+            rating=(i % 5) + 1,
+            review_text=REVIEW_TEXTS[i % len(REVIEW_TEXTS)],
+            is_verified_purchase=i % 2 == 0
+        )
+
+
+async def current_submits(reviews) -> None:
+    for review in reviews:
+        async with AsyncSessionLocal() as db:
+            await submit_review(review, request=BENCH_REQUEST, response=Response(), idempotency_key=None, db=db)
+    await async_engine.dispose()
+
+
+def run(submissions: int, repeat_users: bool) -> None:
+    install_stub_models()
+    counter = RoundTripCounter()
+    counter.attach()
+
+    with SessionLocal() as db:
+        product = db.query(Product).first()
+        if product is None:
+            raise SystemExit("No products found; load database/init.sql first")
+        product_id = str(product.id)
+
+    results = {}
+    for label in ["legacy", "current"]:
+        counter.reset()
+        reviews = list(make_submissions(product_id, submissions, repeat_users))
+        if label == "legacy":
+            for review in reviews:
+                with SessionLocal() as db:
+                    legacy_submit(db, review, db.query(Product).filter(Product.id == product.id).first())
+        else:
+            asyncio.run(current_submits(reviews))
+        results[label] = (counter.statements / submissions, counter.commits / submissions)
+
+    print(f"{'path':<10}{'statements':>12}{'commits':>10}{'round trips':>14}")
+    for label, (statements, commits) in results.items():
+        print(f"{label:<10}{statements:>12.2f}{commits:>10.2f}{statements + commits:>14.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--submissions", type=int, default=50)
+    parser.add_argument("--repeat-users", action="store_true", help="Reuse a handful of reviewer emails")
+    args = parser.parse_args()
+    run(args.submissions, args.repeat_users)
+
+
+if __name__ == "__main__":
+    main()
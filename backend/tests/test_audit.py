@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from app.models import BaseReview
+
+
+def test_offset_bounds_filter_in_utc(api):
+    async def test(client, db):
+        review_id = (await db.execute(select(BaseReview.id).limit(1))).scalar_one()
+        response = await client.post(f"/api/admin/reviews/{review_id}/override", json={
+            "new_category": "shadow",
+            "reason": "Audit range test",
+            "admin_user": "tests"
+        })
+        assert response.status_code == 200
+
+        # The same instant an hour ago, written in UTC+02:00 and in Z
+        hour_ago = datetime.now(timezone.utc) - timedelta(hours=1)
+        responses = []
+        for bounds in [
+            {"performed_from": hour_ago.astimezone(timezone(timedelta(hours=2))).isoformat()},
+            {"performed_to": hour_ago.isoformat().replace("+00:00", "Z")},
+        ]:
+            responses.append(await client.get("/api/admin/audit", params={"target_id": str(review_id), **bounds}))
+        return responses
+
+    since, until = api(test)
+    assert since.status_code == 200 and until.status_code == 200
+    assert since.json()["actions"][0]["reason"] == "Audit range test"
+    assert all(action["reason"] != "Audit range test" for action in until.json()["actions"])
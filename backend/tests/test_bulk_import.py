@@ -0,0 +1,50 @@
+import io
+import json
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app.models import BaseReview
+from app.services.bulk_import import parse_import_rows
+
+
+def parse(content: bytes, import_format: str):
+    return list(parse_import_rows(io.BytesIO(content), import_format))
+
+
+def test_extra_csv_fields_fail_only_their_row():
+    rows = parse(b"product_id,review_text\na,first\nb,second,extra\nc,third\n", "csv")
+    assert [(row_number, error) for row_number, _, error in rows] == [(2, None), (3, "Too many fields"), (4, None)]
+
+
+def test_invalid_utf8_fails_only_its_line():
+    rows = parse(b'{"review_text": "first"}\n{"review_text": "\xff"}\n{"review_text": "third"}\n', "ndjson")
+    assert [error for _, _, error in rows] == [None, "Invalid UTF-8", None]
+
+
+def test_offset_timestamps_import_as_utc(api, product_id, marker):
+    csv_upload = (
+        "product_id,rating,review_text,submitted_at\n"
+        f"{product_id},5,Great sound from the csv {marker},2023-01-01T10:00:00Z\n"
+    )
+    ndjson_upload = json.dumps({
+        "product_id": product_id,
+        "rating": 4,
+        "review_text": f"Good battery from the ndjson {marker}",
+        "submitted_at": "2023-01-01T12:30:00+02:00"
+    }) + "\n"
+
+    async def test(client, db):
+        summaries = []
+        for filename, content in [("reviews.csv", csv_upload), ("reviews.ndjson", ndjson_upload)]:
+            response = await client.post("/api/admin/reviews/import", files={"file": (filename, content.encode())})
+            assert response.status_code == 200
+            summaries.append(json.loads(response.text.strip().splitlines()[-1]))
+        stored = (await db.execute(
+            select(BaseReview.submitted_at).where(BaseReview.review_text.contains(marker)).order_by(BaseReview.rating)
+        )).scalars().all()
+        return summaries, stored
+
+    summaries, stored = api(test)
+    assert [(summary["imported"], summary["failed"]) for summary in summaries] == [(1, 0), (1, 0)]
+    assert stored == [datetime(2023, 1, 1, 10, 30), datetime(2023, 1, 1, 10, 0)]
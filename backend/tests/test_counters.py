@@ -0,0 +1,35 @@
+import uuid
+
+from sqlalchemy import select
+
+from app.counters import CounterBuffer
+from app.models import PublishedReview
+
+
+def test_unknown_ids_cannot_starve_known_reviews(api):
+    async def test(client, db):
+        review_id = (await db.execute(select(PublishedReview.review_id).limit(1))).scalar_one()
+        buffer = CounterBuffer(max_unverified_keys=5)
+
+        # The first flush confirms the review
+        buffer.add(review_id, views=1)
+        await buffer.flush()
+        views_before = (await db.execute(
+            select(PublishedReview.views).where(PublishedReview.review_id == review_id)
+        )).scalar_one()
+
+        for _ in range(100):
+            buffer.add(uuid.uuid4(), views=1)
+        buffer.add(review_id, views=1, helpful=1)
+        await buffer.flush()
+
+        await db.commit()
+        views_after = (await db.execute(
+            select(PublishedReview.views).where(PublishedReview.review_id == review_id)
+        )).scalar_one()
+        return buffer, views_after - views_before
+
+    buffer, views_added = api(test)
+    assert views_added == 1
+    # Five random ids were buffered and dropped by the flush, the rest never got in
+    assert (buffer.unknown, buffer.dropped) == (5, 95)
@@ -0,0 +1,81 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+
+from app.ai.classifier import get_classifier
+from app.models import SubmissionKey
+from app.services.idempotency import IDEMPOTENCY_WINDOW_SECONDS, purge_submission_keys
+
+
+def test_purge_deletes_only_expired_keys(api, marker):
+    expired_at = datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_WINDOW_SECONDS + 60)
+    keys = {f"hash:{marker}-old-{index}": expired_at for index in range(3)}
+    keys[f"hash:{marker}-new"] = datetime.utcnow()
+
+    async def test(client, db):
+        await db.execute(insert(SubmissionKey), [
+            {"key": key, "request_hash": marker, "created_at": created_at} for key, created_at in keys.items()
+        ])
+        await db.commit()
+        await purge_submission_keys(db, batch_size=2)
+        return (await db.execute(select(SubmissionKey.key).where(SubmissionKey.request_hash == marker))).scalars().all()
+
+    assert api(test) == [f"hash:{marker}-new"]
+
+
+def test_cancelled_submission_releases_its_claim(api, product_id, marker, monkeypatch):
+    classifier = get_classifier()
+    classify_review = classifier.classify_review
+
+    def slow_classify_review(*args, **kwargs):
+        time.sleep(1)
+        return classify_review(*args, **kwargs)
+
+    monkeypatch.setattr(classifier, "classify_review", slow_classify_review)
+    body = {"product_id": product_id, "rating": 5, "review_text": f"Great sound {marker}"}
+    headers = {"Idempotency-Key": marker}
+
+    async def test(client, db):
+        # The client goes away while the review is classified
+        request = asyncio.create_task(client.post("/api/reviews", json=body, headers=headers))
+        await asyncio.sleep(0.5)
+        request.cancel()
+        try:
+            await request
+        except asyncio.CancelledError:
+            pass
+        await asyncio.sleep(1)
+
+        monkeypatch.setattr(classifier, "classify_review", classify_review)
+        started = time.monotonic()
+        response = await client.post("/api/reviews", json=body, headers=headers)
+        return response, time.monotonic() - started
+
+    response, seconds = api(test)
+    assert response.status_code == 200
+    assert "Idempotent-Replayed" not in response.headers
+    # Processed at once, not after waiting for the abandoned claim
+    assert seconds < 1
+
+
+def test_header_keys_are_scoped_to_product_and_reviewer(api, product_id, marker):
+    async def test(client, db):
+        responses = []
+        for reviewer_email, review_text in [(f"first-{marker}@example.com", "Great sound"), (f"second-{marker}@example.com", "Good battery")]:
+            responses.append(await client.post(
+                "/api/reviews",
+                json={
+                    "product_id": product_id,
+                    "reviewer_email": reviewer_email,
+                    "rating": 5,
+                    "review_text": f"{review_text} {marker}"
+                },
+                headers={"Idempotency-Key": "1"}
+            ))
+        return responses
+
+    first, second = api(test)
+    assert first.status_code == 200 and second.status_code == 200
+    assert "Idempotent-Replayed" not in second.headers
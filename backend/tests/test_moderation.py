@@ -0,0 +1,28 @@
+import json
+
+
+def test_bulk_override_filter_with_offset_bounds(api, product_id, marker):
+    upload = "\n".join(
+        json.dumps({
+            "product_id": product_id,
+            "rating": 5,
+            "review_text": f"Great sound {marker} {submitted_at}",
+            "submitted_at": submitted_at
+        })
+        for submitted_at in ["2021-05-01T09:00:00", "2021-05-01T11:00:00"]
+    ) + "\n"
+
+    async def test(client, db):
+        response = await client.post("/api/admin/reviews/import", files={"file": ("reviews.ndjson", upload.encode())})
+        assert json.loads(response.text.strip().splitlines()[-1])["imported"] == 2
+        # 12:00+02:00 is 10:00 UTC, between the two reviews
+        return await client.post("/api/admin/reviews/override", json={
+            "new_category": "shadow",
+            "reason": "Bulk filter test",
+            "admin_user": "tests",
+            "filter": {"product_id": product_id, "q": marker, "submitted_from": "2021-05-01T12:00:00+02:00"}
+        })
+
+    response = api(test)
+    assert response.status_code == 200
+    assert response.json()["updated"] == 1
@@ -0,0 +1,29 @@
+import asyncio
+
+import httpx
+
+from app import profiling
+from app.main import app
+
+
+def get_profiles(headers=None):
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return [
+                (await client.get(path, headers=headers)).status_code
+                for path in ["/api/admin/profiles", "/api/admin/profiles/abc", "/api/admin/profiles/abc/download"]
+            ]
+    return asyncio.run(main())
+
+
+def test_profiles_are_hidden_without_a_configured_token(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_TOKEN", None)
+    assert get_profiles({"X-Revi-Profile-Token": "anything"}) == [404, 404, 404]
+
+
+def test_profiles_need_the_token(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_TOKEN", "secret")
+    assert get_profiles() == [403, 403, 403]
+    assert get_profiles({"X-Revi-Profile-Token": "wrong"}) == [403, 403, 403]
+    # Unknown profile ids are 404 once the token is accepted
+    assert get_profiles({"X-Revi-Profile-Token": "secret"}) == [200, 404, 404]
@@ -0,0 +1,30 @@
+import json
+
+
+def test_offset_bounds_filter_in_utc(api, product_id, marker):
+    upload = "\n".join(
+        json.dumps({
+            "product_id": product_id,
+            "rating": 5,
+            "review_text": f"Great sound {marker} {submitted_at}",
+            "submitted_at": submitted_at
+        })
+        for submitted_at in ["2021-03-01T09:00:00", "2021-03-01T11:00:00"]
+    ) + "\n"
+
+    async def test(client, db):
+        response = await client.post("/api/admin/reviews/import", files={"file": ("reviews.ndjson", upload.encode())})
+        assert json.loads(response.text.strip().splitlines()[-1])["imported"] == 2
+        # 12:00+02:00 is 10:00 UTC, between the two reviews
+        response = await client.get("/api/admin/reviews/search", params={
+            "q": marker,
+            "product_id": product_id,
+            "submitted_from": "2021-03-01T12:00:00+02:00",
+            "submitted_to": "2021-03-01T12:00:00Z",
+            "sort": "newest"
+        })
+        return response
+
+    response = api(test)
+    assert response.status_code == 200
+    assert [review["review_text"] for review in response.json()["reviews"]] == [f"Great sound {marker} 2021-03-01T11:00:00"]
@@ -0,0 +1,32 @@
+from sqlalchemy import select, text
+
+from app.models import BaseReview
+
+
+def test_known_reviewer_reuses_user_without_rewriting_it(api, product_id, marker):
+    email = f"{marker}@example.com"
+
+    async def test(client, db):
+        statuses, row_versions = [], []
+        for review_text in ["Great sound", "Good battery"]:
+            response = await client.post("/api/reviews", json={
+                "product_id": product_id,
+                "reviewer_email": email,
+                "rating": 5,
+                "review_text": f"{review_text} {marker}"
+            })
+            statuses.append(response.status_code)
+            # xmin changes whenever the row is rewritten
+            row_versions.append((await db.execute(
+                text("SELECT id, xmin::text FROM users WHERE email = :email"), {"email": email}
+            )).one())
+            await db.commit()
+        user_ids = (await db.execute(
+            select(BaseReview.user_id).where(BaseReview.review_text.contains(marker))
+        )).scalars().all()
+        return statuses, row_versions, user_ids
+
+    statuses, row_versions, user_ids = api(test)
+    assert statuses == [200, 200]
+    assert row_versions[0] == row_versions[1]
+    assert user_ids == [row_versions[0][0]] * 2
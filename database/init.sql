@@ -3,6 +3,28 @@
 
 -- Enable UUID extension
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+CREATE EXTENSION IF NOT EXISTS unaccent;
+CREATE EXTENSION IF NOT EXISTS vector;
+
+-- Full-text search configurations that strip diacritics before stemming,
+-- so "ingrozitor" matches "îngrozitor" and "cafe" matches "café"
+CREATE TEXT SEARCH CONFIGURATION english_unaccent (COPY = english);
+ALTER TEXT SEARCH CONFIGURATION english_unaccent
+    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, english_stem;
+-- Every review is indexed under both configurations, so the Romanian one drops
+-- English stopwords too; otherwise "the" or "and" would match almost every review
+CREATE TEXT SEARCH DICTIONARY english_stopwords (TEMPLATE = simple, STOPWORDS = english, ACCEPT = false);
+CREATE TEXT SEARCH CONFIGURATION romanian_unaccent (COPY = romanian);
+ALTER TEXT SEARCH CONFIGURATION romanian_unaccent
+    ALTER MAPPING FOR asciiword, asciihword, hword_asciipart WITH english_stopwords, romanian_stem;
+ALTER TEXT SEARCH CONFIGURATION romanian_unaccent
+    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, romanian_stem;
+
+-- Search document of a review: the text under both configurations, since the language is often unknown
+CREATE FUNCTION review_search_vector(review_text TEXT) RETURNS TSVECTOR AS $$
+    SELECT to_tsvector('english_unaccent', coalesce(review_text, ''))
+        || to_tsvector('romanian_unaccent', coalesce(review_text, ''))
+$$ LANGUAGE SQL IMMUTABLE;
 
 -- Stores table
 CREATE TABLE stores (
@@ -43,9 +65,15 @@ CREATE TABLE users (
     total_reviews INTEGER DEFAULT 0
 );
 
+-- The review tables are hash partitioned by store, so one store's vacuum, index bloat and
+-- feed queries stay in its own partitions. store_id is copied from the product; rows of one
+-- review share a store and therefore a partition number. Queries that know the product
+-- filter on its store_id as well (see in_product_store in backend/app/services/reviews.py).
+
 -- Base reviews table (all submitted reviews, raw)
 CREATE TABLE base_reviews (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    store_id UUID NOT NULL, -- partition key, the product's store
     product_id UUID REFERENCES products(id) ON DELETE CASCADE,
     user_id UUID REFERENCES users(id) ON DELETE SET NULL,
     reviewer_name VARCHAR(255),
@@ -55,13 +83,30 @@ CREATE TABLE base_reviews (
     language VARCHAR(10), -- 'en' or 'ro'
     is_verified_purchase BOOLEAN DEFAULT FALSE,
     submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    ip_address VARCHAR(45)
-);
+    ip_address VARCHAR(45),
+    search_vector TSVECTOR, -- maintained by trg_base_reviews_search_vector
+    CONSTRAINT base_reviews_store_pkey PRIMARY KEY (id, store_id)
+) PARTITION BY HASH (store_id);
+
+CREATE FUNCTION base_reviews_search_vector() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.search_vector := review_search_vector(NEW.review_text);
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_base_reviews_search_vector
+    BEFORE INSERT OR UPDATE OF review_text ON base_reviews
+    FOR EACH ROW EXECUTE FUNCTION base_reviews_search_vector();
+
+-- Track more lexemes so the planner sees rare search terms as rare and uses the GIN index
+ALTER TABLE base_reviews ALTER COLUMN search_vector SET STATISTICS 1000;
 
 -- Review analysis table (AI classification results)
 CREATE TABLE review_analysis (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-    review_id UUID REFERENCES base_reviews(id) ON DELETE CASCADE UNIQUE,
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    store_id UUID NOT NULL, -- partition key, the review's store
+    review_id UUID,
     category VARCHAR(50) NOT NULL, -- 'public_positive', 'public_negative', 'support', 'shadow', 'rejected'
     confidence DECIMAL(3, 2) CHECK (confidence >= 0 AND confidence <= 1),
     reason TEXT,
@@ -71,27 +116,60 @@ CREATE TABLE review_analysis (
     matched_description_points TEXT[],
     suggested_automatic_response TEXT,
     value_score DECIMAL(5, 2) DEFAULT 0, -- Calculated ranking score
-    analyzed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    analyzed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT review_analysis_store_pkey PRIMARY KEY (id, store_id),
+    CONSTRAINT review_analysis_store_review_key UNIQUE (review_id, store_id) INCLUDE (category, value_score),
+    CONSTRAINT review_analysis_store_review_fkey FOREIGN KEY (review_id, store_id)
+        REFERENCES base_reviews (id, store_id) ON DELETE CASCADE
+) PARTITION BY HASH (store_id);
 
 -- Published reviews table (public-facing reviews)
 CREATE TABLE published_reviews (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-    review_id UUID REFERENCES base_reviews(id) ON DELETE CASCADE,
-    analysis_id UUID REFERENCES review_analysis(id) ON DELETE CASCADE,
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    store_id UUID NOT NULL, -- partition key, the review's store
+    review_id UUID,
+    analysis_id UUID,
     is_shadow BOOLEAN DEFAULT FALSE, -- Shadow-banned reviews
     automatic_response TEXT,
     response_language VARCHAR(10) DEFAULT 'en',
     published_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     views INTEGER DEFAULT 0,
-    helpful_count INTEGER DEFAULT 0
-);
+    helpful_count INTEGER DEFAULT 0,
+    CONSTRAINT published_reviews_store_pkey PRIMARY KEY (id, store_id),
+    CONSTRAINT published_reviews_store_review_fkey FOREIGN KEY (review_id, store_id)
+        REFERENCES base_reviews (id, store_id) ON DELETE CASCADE,
+    CONSTRAINT published_reviews_store_analysis_fkey FOREIGN KEY (analysis_id, store_id)
+        REFERENCES review_analysis (id, store_id) ON DELETE CASCADE
+) PARTITION BY HASH (store_id);
+
+-- 16 partitions per review table
+DO $$
+BEGIN
+    FOR remainder IN 0..15 LOOP
+        EXECUTE format(
+            'CREATE TABLE base_reviews_p%s PARTITION OF base_reviews FOR VALUES WITH (MODULUS 16, REMAINDER %s)',
+            remainder, remainder
+        );
+        EXECUTE format(
+            'CREATE TABLE review_analysis_p%s PARTITION OF review_analysis FOR VALUES WITH (MODULUS 16, REMAINDER %s)',
+            remainder, remainder
+        );
+        EXECUTE format(
+            'CREATE TABLE published_reviews_p%s PARTITION OF published_reviews FOR VALUES WITH (MODULUS 16, REMAINDER %s)',
+            remainder, remainder
+        );
+    END LOOP;
+END
+$$;
+
+-- The tables below reference reviews by id alone, which cannot be a foreign key to the
+-- partitioned tables; trg_base_reviews_delete_dependents deletes their rows with the review
 
 -- Rejected reviews table (not published)
 CREATE TABLE rejected_reviews (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-    review_id UUID REFERENCES base_reviews(id) ON DELETE CASCADE,
-    analysis_id UUID REFERENCES review_analysis(id) ON DELETE CASCADE,
+    review_id UUID,
+    analysis_id UUID,
     rejection_reason TEXT NOT NULL,
     user_notified BOOLEAN DEFAULT FALSE,
     notification_message TEXT,
@@ -101,8 +179,8 @@ CREATE TABLE rejected_reviews (
 -- Support tickets table
 CREATE TABLE support_tickets (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-    review_id UUID REFERENCES base_reviews(id) ON DELETE CASCADE,
-    analysis_id UUID REFERENCES review_analysis(id) ON DELETE CASCADE,
+    review_id UUID,
+    analysis_id UUID,
     priority VARCHAR(20) DEFAULT 'normal', -- 'high', 'normal', 'low'
     status VARCHAR(20) DEFAULT 'open', -- 'open', 'assigned', 'resolved', 'closed'
     assigned_to VARCHAR(255),
@@ -114,9 +192,13 @@ CREATE TABLE support_tickets (
     resolved_at TIMESTAMP
 );
 
--- Admin actions table (audit trail)
+-- Admin actions table (append-only audit trail), range partitioned by month of performed_at.
+-- admin_actions_create_partition adds a month; python -m app.cli maintain-audit-log creates
+-- the coming months ahead of time and archives months past the retention (see
+-- backend/app/services/audit.py). Rows of a month without a partition land in
+-- admin_actions_default until that month's partition is created.
 CREATE TABLE admin_actions (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
     admin_user VARCHAR(255) NOT NULL,
     action_type VARCHAR(50) NOT NULL, -- 'override', 'publish', 'reject', 'assign_ticket', etc.
     target_id UUID NOT NULL, -- ID of the affected entity
@@ -124,18 +206,184 @@ CREATE TABLE admin_actions (
     reason TEXT,
     old_value TEXT,
     new_value TEXT,
-    performed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    performed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT admin_actions_pkey PRIMARY KEY (id, performed_at)
+) PARTITION BY RANGE (performed_at);
+
+CREATE TABLE admin_actions_default PARTITION OF admin_actions DEFAULT;
+
+-- Entries are never changed or deleted; old months leave as whole partitions
+CREATE OR REPLACE FUNCTION admin_actions_append_only()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Set by admin_actions_create_partition while it moves rows out of the default partition
+    IF current_setting('revi.admin_actions_maintenance', true) = 'on' THEN
+        RETURN OLD;
+    END IF;
+    RAISE EXCEPTION 'admin_actions is append-only';
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_admin_actions_append_only
+    BEFORE UPDATE OR DELETE ON admin_actions
+    FOR EACH ROW
+    EXECUTE FUNCTION admin_actions_append_only();
+
+-- Creates the partition of the month containing month_of unless it exists, moving that month's
+-- rows out of the default partition; returns the partition's name
+CREATE OR REPLACE FUNCTION admin_actions_create_partition(month_of DATE)
+RETURNS TEXT AS $$
+DECLARE
+    month_start TIMESTAMP := date_trunc('month', month_of);
+    month_end TIMESTAMP := date_trunc('month', month_of) + INTERVAL '1 month';
+    partition_name TEXT := 'admin_actions_' || to_char(month_of, 'YYYY_MM');
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+
+    EXECUTE format('CREATE TABLE %I (LIKE admin_actions INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', partition_name);
+    PERFORM set_config('revi.admin_actions_maintenance', 'on', true);
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM admin_actions_default WHERE performed_at >= %L AND performed_at < %L RETURNING *) '
+        'INSERT INTO %I SELECT * FROM moved',
+        month_start, month_end, partition_name
+    );
+    PERFORM set_config('revi.admin_actions_maintenance', 'off', true);
+    EXECUTE format(
+        'ALTER TABLE admin_actions ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, month_start, month_end
+    );
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- This month and the next three
+DO $$
+BEGIN
+    FOR months IN 0..3 LOOP
+        PERFORM admin_actions_create_partition(CAST(date_trunc('month', now()) + months * INTERVAL '1 month' AS DATE));
+    END LOOP;
+END $$;
+
+-- Public review feed (denormalized read model of published reviews, kept in sync by the API)
+CREATE TABLE product_review_feed (
+    review_id UUID PRIMARY KEY,
+    product_id UUID NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    tab VARCHAR(20) NOT NULL, -- 'positive', 'negative', 'other'
+    is_shadow BOOLEAN NOT NULL DEFAULT FALSE,
+    value_score DOUBLE PRECISION NOT NULL DEFAULT 0,
+    category VARCHAR(50) NOT NULL,
+    reviewer_name VARCHAR(255) NOT NULL, -- 'Anonymous' when the reviewer gave no name
+    rating INTEGER NOT NULL,
+    review_text TEXT NOT NULL,
+    is_verified_purchase BOOLEAN NOT NULL DEFAULT FALSE,
+    submitted_at TIMESTAMP NOT NULL,
+    automatic_response TEXT,
+    helpful_count INTEGER NOT NULL DEFAULT 0
+);
+
+-- Idempotency keys of review submissions; a duplicate submission returns the stored response
+CREATE TABLE review_submission_keys (
+    key VARCHAR(160) PRIMARY KEY, -- 'header:<hash of Idempotency-Key, product, reviewer>' or 'hash:<fingerprint>'
+    request_hash VARCHAR(64) NOT NULL,
+    review_id UUID,
+    response JSONB,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Sentence embeddings of reviews for semantic search, written with the review
+CREATE TABLE review_embeddings (
+    review_id UUID PRIMARY KEY,
+    product_id UUID NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    embedding vector(384) NOT NULL, -- paraphrase-multilingual-MiniLM-L12-v2
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Review counts per UTC day, product, category, severity and language, kept in sync by the API
+CREATE TABLE moderation_stats_daily (
+    day DATE NOT NULL,
+    product_id UUID NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    category VARCHAR(50) NOT NULL,
+    severity VARCHAR(20) NOT NULL, -- 'unknown' when not classified
+    language VARCHAR(10) NOT NULL, -- 'unknown' for reviews stored before detection
+    store_id UUID REFERENCES stores(id) ON DELETE CASCADE,
+    review_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, product_id, category, severity, language)
+);
+
+-- Progress of reclassification runs (python -m app.cli reclassify-reviews), for resuming
+CREATE TABLE reclassification_jobs (
+    name VARCHAR(100) PRIMARY KEY,
+    dry_run BOOLEAN NOT NULL,
+    product_id UUID, -- only this product's reviews, when set
+    last_review_id UUID, -- checkpoint; reviews are processed in id order
+    processed INTEGER NOT NULL DEFAULT 0,
+    flipped INTEGER NOT NULL DEFAULT 0,
+    applied INTEGER NOT NULL DEFAULT 0,
+    skipped INTEGER NOT NULL DEFAULT 0,
+    flips JSONB NOT NULL DEFAULT '{}', -- {"old->new": count}
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+-- Outbox of moderation events for the admin event stream, written in the transaction of the change.
+-- Readers only pass events of transactions older than every running one, so (tx_id, id) order
+-- is final and an event that commits late is never skipped
+CREATE TABLE moderation_events (
+    id BIGSERIAL PRIMARY KEY,
+    tx_id BIGINT NOT NULL DEFAULT CAST(CAST(pg_current_xact_id() AS TEXT) AS BIGINT),
+    event_type VARCHAR(50) NOT NULL, -- review_classified, ticket_created, review_overridden, ticket_assigned
+    payload JSONB NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Rows of the tables without a foreign key to the review tables go with their review
+CREATE FUNCTION base_reviews_delete_dependents() RETURNS TRIGGER AS $$
+BEGIN
+    DELETE FROM rejected_reviews WHERE review_id IN (SELECT id FROM deleted_reviews);
+    DELETE FROM support_tickets WHERE review_id IN (SELECT id FROM deleted_reviews);
+    DELETE FROM product_review_feed WHERE review_id IN (SELECT id FROM deleted_reviews);
+    DELETE FROM review_submission_keys WHERE review_id IN (SELECT id FROM deleted_reviews);
+    DELETE FROM review_embeddings WHERE review_id IN (SELECT id FROM deleted_reviews);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_base_reviews_delete_dependents
+    AFTER DELETE ON base_reviews
+    REFERENCING OLD TABLE AS deleted_reviews
+    FOR EACH STATEMENT EXECUTE FUNCTION base_reviews_delete_dependents();
+
 -- Indexes for performance
 CREATE INDEX idx_products_store ON products(store_id);
-CREATE INDEX idx_base_reviews_product ON base_reviews(product_id);
-CREATE INDEX idx_base_reviews_submitted ON base_reviews(submitted_at DESC);
-CREATE INDEX idx_review_analysis_review ON review_analysis(review_id);
-CREATE INDEX idx_review_analysis_category ON review_analysis(category);
-CREATE INDEX idx_published_reviews_review ON published_reviews(review_id);
+CREATE INDEX idx_base_reviews_store_product ON base_reviews(store_id, product_id) INCLUDE (id, rating, is_verified_purchase);
+CREATE INDEX idx_base_reviews_store_submitted ON base_reviews(submitted_at DESC);
+CREATE INDEX idx_base_reviews_store_search ON base_reviews USING GIN (search_vector);
+CREATE INDEX idx_review_embeddings_hnsw ON review_embeddings USING hnsw (embedding vector_cosine_ops);
+CREATE INDEX idx_review_embeddings_product ON review_embeddings(product_id);
+CREATE INDEX idx_review_analysis_store_category ON review_analysis(category);
+CREATE INDEX idx_published_reviews_store_review_shadow ON published_reviews(review_id, store_id) INCLUDE (is_shadow);
+CREATE INDEX idx_published_reviews_store_analysis ON published_reviews(analysis_id);
+CREATE INDEX idx_published_reviews_store_shadow ON published_reviews(review_id) WHERE is_shadow;
+CREATE INDEX idx_rejected_reviews_review ON rejected_reviews(review_id);
+CREATE INDEX idx_rejected_reviews_analysis ON rejected_reviews(analysis_id);
+CREATE INDEX idx_support_tickets_review ON support_tickets(review_id);
+CREATE INDEX idx_support_tickets_analysis ON support_tickets(analysis_id);
 CREATE INDEX idx_support_tickets_status ON support_tickets(status);
-CREATE INDEX idx_support_tickets_priority ON support_tickets(priority);
+CREATE INDEX idx_support_tickets_queue ON support_tickets(priority DESC, created_at DESC);
+CREATE INDEX idx_support_tickets_status_queue ON support_tickets(status, priority DESC, created_at DESC);
+CREATE INDEX idx_review_submission_keys_review ON review_submission_keys(review_id);
+-- Purge of keys older than IDEMPOTENCY_WINDOW_SECONDS
+CREATE INDEX idx_review_submission_keys_created ON review_submission_keys(created_at);
+CREATE INDEX idx_product_review_feed_tab ON product_review_feed(product_id, tab, value_score DESC, is_shadow);
+CREATE INDEX idx_moderation_stats_product ON moderation_stats_daily(product_id, day);
+CREATE INDEX idx_moderation_stats_store ON moderation_stats_daily(store_id, day);
+CREATE INDEX idx_admin_actions_target ON admin_actions(target_id, performed_at DESC, id DESC);
+CREATE INDEX idx_admin_actions_admin ON admin_actions(admin_user, performed_at DESC, id DESC);
+CREATE INDEX idx_moderation_events_position ON moderation_events(tx_id, id);
+CREATE INDEX idx_moderation_events_created ON moderation_events(created_at);
 
 -- Insert mock store data
 INSERT INTO stores (id, name, domain, description) VALUES 
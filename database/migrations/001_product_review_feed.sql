@@ -0,0 +1,53 @@
+-- Denormalized public review feed (see product_review_feed in init.sql).
+-- Creates the table on existing databases and backfills it from published reviews.
+-- Run once: psql -U revi_user -d revi_db -f database/migrations/001_product_review_feed.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS product_review_feed (
+    review_id UUID PRIMARY KEY REFERENCES base_reviews(id) ON DELETE CASCADE,
+    product_id UUID NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    tab VARCHAR(20) NOT NULL, -- 'positive', 'negative', 'other'
+    is_shadow BOOLEAN NOT NULL DEFAULT FALSE,
+    value_score DOUBLE PRECISION NOT NULL DEFAULT 0,
+    category VARCHAR(50) NOT NULL,
+    reviewer_name VARCHAR(255) NOT NULL, -- 'Anonymous' when the reviewer gave no name
+    rating INTEGER NOT NULL,
+    review_text TEXT NOT NULL,
+    is_verified_purchase BOOLEAN NOT NULL DEFAULT FALSE,
+    submitted_at TIMESTAMP NOT NULL,
+    automatic_response TEXT,
+    helpful_count INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT INTO product_review_feed (
+    review_id, product_id, tab, is_shadow, value_score, category, reviewer_name,
+    rating, review_text, is_verified_purchase, submitted_at, automatic_response, helpful_count
+)
+SELECT
+    br.id,
+    br.product_id,
+    CASE
+        WHEN ra.category = 'public_positive' AND NOT COALESCE(pr.is_shadow, FALSE) THEN 'positive'
+        WHEN ra.category = 'shadow' AND COALESCE(pr.is_shadow, FALSE) THEN 'positive'
+        WHEN ra.category = 'public_negative' AND NOT COALESCE(pr.is_shadow, FALSE) THEN 'negative'
+        ELSE 'other'
+    END,
+    COALESCE(pr.is_shadow, FALSE),
+    COALESCE(ra.value_score, 0)::DOUBLE PRECISION,
+    ra.category,
+    COALESCE(NULLIF(br.reviewer_name, ''), 'Anonymous'),
+    br.rating,
+    br.review_text,
+    COALESCE(br.is_verified_purchase, FALSE),
+    br.submitted_at,
+    pr.automatic_response,
+    COALESCE(pr.helpful_count, 0)
+FROM published_reviews pr
+JOIN base_reviews br ON br.id = pr.review_id
+JOIN review_analysis ra ON ra.id = pr.analysis_id
+ON CONFLICT (review_id) DO NOTHING;
+
+CREATE INDEX IF NOT EXISTS idx_product_review_feed_tab ON product_review_feed(product_id, tab, value_score DESC, is_shadow);
+
+COMMIT;
@@ -0,0 +1,30 @@
+-- Indexes for the queries in backend/app/api/public.py and admin.py.
+-- Built CONCURRENTLY so the API keeps serving while they build; this means the
+-- file must not run inside a transaction block (plain psql -f is fine).
+
+-- Lookups by review in the detail and override endpoints
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_rejected_reviews_review ON rejected_reviews(review_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_support_tickets_review ON support_tickets(review_id);
+
+-- ON DELETE CASCADE from review_analysis would otherwise scan these tables
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_published_reviews_analysis ON published_reviews(analysis_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_rejected_reviews_analysis ON rejected_reviews(analysis_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_support_tickets_analysis ON support_tickets(analysis_id);
+
+-- Shadow review list: only the small shadowed slice of published_reviews
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_published_reviews_shadow ON published_reviews(review_id) WHERE is_shadow;
+
+-- Support queue: optional status filter, ordered by priority then age
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_support_tickets_queue ON support_tickets(priority DESC, created_at DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_support_tickets_status_queue ON support_tickets(status, priority DESC, created_at DESC);
+DROP INDEX CONCURRENTLY IF EXISTS idx_support_tickets_priority;
+
+-- Product rating: covering indexes so the three-way join reads only index pages.
+-- They replace plain indexes on the same keys (review_analysis.review_id is also
+-- covered by its UNIQUE constraint, so the old index there was a duplicate).
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_base_reviews_product_rating ON base_reviews(product_id) INCLUDE (id, rating, is_verified_purchase);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_review_analysis_review_score ON review_analysis(review_id) INCLUDE (category, value_score);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_published_reviews_review_shadow ON published_reviews(review_id) INCLUDE (is_shadow);
+DROP INDEX CONCURRENTLY IF EXISTS idx_base_reviews_product;
+DROP INDEX CONCURRENTLY IF EXISTS idx_review_analysis_review;
+DROP INDEX CONCURRENTLY IF EXISTS idx_published_reviews_review;
@@ -0,0 +1,10 @@
+-- Idempotency keys for review submission (see review_submission_keys in init.sql).
+-- Run once: psql -U revi_user -d revi_db -f database/migrations/003_review_submission_keys.sql
+
+CREATE TABLE IF NOT EXISTS review_submission_keys (
+    key VARCHAR(160) PRIMARY KEY, -- 'header:<Idempotency-Key>' or 'hash:<fingerprint>'
+    request_hash VARCHAR(64) NOT NULL,
+    review_id UUID REFERENCES base_reviews(id) ON DELETE CASCADE,
+    response JSONB,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,73 @@
+-- Full-text search over review text (see review_search_vector and idx_base_reviews_search in init.sql).
+-- Adds the column without rewriting base_reviews, backfills it in batches that commit as
+-- they go, then builds the GIN index without blocking writes. Must run outside a
+-- transaction: psql -U revi_user -d revi_db -f database/migrations/004_review_search.sql
+
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'english_unaccent') THEN
+        CREATE TEXT SEARCH CONFIGURATION english_unaccent (COPY = english);
+        ALTER TEXT SEARCH CONFIGURATION english_unaccent
+            ALTER MAPPING FOR hword, hword_part, word WITH unaccent, english_stem;
+    END IF;
+    -- Reviews are indexed under both configurations, so the Romanian one also drops English stopwords
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_dict WHERE dictname = 'english_stopwords') THEN
+        CREATE TEXT SEARCH DICTIONARY english_stopwords (TEMPLATE = simple, STOPWORDS = english, ACCEPT = false);
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'romanian_unaccent') THEN
+        CREATE TEXT SEARCH CONFIGURATION romanian_unaccent (COPY = romanian);
+        ALTER TEXT SEARCH CONFIGURATION romanian_unaccent
+            ALTER MAPPING FOR asciiword, asciihword, hword_asciipart WITH english_stopwords, romanian_stem;
+        ALTER TEXT SEARCH CONFIGURATION romanian_unaccent
+            ALTER MAPPING FOR hword, hword_part, word WITH unaccent, romanian_stem;
+    END IF;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION review_search_vector(review_text TEXT) RETURNS TSVECTOR AS $$
+    SELECT to_tsvector('english_unaccent', coalesce(review_text, ''))
+        || to_tsvector('romanian_unaccent', coalesce(review_text, ''))
+$$ LANGUAGE SQL IMMUTABLE;
+
+ALTER TABLE base_reviews ADD COLUMN IF NOT EXISTS search_vector TSVECTOR;
+
+CREATE OR REPLACE FUNCTION base_reviews_search_vector() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.search_vector := review_search_vector(NEW.review_text);
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_base_reviews_search_vector ON base_reviews;
+CREATE TRIGGER trg_base_reviews_search_vector
+    BEFORE INSERT OR UPDATE OF review_text ON base_reviews
+    FOR EACH ROW EXECUTE FUNCTION base_reviews_search_vector();
+
+-- Track more lexemes so the planner sees rare search terms as rare and uses the GIN index
+ALTER TABLE base_reviews ALTER COLUMN search_vector SET STATISTICS 1000;
+
+-- Reviews written from here on are covered by the trigger; fill in the existing ones,
+-- walking the primary key so each batch is an index range rather than a rescan
+DO $$
+DECLARE
+    last_id UUID := '00000000-0000-0000-0000-000000000000';
+    batch_end UUID;
+BEGIN
+    LOOP
+        SELECT id INTO batch_end FROM base_reviews WHERE id > last_id ORDER BY id OFFSET 9999 LIMIT 1;
+
+        UPDATE base_reviews
+        SET search_vector = review_search_vector(review_text)
+        WHERE id > last_id AND (batch_end IS NULL OR id <= batch_end) AND search_vector IS NULL;
+        COMMIT;
+
+        EXIT WHEN batch_end IS NULL;
+        last_id := batch_end;
+    END LOOP;
+END
+$$;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_base_reviews_search ON base_reviews USING GIN (search_vector);
+ANALYZE base_reviews;
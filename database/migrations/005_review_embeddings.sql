@@ -0,0 +1,18 @@
+-- Review embeddings for semantic search (see review_embeddings in init.sql).
+-- Needs the pgvector extension (the pgvector/pgvector:pg15 image ships it). Builds the
+-- indexes without blocking writes, so it must run outside a transaction:
+--   psql -U revi_user -d revi_db -f database/migrations/005_review_embeddings.sql
+-- Then store embeddings for existing reviews once:
+--   cd backend && python -m app.cli embed-reviews
+
+CREATE EXTENSION IF NOT EXISTS vector;
+
+CREATE TABLE IF NOT EXISTS review_embeddings (
+    review_id UUID PRIMARY KEY REFERENCES base_reviews(id) ON DELETE CASCADE,
+    product_id UUID NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    embedding vector(384) NOT NULL, -- paraphrase-multilingual-MiniLM-L12-v2
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_review_embeddings_hnsw ON review_embeddings USING hnsw (embedding vector_cosine_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_review_embeddings_product ON review_embeddings(product_id);
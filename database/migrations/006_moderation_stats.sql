@@ -0,0 +1,23 @@
+-- Daily moderation statistics rollups (see moderation_stats_daily in init.sql).
+-- Run once: psql -U revi_user -d revi_db -f database/migrations/006_moderation_stats.sql
+-- The API keeps the rollups current from then on. Count the existing reviews once,
+-- one day per transaction (safe to re-run, also for a single range of days):
+--   cd backend && python -m app.cli rebuild-stats
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS moderation_stats_daily (
+    day DATE NOT NULL, -- UTC submission day
+    product_id UUID NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    category VARCHAR(50) NOT NULL,
+    severity VARCHAR(20) NOT NULL, -- 'unknown' when not classified
+    language VARCHAR(10) NOT NULL, -- 'unknown' for reviews stored before detection
+    store_id UUID REFERENCES stores(id) ON DELETE CASCADE,
+    review_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, product_id, category, severity, language)
+);
+
+CREATE INDEX IF NOT EXISTS idx_moderation_stats_product ON moderation_stats_daily(product_id, day);
+CREATE INDEX IF NOT EXISTS idx_moderation_stats_store ON moderation_stats_daily(store_id, day);
+
+COMMIT;
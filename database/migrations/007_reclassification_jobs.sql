@@ -0,0 +1,21 @@
+-- Checkpoints of the reclassification job (see reclassification_jobs in init.sql), and the
+-- admin_actions index it uses to leave manually overridden reviews alone.
+-- The index is built CONCURRENTLY, so the file must not run inside a transaction block:
+--   psql -U revi_user -d revi_db -f database/migrations/007_reclassification_jobs.sql
+
+CREATE TABLE IF NOT EXISTS reclassification_jobs (
+    name VARCHAR(100) PRIMARY KEY,
+    dry_run BOOLEAN NOT NULL,
+    product_id UUID, -- only this product's reviews, when set
+    last_review_id UUID, -- checkpoint; reviews are processed in id order
+    processed INTEGER NOT NULL DEFAULT 0,
+    flipped INTEGER NOT NULL DEFAULT 0,
+    applied INTEGER NOT NULL DEFAULT 0,
+    skipped INTEGER NOT NULL DEFAULT 0,
+    flips JSONB NOT NULL DEFAULT '{}', -- {"old->new": count}
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_admin_actions_target ON admin_actions(target_id);
@@ -0,0 +1,300 @@
+-- Hash partitioning of base_reviews, review_analysis and published_reviews by store
+-- (see the review tables in init.sql). Moving a live database takes three steps:
+--
+--   1. this file: adds store_id to the three tables, creates their partitioned
+--      replacements next to them (base_reviews_partitioned, ...) and installs
+--      triggers that mirror every write to the old tables into the new ones;
+--      no table is rewritten and nothing is locked for longer than a DDL statement
+--   2. python -m app.cli partition-reviews copy: copies the existing rows in
+--      batches that commit as they go; resumable
+--   3. python -m app.cli partition-reviews swap: checks the copies, then renames
+--      the tables in one short transaction; the old ones stay as *_unpartitioned
+--
+-- Deploy the application version that writes store_id before step 3; the
+-- partitioned tables require it. Constraint and index names match init.sql.
+-- Run with:
+--   psql -U revi_user -d revi_db -f database/migrations/008_partition_reviews_by_store.sql
+
+BEGIN;
+
+-- Every review is routed by its product's store, so every product needs one
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM base_reviews b LEFT JOIN products p ON p.id = b.product_id WHERE p.store_id IS NULL
+    ) THEN
+        RAISE EXCEPTION 'reviews of products without a store exist; assign those products to a store first';
+    END IF;
+END
+$$;
+
+-- Denormalized from products.store_id; written by the application from here on
+ALTER TABLE base_reviews ADD COLUMN IF NOT EXISTS store_id UUID;
+ALTER TABLE review_analysis ADD COLUMN IF NOT EXISTS store_id UUID;
+ALTER TABLE published_reviews ADD COLUMN IF NOT EXISTS store_id UUID;
+
+CREATE TABLE base_reviews_partitioned (
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    store_id UUID NOT NULL,
+    product_id UUID CONSTRAINT base_reviews_product_id_fkey REFERENCES products(id) ON DELETE CASCADE,
+    user_id UUID CONSTRAINT base_reviews_user_id_fkey REFERENCES users(id) ON DELETE SET NULL,
+    reviewer_name VARCHAR(255),
+    reviewer_email VARCHAR(255),
+    rating INTEGER CONSTRAINT base_reviews_rating_check CHECK (rating >= 1 AND rating <= 5),
+    review_text TEXT NOT NULL,
+    language VARCHAR(10),
+    is_verified_purchase BOOLEAN DEFAULT FALSE,
+    submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    ip_address VARCHAR(45),
+    search_vector TSVECTOR,
+    CONSTRAINT base_reviews_store_pkey PRIMARY KEY (id, store_id)
+) PARTITION BY HASH (store_id);
+
+CREATE TRIGGER trg_base_reviews_search_vector
+    BEFORE INSERT OR UPDATE OF review_text ON base_reviews_partitioned
+    FOR EACH ROW EXECUTE FUNCTION base_reviews_search_vector();
+
+ALTER TABLE base_reviews_partitioned ALTER COLUMN search_vector SET STATISTICS 1000;
+
+CREATE TABLE review_analysis_partitioned (
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    store_id UUID NOT NULL,
+    review_id UUID,
+    category VARCHAR(50) NOT NULL,
+    confidence DECIMAL(3, 2) CONSTRAINT review_analysis_confidence_check CHECK (confidence >= 0 AND confidence <= 1),
+    reason TEXT,
+    tags TEXT[],
+    severity VARCHAR(20),
+    recommended_action VARCHAR(50),
+    matched_description_points TEXT[],
+    suggested_automatic_response TEXT,
+    value_score DECIMAL(5, 2) DEFAULT 0,
+    analyzed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT review_analysis_store_pkey PRIMARY KEY (id, store_id),
+    CONSTRAINT review_analysis_store_review_key UNIQUE (review_id, store_id) INCLUDE (category, value_score),
+    CONSTRAINT review_analysis_store_review_fkey FOREIGN KEY (review_id, store_id)
+        REFERENCES base_reviews_partitioned (id, store_id) ON DELETE CASCADE
+) PARTITION BY HASH (store_id);
+
+CREATE TABLE published_reviews_partitioned (
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    store_id UUID NOT NULL,
+    review_id UUID,
+    analysis_id UUID,
+    is_shadow BOOLEAN DEFAULT FALSE,
+    automatic_response TEXT,
+    response_language VARCHAR(10) DEFAULT 'en',
+    published_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    views INTEGER DEFAULT 0,
+    helpful_count INTEGER DEFAULT 0,
+    CONSTRAINT published_reviews_store_pkey PRIMARY KEY (id, store_id),
+    CONSTRAINT published_reviews_store_review_fkey FOREIGN KEY (review_id, store_id)
+        REFERENCES base_reviews_partitioned (id, store_id) ON DELETE CASCADE,
+    CONSTRAINT published_reviews_store_analysis_fkey FOREIGN KEY (analysis_id, store_id)
+        REFERENCES review_analysis_partitioned (id, store_id) ON DELETE CASCADE
+) PARTITION BY HASH (store_id);
+
+-- 16 partitions per table; a store's reviews, analyses and publications share a remainder
+DO $$
+BEGIN
+    FOR remainder IN 0..15 LOOP
+        EXECUTE format(
+            'CREATE TABLE base_reviews_p%s PARTITION OF base_reviews_partitioned FOR VALUES WITH (MODULUS 16, REMAINDER %s)',
+            remainder, remainder
+        );
+        EXECUTE format(
+            'CREATE TABLE review_analysis_p%s PARTITION OF review_analysis_partitioned FOR VALUES WITH (MODULUS 16, REMAINDER %s)',
+            remainder, remainder
+        );
+        EXECUTE format(
+            'CREATE TABLE published_reviews_p%s PARTITION OF published_reviews_partitioned FOR VALUES WITH (MODULUS 16, REMAINDER %s)',
+            remainder, remainder
+        );
+    END LOOP;
+END
+$$;
+
+-- The tables are still empty, so plain CREATE INDEX is as cheap as CONCURRENTLY
+CREATE INDEX idx_base_reviews_store_product ON base_reviews_partitioned(store_id, product_id) INCLUDE (id, rating, is_verified_purchase);
+CREATE INDEX idx_base_reviews_store_submitted ON base_reviews_partitioned(submitted_at DESC);
+CREATE INDEX idx_base_reviews_store_search ON base_reviews_partitioned USING GIN (search_vector);
+CREATE INDEX idx_review_analysis_store_category ON review_analysis_partitioned(category);
+CREATE INDEX idx_published_reviews_store_review_shadow ON published_reviews_partitioned(review_id, store_id) INCLUDE (is_shadow);
+CREATE INDEX idx_published_reviews_store_analysis ON published_reviews_partitioned(analysis_id);
+CREATE INDEX idx_published_reviews_store_shadow ON published_reviews_partitioned(review_id) WHERE is_shadow;
+
+-- The tables that stay unpartitioned cannot keep foreign keys to base_reviews(id) once it
+-- is partitioned (its key becomes (id, store_id)); deleting reviews cleans them up instead
+CREATE OR REPLACE FUNCTION base_reviews_delete_dependents() RETURNS TRIGGER AS $$
+BEGIN
+    DELETE FROM rejected_reviews WHERE review_id IN (SELECT id FROM deleted_reviews);
+    DELETE FROM support_tickets WHERE review_id IN (SELECT id FROM deleted_reviews);
+    DELETE FROM product_review_feed WHERE review_id IN (SELECT id FROM deleted_reviews);
+    DELETE FROM review_submission_keys WHERE review_id IN (SELECT id FROM deleted_reviews);
+    DELETE FROM review_embeddings WHERE review_id IN (SELECT id FROM deleted_reviews);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_base_reviews_delete_dependents
+    AFTER DELETE ON base_reviews_partitioned
+    REFERENCING OLD TABLE AS deleted_reviews
+    FOR EACH STATEMENT EXECUTE FUNCTION base_reviews_delete_dependents();
+
+-- Copy the given rows of an old table into its partitioned replacement, taking the store
+-- from the review's product where the row has none yet. Rows are locked FOR SHARE so a
+-- concurrent delete either waits for the copy or the copy skips the deleted row.
+-- Used by the mirror triggers below and by `partition-reviews copy`.
+CREATE FUNCTION partition_copy_base_reviews(ids UUID[]) RETURNS INTEGER AS $$
+    WITH copied AS (
+        INSERT INTO base_reviews_partitioned (
+            id, store_id, product_id, user_id, reviewer_name, reviewer_email, rating,
+            review_text, language, is_verified_purchase, submitted_at, ip_address
+        )
+        SELECT b.id, coalesce(b.store_id, p.store_id), b.product_id, b.user_id, b.reviewer_name, b.reviewer_email,
+            b.rating, b.review_text, b.language, b.is_verified_purchase, b.submitted_at, b.ip_address
+        FROM base_reviews b
+        LEFT JOIN products p ON p.id = b.product_id
+        WHERE b.id = ANY(ids)
+        FOR SHARE OF b
+        ON CONFLICT DO NOTHING
+        RETURNING 1
+    )
+    SELECT count(*)::INTEGER FROM copied
+$$ LANGUAGE SQL;
+
+CREATE FUNCTION partition_copy_review_analysis(ids UUID[]) RETURNS INTEGER AS $$
+    WITH copied AS (
+        INSERT INTO review_analysis_partitioned (
+            id, store_id, review_id, category, confidence, reason, tags, severity, recommended_action,
+            matched_description_points, suggested_automatic_response, value_score, analyzed_at
+        )
+        SELECT a.id, coalesce(a.store_id, b.store_id, p.store_id), a.review_id, a.category, a.confidence, a.reason,
+            a.tags, a.severity, a.recommended_action, a.matched_description_points,
+            a.suggested_automatic_response, a.value_score, a.analyzed_at
+        FROM review_analysis a
+        LEFT JOIN base_reviews b ON b.id = a.review_id
+        LEFT JOIN products p ON p.id = b.product_id
+        WHERE a.id = ANY(ids)
+        FOR SHARE OF a
+        ON CONFLICT DO NOTHING
+        RETURNING 1
+    )
+    SELECT count(*)::INTEGER FROM copied
+$$ LANGUAGE SQL;
+
+CREATE FUNCTION partition_copy_published_reviews(ids UUID[]) RETURNS INTEGER AS $$
+    WITH copied AS (
+        INSERT INTO published_reviews_partitioned (
+            id, store_id, review_id, analysis_id, is_shadow, automatic_response, response_language,
+            published_at, views, helpful_count
+        )
+        SELECT r.id, coalesce(r.store_id, b.store_id, p.store_id), r.review_id, r.analysis_id, r.is_shadow,
+            r.automatic_response, r.response_language, r.published_at, r.views, r.helpful_count
+        FROM published_reviews r
+        LEFT JOIN base_reviews b ON b.id = r.review_id
+        LEFT JOIN products p ON p.id = b.product_id
+        WHERE r.id = ANY(ids)
+        FOR SHARE OF r
+        ON CONFLICT DO NOTHING
+        RETURNING 1
+    )
+    SELECT count(*)::INTEGER FROM copied
+$$ LANGUAGE SQL;
+
+-- Mirror triggers, statement-level so a bulk import copies its rows in one statement.
+-- Inserts first copy the rows they reference, which the batch copy may not have reached;
+-- updates of rows it has not reached yet need no mirroring, it will read the new values.
+CREATE FUNCTION mirror_base_reviews() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM partition_copy_base_reviews(ARRAY(SELECT id FROM new_rows));
+    ELSIF TG_OP = 'UPDATE' THEN
+        UPDATE base_reviews_partitioned t
+        SET product_id = n.product_id, user_id = n.user_id, reviewer_name = n.reviewer_name,
+            reviewer_email = n.reviewer_email, rating = n.rating, review_text = n.review_text,
+            language = n.language, is_verified_purchase = n.is_verified_purchase,
+            submitted_at = n.submitted_at, ip_address = n.ip_address
+        FROM new_rows n
+        WHERE t.id = n.id;
+    ELSE
+        DELETE FROM base_reviews_partitioned WHERE id IN (SELECT id FROM old_rows);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION mirror_review_analysis() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM partition_copy_base_reviews(ARRAY(SELECT review_id FROM new_rows));
+        PERFORM partition_copy_review_analysis(ARRAY(SELECT id FROM new_rows));
+    ELSIF TG_OP = 'UPDATE' THEN
+        UPDATE review_analysis_partitioned t
+        SET category = n.category, confidence = n.confidence, reason = n.reason, tags = n.tags,
+            severity = n.severity, recommended_action = n.recommended_action,
+            matched_description_points = n.matched_description_points,
+            suggested_automatic_response = n.suggested_automatic_response,
+            value_score = n.value_score, analyzed_at = n.analyzed_at
+        FROM new_rows n
+        WHERE t.id = n.id;
+    ELSE
+        DELETE FROM review_analysis_partitioned WHERE id IN (SELECT id FROM old_rows);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION mirror_published_reviews() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM partition_copy_base_reviews(ARRAY(SELECT review_id FROM new_rows));
+        PERFORM partition_copy_review_analysis(ARRAY(SELECT analysis_id FROM new_rows));
+        PERFORM partition_copy_published_reviews(ARRAY(SELECT id FROM new_rows));
+    ELSIF TG_OP = 'UPDATE' THEN
+        UPDATE published_reviews_partitioned t
+        SET is_shadow = n.is_shadow, automatic_response = n.automatic_response,
+            response_language = n.response_language, published_at = n.published_at,
+            views = n.views, helpful_count = n.helpful_count
+        FROM new_rows n
+        WHERE t.id = n.id;
+    ELSE
+        DELETE FROM published_reviews_partitioned WHERE id IN (SELECT id FROM old_rows);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+-- Transition tables allow one event per trigger
+CREATE TRIGGER trg_mirror_base_reviews_insert AFTER INSERT ON base_reviews
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION mirror_base_reviews();
+CREATE TRIGGER trg_mirror_base_reviews_update AFTER UPDATE ON base_reviews
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION mirror_base_reviews();
+CREATE TRIGGER trg_mirror_base_reviews_delete AFTER DELETE ON base_reviews
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION mirror_base_reviews();
+CREATE TRIGGER trg_mirror_review_analysis_insert AFTER INSERT ON review_analysis
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION mirror_review_analysis();
+CREATE TRIGGER trg_mirror_review_analysis_update AFTER UPDATE ON review_analysis
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION mirror_review_analysis();
+CREATE TRIGGER trg_mirror_review_analysis_delete AFTER DELETE ON review_analysis
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION mirror_review_analysis();
+CREATE TRIGGER trg_mirror_published_reviews_insert AFTER INSERT ON published_reviews
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION mirror_published_reviews();
+CREATE TRIGGER trg_mirror_published_reviews_update AFTER UPDATE ON published_reviews
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION mirror_published_reviews();
+CREATE TRIGGER trg_mirror_published_reviews_delete AFTER DELETE ON published_reviews
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION mirror_published_reviews();
+
+-- Checkpoints of `partition-reviews copy`; rows are copied in id order
+CREATE TABLE review_partition_copy (
+    table_name VARCHAR(63) PRIMARY KEY,
+    last_id UUID,
+    copied INTEGER NOT NULL DEFAULT 0,
+    finished_at TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMIT;
+
+-- For base_reviews_delete_dependents; outside the transaction so it can be built without blocking submissions
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_review_submission_keys_review ON review_submission_keys(review_id);
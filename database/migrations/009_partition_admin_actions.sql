@@ -0,0 +1,109 @@
+-- Range partitioning of admin_actions by month of performed_at, for the audit log retention
+-- of python -m app.cli maintain-audit-log (see admin_actions in init.sql). The table is
+-- rebuilt in one transaction: admin requests that write an audit entry wait for the copy,
+-- reads do not. Entries without a performed_at get -infinity and stay in the default
+-- partition. Index names match init.sql.
+-- Run with:
+--   psql -U revi_user -d revi_db -f database/migrations/009_partition_admin_actions.sql
+
+BEGIN;
+
+LOCK TABLE admin_actions IN EXCLUSIVE MODE;
+ALTER TABLE admin_actions RENAME TO admin_actions_unpartitioned;
+ALTER TABLE admin_actions_unpartitioned RENAME CONSTRAINT admin_actions_pkey TO admin_actions_unpartitioned_pkey;
+DROP INDEX IF EXISTS idx_admin_actions_target;
+
+CREATE TABLE admin_actions (
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    admin_user VARCHAR(255) NOT NULL,
+    action_type VARCHAR(50) NOT NULL, -- 'override', 'publish', 'reject', 'assign_ticket', etc.
+    target_id UUID NOT NULL, -- ID of the affected entity
+    target_type VARCHAR(50) NOT NULL, -- 'review', 'ticket', etc.
+    reason TEXT,
+    old_value TEXT,
+    new_value TEXT,
+    performed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT admin_actions_pkey PRIMARY KEY (id, performed_at)
+) PARTITION BY RANGE (performed_at);
+
+CREATE TABLE admin_actions_default PARTITION OF admin_actions DEFAULT;
+
+-- Entries are never changed or deleted; old months leave as whole partitions
+CREATE OR REPLACE FUNCTION admin_actions_append_only()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Set by admin_actions_create_partition while it moves rows out of the default partition
+    IF current_setting('revi.admin_actions_maintenance', true) = 'on' THEN
+        RETURN OLD;
+    END IF;
+    RAISE EXCEPTION 'admin_actions is append-only';
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_admin_actions_append_only
+    BEFORE UPDATE OR DELETE ON admin_actions
+    FOR EACH ROW
+    EXECUTE FUNCTION admin_actions_append_only();
+
+-- Creates the partition of the month containing month_of unless it exists, moving that month's
+-- rows out of the default partition; returns the partition's name
+CREATE OR REPLACE FUNCTION admin_actions_create_partition(month_of DATE)
+RETURNS TEXT AS $$
+DECLARE
+    month_start TIMESTAMP := date_trunc('month', month_of);
+    month_end TIMESTAMP := date_trunc('month', month_of) + INTERVAL '1 month';
+    partition_name TEXT := 'admin_actions_' || to_char(month_of, 'YYYY_MM');
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+
+    EXECUTE format('CREATE TABLE %I (LIKE admin_actions INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', partition_name);
+    PERFORM set_config('revi.admin_actions_maintenance', 'on', true);
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM admin_actions_default WHERE performed_at >= %L AND performed_at < %L RETURNING *) '
+        'INSERT INTO %I SELECT * FROM moved',
+        month_start, month_end, partition_name
+    );
+    PERFORM set_config('revi.admin_actions_maintenance', 'off', true);
+    EXECUTE format(
+        'ALTER TABLE admin_actions ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, month_start, month_end
+    );
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Every month with entries, through three months ahead
+DO $$
+DECLARE
+    month_start TIMESTAMP;
+BEGIN
+    FOR month_start IN
+        SELECT generate_series(
+            date_trunc('month', coalesce(
+                (SELECT min(performed_at) FROM admin_actions_unpartitioned WHERE performed_at > '-infinity'), now()
+            )),
+            date_trunc('month', now()) + INTERVAL '3 months',
+            INTERVAL '1 month'
+        )
+    LOOP
+        PERFORM admin_actions_create_partition(CAST(month_start AS DATE));
+    END LOOP;
+END $$;
+
+INSERT INTO admin_actions (
+    id, admin_user, action_type, target_id, target_type, reason, old_value, new_value, performed_at
+)
+SELECT id, admin_user, action_type, target_id, target_type, reason, old_value, new_value,
+       coalesce(performed_at, '-infinity')
+FROM admin_actions_unpartitioned;
+
+CREATE INDEX idx_admin_actions_target ON admin_actions(target_id, performed_at DESC, id DESC);
+CREATE INDEX idx_admin_actions_admin ON admin_actions(admin_user, performed_at DESC, id DESC);
+
+DROP TABLE admin_actions_unpartitioned;
+
+COMMIT;
+
+ANALYZE admin_actions;
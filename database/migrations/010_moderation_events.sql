@@ -0,0 +1,16 @@
+-- Outbox of moderation events for the admin event stream (GET /api/admin/events),
+-- see moderation_events in init.sql. Nothing reads the table until the API is
+-- deployed, so it can be applied ahead of it:
+--   psql -U revi_user -d revi_db -f database/migrations/010_moderation_events.sql
+
+CREATE TABLE IF NOT EXISTS moderation_events (
+    id BIGSERIAL PRIMARY KEY,
+    -- Writing transaction; events are read in (tx_id, id) order
+    tx_id BIGINT NOT NULL DEFAULT CAST(CAST(pg_current_xact_id() AS TEXT) AS BIGINT),
+    event_type VARCHAR(50) NOT NULL, -- review_classified, ticket_created, review_overridden, ticket_assigned
+    payload JSONB NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_moderation_events_position ON moderation_events(tx_id, id);
+CREATE INDEX IF NOT EXISTS idx_moderation_events_created ON moderation_events(created_at);
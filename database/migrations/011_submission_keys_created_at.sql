@@ -0,0 +1,6 @@
+-- Index for the purge of expired idempotency keys (see review_submission_keys in init.sql).
+-- Built CONCURRENTLY so submissions keep flowing while it builds; this means the
+-- file must not run inside a transaction block (plain psql -f is fine):
+--   psql -U revi_user -d revi_db -f database/migrations/011_submission_keys_created_at.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_review_submission_keys_created ON review_submission_keys(created_at);
@@ -32,6 +32,8 @@ export const adminAPI = {
   },
   assignTicket: (ticketId, assignedTo) => api.post(`/admin/tickets/${ticketId}/assign`, { assigned_to: assignedTo }),
   overrideReview: (reviewId, data) => api.post(`/admin/reviews/${reviewId}/override`, data),
+  bulkOverrideReviews: (data) => api.post('/admin/reviews/override', data),
+  getStats: (params = {}) => api.get('/admin/stats', { params }),
 }
 
 export default api